@@ -0,0 +1,150 @@
+"""
+OAuth2 token authentication with cached token introspection.
+
+Every authenticated request needs the bearer token to be introspected by the OAuth2 token
+introspection endpoint. :py:class:`CachedOAuth2TokenAuthentication` caches the result of
+introspection in the cache named by
+:py:attr:`~assets.defaultsettings.IAR_TOKEN_CACHE_ALIAS` keyed by a hash of the token so that the
+token itself is never stored. Entries for active tokens live for at most
+:py:attr:`~assets.defaultsettings.IAR_TOKEN_CACHE_MAX_LIFETIME` seconds and never beyond the
+token's expiry. Tokens which are not active are cached for
+:py:attr:`~assets.defaultsettings.IAR_TOKEN_CACHE_NEGATIVE_LIFETIME` seconds.
+
+Tokens are introspected with the pooled HTTP session from :py:mod:`assets.httpclient`.
+
+"""
+import datetime
+import hashlib
+import threading
+import time
+
+from automationoauthdrf.authentication import OAuth2TokenAuthentication
+from django.conf import settings
+from django.core.cache import caches
+
+from . import httpclient
+
+
+CACHE_KEY_PREFIX = 'assets:introspect:'
+
+#: Value cached for tokens which are not active. The cache returns None for missing keys and so
+#: inactive tokens are cached as this value instead.
+_INACTIVE = {'active': False}
+
+
+class CacheStats:
+    """
+    Thread-safe counters of the use of the introspection cache in this process.
+
+    :ivar int hits: number of introspections answered from the cache
+    :ivar int misses: number of introspections which needed the introspection endpoint
+
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        """Record a cache hit if *hit* is true or a miss otherwise."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def reset(self):
+        """Reset the counters to zero."""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+#: Use of the introspection cache by this process.
+cache_stats = CacheStats()
+
+
+class CachedOAuth2TokenAuthentication(OAuth2TokenAuthentication):
+    """
+    A :py:class:`automationoauthdrf.authentication.OAuth2TokenAuthentication` which caches the
+    result of token introspection and introspects tokens with the pooled HTTP session.
+
+    """
+    def validate_token(self, token):
+        key = get_cache_key(token)
+        cache = _get_cache()
+
+        cached = cache.get(key)
+        if cached is not None:
+            cache_stats.record(hit=True)
+            return None if cached == _INACTIVE else cached
+
+        cache_stats.record(hit=False)
+        validated = introspect_token(token)
+
+        if validated is None:
+            cache.set(key, _INACTIVE, settings.IAR_TOKEN_CACHE_NEGATIVE_LIFETIME)
+        else:
+            lifetime = get_cache_lifetime(validated)
+            if lifetime > 0:
+                cache.set(key, validated, lifetime)
+
+        return validated
+
+
+def introspect_token(token):
+    """
+    Introspect the bearer token *token* and return the response from the introspection endpoint
+    if the token is valid or None otherwise. A valid token is active, was issued in the past and
+    expires in the future. Raises :py:class:`requests.HTTPError` if introspection fails.
+
+    """
+    response = httpclient.authenticated_request(
+        'POST', settings.OAUTH2_INTROSPECT_URL, settings.OAUTH2_INTROSPECT_SCOPES,
+        data={'token': token})
+    response.raise_for_status()
+    introspected = response.json()
+    if not introspected.get('active', False):
+        return None
+
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    issued_at = _utc_datetime_from_timestamp(introspected.get('iat'))
+    expires_at = _utc_datetime_from_timestamp(introspected.get('exp'))
+    if issued_at is None or now < issued_at:
+        return None
+    if expires_at is None or now >= expires_at:
+        return None
+
+    return introspected
+
+
+def get_cache_key(token):
+    """Return the cache key for the introspection of the bearer token *token*."""
+    return CACHE_KEY_PREFIX + hashlib.sha256(token.encode('utf8')).hexdigest()
+
+
+def get_cache_lifetime(token, now=None):
+    """
+    Return the number of seconds for which the introspection response *token* for an active token
+    may be cached. This is at most
+    :py:attr:`~assets.defaultsettings.IAR_TOKEN_CACHE_MAX_LIFETIME` and no later than the token's
+    ``exp`` claim. A result of zero or less means that the response must not be cached.
+
+    """
+    lifetime = settings.IAR_TOKEN_CACHE_MAX_LIFETIME
+    expires_at = token.get('exp')
+    if expires_at is not None:
+        now = time.time() if now is None else now
+        lifetime = min(lifetime, int(expires_at - now))
+    return lifetime
+
+
+def _get_cache():
+    return caches[settings.IAR_TOKEN_CACHE_ALIAS]
+
+
+def _utc_datetime_from_timestamp(timestamp):
+    """Return a UTC datetime for the POSIX timestamp *timestamp* or None if it is None."""
+    if timestamp is None:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
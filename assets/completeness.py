@@ -0,0 +1,180 @@
+"""
+Declarative rules from which both a :py:class:`~django.db.models.Q` condition and an equivalent
+Python predicate can be built. They are used to define when an asset is "complete" in one place.
+
+A rule is built from the following terms, each of which names a field:
+
+:py:class:`IsSet`
+    The field is not null.
+
+:py:class:`IsNotEmpty`
+    The multi-select field has at least one choice selected.
+
+:py:class:`Equals`
+    The field has a given value, which must not be None.
+
+:py:class:`Contains`
+    The multi-select field has a given choice selected.
+
+Terms are combined with :py:class:`All`, :py:class:`Any`, :py:class:`Not` and
+:py:class:`Implies`. The condition returned by :py:meth:`Rule.as_q` matches a row exactly when the
+predicate returned by :py:meth:`Rule.as_predicate` is true for an object with the same values.
+Django's handling of negated lookups on nullable columns means that null values behave in the
+database as they do in Python.
+
+"""
+import functools
+import operator
+from collections.abc import Mapping
+
+from django.db.models import Q
+
+
+class Rule:
+    """Base class for rules."""
+
+    #: The names of the fields which the rule depends on.
+    fields = frozenset()
+
+    def as_q(self):
+        """Return a :py:class:`~django.db.models.Q` matching rows for which this rule holds."""
+        raise NotImplementedError()
+
+    def as_predicate(self):
+        """
+        Return a callable which takes an object, such as a model instance, or a mapping, such as
+        validated serializer data, and returns whether this rule holds for the values of its
+        attributes or items. Missing values are taken to be None.
+
+        """
+        test = self._compile()
+
+        def predicate(obj):
+            if isinstance(obj, Mapping):
+                return test(obj.get)
+            return test(lambda name: getattr(obj, name, None))
+
+        return predicate
+
+    def _compile(self):
+        """
+        Return a callable which takes a function mapping field names to values and returns whether
+        this rule holds.
+
+        """
+        raise NotImplementedError()
+
+
+class _FieldRule(Rule):
+    def __init__(self, field):
+        self.field = field
+        self.fields = frozenset([field])
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.field)
+
+
+class IsSet(_FieldRule):
+    def as_q(self):
+        return Q(**{self.field + '__isnull': False})
+
+    def _compile(self):
+        field = self.field
+        return lambda get: get(field) is not None
+
+
+class IsNotEmpty(_FieldRule):
+    def as_q(self):
+        return ~Q(**{self.field: []})
+
+    def _compile(self):
+        field = self.field
+        return lambda get: bool(_choice_keys(get(field)))
+
+
+class Equals(_FieldRule):
+    def __init__(self, field, value):
+        super().__init__(field)
+        self.value = value
+
+    def __repr__(self):
+        return 'Equals({!r}, {!r})'.format(self.field, self.value)
+
+    def as_q(self):
+        return Q(**{self.field: self.value})
+
+    def _compile(self):
+        field, value = self.field, self.value
+        return lambda get: get(field) == value
+
+
+class Contains(_FieldRule):
+    def __init__(self, field, key):
+        super().__init__(field)
+        self.key = key
+
+    def __repr__(self):
+        return 'Contains({!r}, {!r})'.format(self.field, self.key)
+
+    def as_q(self):
+        return Q(**{self.field + '__contains_all': [self.key]})
+
+    def _compile(self):
+        field, key = self.field, self.key
+        return lambda get: key in _choice_keys(get(field))
+
+
+class All(Rule):
+    def __init__(self, *rules):
+        self.rules = rules
+        self.fields = frozenset().union(*(rule.fields for rule in rules))
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, ', '.join(repr(r) for r in self.rules))
+
+    def as_q(self):
+        return functools.reduce(operator.and_, (rule.as_q() for rule in self.rules), Q())
+
+    def _compile(self):
+        tests = [rule._compile() for rule in self.rules]
+        return lambda get: all(test(get) for test in tests)
+
+
+class Any(All):
+    def as_q(self):
+        return functools.reduce(operator.or_, (rule.as_q() for rule in self.rules))
+
+    def _compile(self):
+        tests = [rule._compile() for rule in self.rules]
+        return lambda get: any(test(get) for test in tests)
+
+
+class Not(Rule):
+    def __init__(self, rule):
+        self.rule = rule
+        self.fields = rule.fields
+
+    def __repr__(self):
+        return 'Not({!r})'.format(self.rule)
+
+    def as_q(self):
+        return ~self.rule.as_q()
+
+    def _compile(self):
+        test = self.rule._compile()
+        return lambda get: not test(get)
+
+
+class Implies(Any):
+    """If *condition* holds then *rule* must hold."""
+    def __init__(self, condition, rule):
+        super().__init__(Not(condition), rule)
+
+
+def _choice_keys(value):
+    """Return the selected keys of a multi-select field value, which may be a string or None."""
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return [key for key in value.split(',') if key != '']
+    return value
@@ -74,3 +74,120 @@ IAR_USERS_LOOKUP_GROUP = 'uis-iar-users'
 Name of lookup group which a user must be a member of to have access to IAR.
 
 """
+
+IAR_STATS_CACHE_ALIAS = 'default'
+"""
+Alias of the cache in the ``CACHES`` setting used to store responses from the statistics endpoint.
+If ``CACHES`` is not configured, Django uses a local-memory cache as the default cache.
+
+"""
+
+IAR_STATS_CACHE_MAX_STALENESS = 60
+"""
+Cached responses from the statistics endpoint are discarded whenever assets change. This setting
+specifies the maximum time in seconds a cached response may be used for, bounding how stale it can
+be if an invalidation is missed.
+
+"""
+
+IAR_TYPEAHEAD_MAX_RESULTS = 25
+"""
+Maximum number of results returned by the type-ahead endpoint regardless of the limit requested.
+
+"""
+
+IAR_TYPEAHEAD_MAX_AGE = 30
+"""
+Time in seconds for which clients may cache responses from the type-ahead endpoint.
+
+"""
+
+IAR_MAX_PAGE_SIZE = 10000
+"""
+Maximum number of assets on one page of the asset list. Clients may choose a page size up to this
+with the ``page_size`` query parameter. Larger page sizes are reduced to this.
+
+"""
+
+IAR_STREAMED_PAGE_SIZE = 500
+"""
+Pages of the asset list with more than this many assets are streamed to the client as they are
+fetched from the database in chunks of this many assets rather than being built in memory.
+
+"""
+
+IAR_EXPORT_CHUNK_SIZE = 2000
+"""
+Number of assets fetched from the database at a time when streaming an export of the asset list.
+
+"""
+
+IAR_BULK_MAX_ITEMS = 1000
+"""
+Maximum number of assets which may be created, updated or deleted by one request to the bulk
+endpoint.
+
+"""
+
+IAR_TOKEN_CACHE_ALIAS = 'default'
+"""
+Alias of the cache in the ``CACHES`` setting used to store the results of OAuth2 token
+introspection. Entries are keyed by a hash of the token.
+
+"""
+
+IAR_TOKEN_CACHE_MAX_LIFETIME = 60
+"""
+Maximum time in seconds for which the introspection of an active OAuth2 token is cached. Entries
+never outlive the token's expiry. This bounds how long a revoked token may still be accepted.
+
+"""
+
+IAR_TOKEN_CACHE_NEGATIVE_LIFETIME = 5
+"""
+Time in seconds for which the introspection of an OAuth2 token which is not active is cached.
+
+"""
+
+IAR_HTTP_POOL_SIZE = 10
+"""
+Maximum number of kept-alive connections to each host held by the HTTP session used for requests to
+the OAuth2 endpoints and Lookup. This should be at least the number of threads in each server
+process. Connections beyond this number are closed after use.
+
+"""
+
+IAR_HTTP_CONNECT_TIMEOUT = 5
+"""
+Time in seconds to wait for a connection to the OAuth2 endpoints or Lookup to be made.
+
+"""
+
+IAR_HTTP_READ_TIMEOUT = 10
+"""
+Time in seconds to wait for data from the OAuth2 endpoints or Lookup once connected.
+
+"""
+
+IAR_LOOKUP_PEOPLE_CACHE_GRACE = 900
+"""
+Time in seconds after a cached lookup resource for a person stops being fresh during which it is
+still used while it is refreshed in the background. After this, requests needing the resource wait
+for it to be fetched and fail if lookup cannot be reached.
+
+"""
+
+IAR_LOOKUP_REFRESH_WORKERS = 4
+"""
+Maximum number of lookup resources for people refreshed in the background at once by each server
+process.
+
+"""
+
+IAR_LOOKUP_PREFETCH_WORKERS = 8
+"""
+Default maximum number of lookup resources for people fetched at once when filling the cache ahead
+of need with :py:func:`assets.lookup.prefetch_people` or the ``warm_lookup_cache`` management
+command.
+
+"""
@@ -0,0 +1,75 @@
+"""
+Streaming export of assets as CSV or newline-delimited JSON.
+
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils import encoders
+
+
+def get_export_response(queryset, serializer, export_format):
+    """
+    Return a :py:class:`~django.http.StreamingHttpResponse` with the assets in *queryset*
+    serialised by *serializer*, which must have been created with ``many=True``, in
+    *export_format*, a key of :py:data:`EXPORT_FORMATS`.
+
+    Assets are fetched from the database in chunks of ``IAR_EXPORT_CHUNK_SIZE`` and written as
+    they are fetched and so memory use does not depend on the number of assets and the first bytes
+    are sent once the first chunk has been fetched.
+
+    """
+    content_type, generate = EXPORT_FORMATS[export_format]
+    field_names = list(serializer.child.fields)
+    items = queryset.iterator(chunk_size=settings.IAR_EXPORT_CHUNK_SIZE)
+    rows = (serializer.child.to_representation(item) for item in items)
+
+    response = StreamingHttpResponse(generate(rows, field_names), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="assets.{}"'.format(export_format)
+    return response
+
+
+def generate_csv(rows, field_names):
+    """
+    Generate lines of CSV with a header naming *field_names* followed by one line for each of
+    *rows*, which are serialised assets. Multi-select values are written as comma-separated keys.
+
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(field_names)
+    for row in rows:
+        yield writer.writerow([_csv_value(row.get(name)) for name in field_names])
+
+
+def generate_ndjson(rows, field_names):
+    """Generate one line of JSON for each of *rows*, which are serialised assets."""
+    for row in rows:
+        yield json.dumps(
+            row, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class _Echo:
+    """A file-like object whose write method returns what is written rather than storing it."""
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    """Return the value written to a CSV cell for a serialised field value."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (set, list, tuple)):
+        return ','.join(sorted(str(item) for item in value))
+    return value
+
+
+#: Supported export formats. Maps the format name to the content type of the response and a
+#: function generating the response body from serialised assets and the field names.
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', generate_csv),
+    'ndjson': ('application/x-ndjson; charset=utf-8', generate_ndjson),
+}
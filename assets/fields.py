@@ -0,0 +1,150 @@
+"""
+Custom model fields for the assets application.
+
+"""
+from django.db.models import CharField, Lookup
+from django.db.models.lookups import IContains
+from multiselectfield import MultiSelectField
+
+
+BITMASK_BITS_FUNCTION = 'assets_bitmask_bits'
+"""
+Name of the PostgreSQL function which returns the positions of the bits set in a bitmask as an
+integer array.
+
+"""
+
+
+class ChoiceBitmaskField(MultiSelectField):
+    """
+    A :py:class:`multiselectfield.MultiSelectField` which stores the selected choices as an integer
+    bitmask. The n-th choice is stored as bit n and so new choices must only be added at the end
+    of the choices and choices must never be reordered or removed.
+
+    Values, form fields and validation are the same as for
+    :py:class:`~multiselectfield.MultiSelectField` so serializers and the admin are unaffected.
+    Comparing a field with a list, e.g. ``Q(data_subject=[])``, compares the bitmasks.
+
+    Two lookups are provided which take a list of choice keys:
+
+    ``contains_any``
+        Matches values with at least one of the keys.
+
+    ``contains_all``
+        Matches values with all of the keys.
+
+    Both compile to a bitwise AND of the column with the bitmask of the keys except on PostgreSQL.
+    There, they compile to the ``&&`` and ``@>`` array operators applied to the positions of the
+    set bits, given by the :py:data:`BITMASK_BITS_FUNCTION` SQL function, so that they can use the
+    GIN indexes on that function of each column. See migration ``0022_choice_bitmask_indexes``.
+
+    """
+    def get_internal_type(self):
+        return 'BigIntegerField'
+
+    @property
+    def choice_bits(self):
+        """A dict mapping each choice key to its bit."""
+        return {key: 1 << idx for idx, (key, _) in enumerate(self.flatchoices)}
+
+    def get_bitmask(self, value):
+        """
+        Return the bitmask for *value* which may be None, a comma-separated string of keys or an
+        iterable of keys. Raises ValueError if a key is not a valid choice.
+
+        """
+        if value is None:
+            return 0
+        if isinstance(value, int):
+            return value
+        if isinstance(value, str):
+            value = [key for key in value.split(',') if key != '']
+
+        choice_bits, bitmask = self.choice_bits, 0
+        for key in value:
+            try:
+                bitmask |= choice_bits[str(key)]
+            except KeyError:
+                raise ValueError('{!r} is not a valid choice for {}'.format(key, self.name))
+        return bitmask
+
+    def get_keys(self, bitmask):
+        """Return the list of choice keys whose bits are set in *bitmask* in choice order."""
+        return [key for key, bit in self.choice_bits.items() if bitmask & bit]
+
+    def get_prep_value(self, value):
+        return self.get_bitmask(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        return self.get_bitmask(value)
+
+    def from_db_value(self, value, *args, **kwargs):
+        if value is None:
+            return value
+        return super().from_db_value(','.join(self.get_keys(value)), *args, **kwargs)
+
+    def value_to_string(self, obj):
+        # Serialise as keys rather than as the bitmask so that fixtures are readable.
+        return ','.join(self.get_keys(self.get_bitmask(self.value_from_object(obj))))
+
+
+class _BitmaskLookup(Lookup):
+    """Base class for lookups on a :py:class:`ChoiceBitmaskField` taking a list of choice keys."""
+
+    def get_prep_lookup(self):
+        return self.lhs.output_field.get_bitmask(self.rhs)
+
+    #: Array operator used on PostgreSQL.
+    postgresql_operator = None
+
+    def as_sql(self, compiler, connection):
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        masked_sql = connection.ops.combine_expression('&', [lhs_sql, '%s'])
+        return self.compare(masked_sql, list(lhs_params) + [self.rhs])
+
+    def as_postgresql(self, compiler, connection):
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        bits = [bit for bit in range(self.rhs.bit_length()) if self.rhs & (1 << bit)]
+        return '{}({}) {} %s::integer[]'.format(
+            BITMASK_BITS_FUNCTION, lhs_sql, self.postgresql_operator
+        ), list(lhs_params) + [bits]
+
+
+@ChoiceBitmaskField.register_lookup
+class BitmaskContainsAny(_BitmaskLookup):
+    lookup_name = 'contains_any'
+    postgresql_operator = '&&'
+
+    def compare(self, masked_sql, params):
+        return '({}) <> 0'.format(masked_sql), params
+
+
+@ChoiceBitmaskField.register_lookup
+class BitmaskContainsAll(_BitmaskLookup):
+    lookup_name = 'contains_all'
+    postgresql_operator = '@>'
+
+    def compare(self, masked_sql, params):
+        return '({}) = %s'.format(masked_sql), params + [self.rhs]
+
+
+@CharField.register_lookup
+class ILikeContains(Lookup):
+    """
+    The ``icontains`` lookup expressed with ``ILIKE`` on PostgreSQL. ``icontains`` compares the
+    upper-cased column and so can't use the trigram indexes on the column, which ``ILIKE`` can.
+    See migration ``0016_asset_trigram_indexes``.
+
+    """
+    lookup_name = 'ilike_contains'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        return compiler.compile(IContains(self.lhs, self.rhs))
+
+    def as_postgresql(self, compiler, connection):
+        if not self.rhs_is_direct_value():
+            return self.as_sql(compiler, connection)
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        pattern = '%{}%'.format(connection.ops.prep_for_like_query(self.rhs))
+        return '{} ILIKE %s'.format(lhs_sql), list(lhs_params) + [pattern]
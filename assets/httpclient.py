@@ -0,0 +1,297 @@
+"""
+A pooled HTTP session for the outbound requests which the :py:mod:`assets` application makes to
+the OAuth2 token and introspection endpoints and to Lookup.
+
+Each process has one :py:class:`requests.Session`, returned by :py:func:`get_session`, whose
+connection pools keep connections to these services alive between requests so that each request
+need not make a new TCP connection and TLS handshake. The session is safe to share between
+threads: its connection pools are thread-safe and it does not store cookies. It is created on first
+use in each process so that gunicorn workers do not share the connections of a session created
+before they were forked.
+
+Requests which must be authorised with the API server's own client credentials token are made
+with :py:func:`authenticated_request`. Tokens are managed by a :py:class:`TokenManager` for each
+set of scopes which refreshes the token in the background before it expires.
+
+"""
+import collections
+import http.cookiejar
+import logging
+import os
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+LOG = logging.getLogger(__name__)
+
+#: Backoff factor for retries. Retries after the first wait 0.2s, 0.4s, 0.8s and so on.
+RETRY_BACKOFF_FACTOR = 0.1
+
+#: Tokens are not used when they have less than this many seconds left before they expire.
+TOKEN_EXPIRY_MARGIN = 30
+
+#: Fraction of a token's lifetime after which it is refreshed in the background.
+TOKEN_REFRESH_FRACTION = 0.75
+
+#: Time in seconds after a failed background refresh before another is attempted.
+TOKEN_REFRESH_RETRY_DELAY = 5
+
+#: Lifetime in seconds assumed for tokens whose response from the token endpoint has no
+#: ``expires_in`` field.
+DEFAULT_TOKEN_LIFETIME = 300
+
+
+class ConnectionStats(collections.namedtuple('ConnectionStats', 'requests connections')):
+    """
+    Counts of the requests sent by a session and of the connections opened to send them.
+
+    :ivar int requests: number of requests sent, including retries
+    :ivar int connections: number of new connections opened
+
+    """
+    @property
+    def reused(self):
+        """Number of requests which were sent over a kept-alive connection."""
+        return self.requests - self.connections
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    A :py:class:`requests.adapters.HTTPAdapter` which applies a default timeout to requests which
+    do not specify one and which counts the requests and connections made by its pools.
+
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ['timeout']
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+        return super().send(request, timeout=timeout, **kwargs)
+
+    def get_stats(self):
+        """
+        Return the :py:class:`ConnectionStats` of the connection pools held by this adapter. There
+        is one pool per host and so no pool is discarded while requests are made to fewer hosts
+        than ``pool_connections``.
+
+        """
+        n_requests, n_connections = 0, 0
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                n_requests += pool.num_requests
+                n_connections += pool.num_connections
+        return ConnectionStats(requests=n_requests, connections=n_connections)
+
+
+# The process id and session of the process which created the session.
+_session_state = (None, None)
+_session_lock = threading.Lock()
+
+# Token managers keyed by their scopes.
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+
+def get_session():
+    """Return the pooled :py:class:`requests.Session` for this process."""
+    pid, session = _session_state
+    if pid != os.getpid():
+        session = _create_session()
+    return session
+
+
+def get_connection_stats():
+    """Return the :py:class:`ConnectionStats` of the session for this process."""
+    session = get_session()
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    stats = [adapter.get_stats() for adapter in adapters.values()]
+    return ConnectionStats(
+        requests=sum(s.requests for s in stats), connections=sum(s.connections for s in stats))
+
+
+def close_session():
+    """
+    Close the session for this process and its connections. A new session is created when next
+    needed.
+
+    """
+    global _session_state
+    with _session_lock:
+        pid, session = _session_state
+        _session_state = (None, None)
+    if pid == os.getpid():
+        session.close()
+
+
+def clear_access_tokens():
+    """Forget all access tokens so that they are fetched again when next needed."""
+    with _token_managers_lock:
+        managers = list(_token_managers.values())
+        _token_managers.clear()
+    for manager in managers:
+        manager.join()
+
+
+def authenticated_request(method, url, scopes, **kwargs):
+    """
+    Make a request with the pooled session authorised by the API server's client credentials
+    token for *scopes*. Other arguments are as for :py:meth:`requests.Session.request`.
+
+    """
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers['Authorization'] = 'Bearer ' + get_access_token(scopes)
+    return get_session().request(method, url, headers=headers, **kwargs)
+
+
+def get_access_token(scopes):
+    """
+    Return an access token for *scopes* obtained from ``OAUTH2_TOKEN_URL`` with the client
+    credentials ``OAUTH2_CLIENT_ID`` and ``OAUTH2_CLIENT_SECRET``.
+
+    """
+    return get_token_manager(scopes).get_token()
+
+
+def get_token_manager(scopes):
+    """Return the :py:class:`TokenManager` for *scopes*, creating it if necessary."""
+    key = tuple(scopes)
+    with _token_managers_lock:
+        manager = _token_managers.get(key)
+        if manager is None:
+            manager = _token_managers[key] = TokenManager(scopes)
+    return manager
+
+
+_Token = collections.namedtuple('_Token', 'access_token expires_at refresh_at')
+
+
+class TokenManager:
+    """
+    Manages the API server's client credentials access token for a set of scopes.
+
+    The first call to :py:meth:`get_token` fetches a token and waits for it. Once a token has
+    passed :py:data:`TOKEN_REFRESH_FRACTION` of its lifetime, the next call starts a refresh in a
+    background thread and returns the current token without waiting. A token is only waited for
+    again if none is usable, for example if the process was idle for longer than the remaining
+    lifetime of the token or if refreshing has failed until the token expired.
+
+    Only one token is fetched at a time: callers which need to wait for a token while it is being
+    fetched wait for that fetch rather than starting another.
+
+    :ivar int fetches: number of tokens fetched by this manager
+
+    """
+    def __init__(self, scopes):
+        self.scopes = list(scopes)
+        self.fetches = 0
+        self._token = None
+        self._refreshing = False
+        self._refresh_thread = None
+        self._condition = threading.Condition()
+
+    def get_token(self):
+        """Return a usable access token."""
+        with self._condition:
+            while True:
+                now = time.time()
+                token = self._token
+                if token is not None and now < token.expires_at - TOKEN_EXPIRY_MARGIN:
+                    if now >= token.refresh_at and not self._refreshing:
+                        self._refreshing = True
+                        self._refresh_thread = threading.Thread(
+                            target=self._refresh_in_background, daemon=True)
+                        self._refresh_thread.start()
+                    return token.access_token
+                if not self._refreshing:
+                    break
+                self._condition.wait()
+            self._refreshing = True
+
+        return self._refresh().access_token
+
+    def join(self, timeout=None):
+        """Wait for any background refresh to finish."""
+        thread = self._refresh_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _refresh(self):
+        """Fetch and return a new token. The caller must have set the refreshing flag."""
+        token = None
+        try:
+            access_token, expires_at = fetch_access_token(self.scopes)
+            now = time.time()
+            token = _Token(
+                access_token=access_token, expires_at=expires_at,
+                refresh_at=now + (expires_at - now) * TOKEN_REFRESH_FRACTION)
+            return token
+        finally:
+            with self._condition:
+                if token is not None:
+                    self.fetches += 1
+                    self._token = token
+                elif self._token is not None:
+                    # Keep using the current token, if it is still usable, and try again later.
+                    self._token = self._token._replace(
+                        refresh_at=time.time() + TOKEN_REFRESH_RETRY_DELAY)
+                self._refreshing = False
+                self._condition.notify_all()
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh()
+        except Exception:
+            LOG.exception('Failed to refresh OAuth2 token for scopes %r', self.scopes)
+
+
+def fetch_access_token(scopes):
+    """
+    Fetch a new access token for *scopes* from the token endpoint. Returns an (access token,
+    expiry time) pair. Raises :py:class:`requests.HTTPError` if the request fails.
+
+    """
+    response = get_session().post(
+        settings.OAUTH2_TOKEN_URL,
+        data={'grant_type': 'client_credentials', 'scope': ' '.join(scopes)},
+        auth=(settings.OAUTH2_CLIENT_ID, settings.OAUTH2_CLIENT_SECRET))
+    response.raise_for_status()
+    token = response.json()
+    lifetime = token.get('expires_in', DEFAULT_TOKEN_LIFETIME)
+    return token['access_token'], time.time() + lifetime
+
+
+def _create_session():
+    """Create the session for this process unless another thread has already done so."""
+    global _session_state
+    with _session_lock:
+        pid, session = _session_state
+        if pid == os.getpid():
+            return session
+
+        session = requests.Session()
+        # The session is shared between threads and so must not store state from responses.
+        session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+
+        adapter = PooledHTTPAdapter(
+            timeout=(settings.IAR_HTTP_CONNECT_TIMEOUT, settings.IAR_HTTP_READ_TIMEOUT),
+            pool_maxsize=settings.IAR_HTTP_POOL_SIZE,
+            # Only retry failures to connect, never requests which may have reached the server.
+            max_retries=Retry(
+                total=settings.OAUTH2_MAX_RETRIES, read=False,
+                backoff_factor=RETRY_BACKOFF_FACTOR),
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        _session_state = (os.getpid(), session)
+        return session
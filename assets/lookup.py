@@ -0,0 +1,304 @@
+"""
+Fetching and request-scoped memoisation of Lookup person resources.
+
+A single API request may need the Lookup person resource for the requesting user many times: when
+filtering the queryset, when checking permissions and when computing the allowed methods for each
+serialised asset. :py:func:`get_person_for_request` fetches the resource at most once per request
+and user and records the outcome of each call in a :py:class:`PersonMemo` attached to the request.
+
+Person resources are fetched from Lookup by :py:func:`get_person_for_user` with the pooled HTTP
+session from :py:mod:`assets.httpclient` and cached. A cached resource is fresh for
+:py:attr:`~assets.defaultsettings.LOOKUP_PEOPLE_CACHE_LIFETIME` seconds. For a further
+:py:attr:`~assets.defaultsettings.IAR_LOOKUP_PEOPLE_CACHE_GRACE` seconds it is stale: it is still
+returned but is refreshed in the background. Once past the grace window, a resource is never
+returned and must be fetched again before :py:func:`get_person_for_user` returns. If that fetch
+fails, :py:class:`LookupUnavailable` is raised. Concurrent fetches of the resource for the same
+user in one process are merged into one request to Lookup.
+
+The cache may be filled ahead of need for many users at once by :py:func:`prefetch_people`. A
+resource may be cached directly, e.g. for users without a Lookup identity in tests and
+benchmarks, with :py:func:`set_cached_person_for_user`.
+
+"""
+import collections
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+
+from . import httpclient
+
+LOG = logging.getLogger(__name__)
+
+
+REQUEST_ATTRIBUTE = 'lookup_person_memo'
+"""Name of the request attribute which holds the :py:class:`PersonMemo` for a request."""
+
+
+class PersonMemo:
+    """
+    Memo of Lookup person resources keyed by username.
+
+    :ivar int hits: number of calls answered from the memo
+    :ivar int misses: number of calls which needed :py:func:`get_person_for_user`
+
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._people = {}
+
+    def get_person_for_user(self, user):
+        """
+        Return the Lookup person resource for *user*, calling
+        :py:func:`get_person_for_user` only if it has not been called for
+        this user before.
+
+        """
+        key = getattr(user, 'username', None)
+        if key in self._people:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._people[key] = get_person_for_user(user)
+        return self._people[key]
+
+
+def get_person_memo(request):
+    """Return the :py:class:`PersonMemo` for *request*, creating it if necessary."""
+    memo = getattr(request, REQUEST_ATTRIBUTE, None)
+    if memo is None:
+        memo = PersonMemo()
+        setattr(request, REQUEST_ATTRIBUTE, memo)
+    return memo
+
+
+def get_person_for_request(request):
+    """
+    Return the Lookup person resource for the user making *request*, memoised for the lifetime of
+    the request.
+
+    """
+    return get_person_memo(request).get_person_for_user(request.user)
+
+
+class LookupUnavailable(exceptions.APIException):
+    """
+    Raised when a person resource is needed but Lookup cannot be reached and no resource within
+    the grace window is cached.
+
+    """
+    status_code = 503
+    default_detail = 'Lookup is unavailable.'
+    default_code = 'lookup_unavailable'
+
+
+# A person resource cached with the time until which it is fresh.
+_CachedPerson = collections.namedtuple('_CachedPerson', 'person fresh_until')
+
+# Fetches in progress in this process keyed by username.
+_fetches = {}
+_fetches_lock = threading.Lock()
+
+# The process id and executor of the process which created the executor for background refreshes.
+_executor_state = (None, None)
+_executor_lock = threading.Lock()
+
+
+def get_person_for_user(user):
+    """
+    Return the Lookup person resource, with all institutions and groups, for *user* or None if
+    the user has no associated Lookup identity. Stale resources are returned while they are
+    refreshed in the background. Raises :py:class:`LookupUnavailable` if a resource must be
+    fetched and Lookup cannot be reached.
+
+    """
+    cached = cache.get(get_cache_key(user.username))
+    now = time.time()
+    if cached is not None and now < cached.fresh_until:
+        return cached.person
+
+    identity = _get_identity(user)
+    if identity is None:
+        return None if cached is None else cached.person
+
+    if cached is not None and now < cached.fresh_until + settings.IAR_LOOKUP_PEOPLE_CACHE_GRACE:
+        refresh_person_for_user(user, identity=identity)
+        return cached.person
+
+    future = _start_fetch(user.username, identity, background=False)
+    try:
+        return future.result()
+    except (requests.RequestException, ValueError):
+        raise LookupUnavailable()
+
+
+def refresh_person_for_user(user, identity=None):
+    """
+    Start fetching the Lookup person resource for *user* in a background thread unless it is
+    already being fetched. Returns a :py:class:`concurrent.futures.Future` for the resource or None
+    if the user has no associated Lookup identity.
+
+    """
+    identity = identity or _get_identity(user)
+    if identity is None:
+        return None
+    return _start_fetch(user.username, identity, background=True)
+
+
+class PrefetchResult(collections.namedtuple('PrefetchResult', 'fetched skipped failed')):
+    """
+    The outcome of :py:func:`prefetch_people`.
+
+    :ivar int fetched: number of person resources fetched
+    :ivar int skipped: number of users skipped because they have no Lookup identity or their
+        resource is fresh in the cache
+    :ivar dict failed: exceptions raised when fetching person resources keyed by username
+
+    """
+
+
+def prefetch_people(users, max_workers=None, refresh=False):
+    """
+    Fetch the Lookup person resources for *users* into the cache read by
+    :py:func:`get_person_for_user`. At most *max_workers* resources are fetched at once, by
+    default :py:attr:`~assets.defaultsettings.IAR_LOOKUP_PREFETCH_WORKERS`. Users whose resources
+    are fresh in the cache are skipped unless *refresh* is true. Returns a
+    :py:class:`PrefetchResult`.
+
+    The Lookup identity of each user is read in the calling thread and so *users* should be a
+    queryset using ``select_related('lookup')``.
+
+    """
+    if max_workers is None:
+        max_workers = settings.IAR_LOOKUP_PREFETCH_WORKERS
+
+    pending, n_skipped = [], 0
+    for user in users:
+        identity = _get_identity(user)
+        if identity is None or (not refresh and _is_fresh(user.username)):
+            n_skipped += 1
+        else:
+            pending.append((user.username, identity))
+
+    failed = {}
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='lookup-prefetch') as executor:
+        futures = {
+            executor.submit(_fetch_now, username, identity): username
+            for username, identity in pending
+        }
+        for future in concurrent.futures.as_completed(futures):
+            if future.exception() is not None:
+                failed[futures[future]] = future.exception()
+
+    return PrefetchResult(fetched=len(pending) - len(failed), skipped=n_skipped, failed=failed)
+
+
+def set_cached_person_for_user(user, person):
+    """Cache *person* as the fresh Lookup person resource for *user*."""
+    _cache_person(user.username, person)
+
+
+def clear_cached_person_for_user(user):
+    """Remove any cached Lookup person resource for *user*."""
+    cache.delete(get_cache_key(user.username))
+
+
+def get_cache_key(username):
+    """
+    Return the key of the cached person resource for the user with *username*. This differs
+    from the key used by :py:mod:`automationlookup`, which caches the bare resource, since
+    resources are cached here with the time until which they are fresh.
+
+    """
+    return '{}:lookup:v2'.format(username)
+
+
+def _get_identity(user):
+    """Return the Lookup (scheme, identifier) pair for *user* or None if there is none."""
+    if user.is_anonymous or not hasattr(user, 'lookup'):
+        return None
+    return user.lookup.scheme, user.lookup.identifier
+
+
+def _is_fresh(username):
+    """Return whether the cached person resource for *username* is fresh."""
+    cached = cache.get(get_cache_key(username))
+    return cached is not None and time.time() < cached.fresh_until
+
+
+def _fetch_now(username, identity):
+    """Fetch the person resource in this thread, or wait for a fetch in progress, and return it."""
+    return _start_fetch(username, identity, background=False).result()
+
+
+def _start_fetch(username, identity, background):
+    """
+    Return a :py:class:`concurrent.futures.Future` for the person resource of *username* with the
+    Lookup *identity*. If no fetch is in progress for this user, one is started in a background
+    thread if *background* is true or run in this thread otherwise.
+
+    """
+    with _fetches_lock:
+        future = _fetches.get(username)
+        if future is not None:
+            return future
+        future = _fetches[username] = concurrent.futures.Future()
+
+    if background:
+        _get_executor().submit(_fetch, username, identity, future)
+    else:
+        _fetch(username, identity, future)
+    return future
+
+
+def _fetch(username, identity, future):
+    """Fetch and cache the person resource and set it as the result of *future*."""
+    try:
+        response = httpclient.authenticated_request(
+            'GET', urljoin(settings.LOOKUP_ROOT, 'people/{}/{}'.format(*identity)),
+            settings.OAUTH2_LOOKUP_SCOPES, params={'fetch': 'all_insts,all_groups'})
+        response.raise_for_status()
+        person = response.json()
+        _cache_person(username, person)
+    except BaseException as e:
+        LOG.warning('Failed to fetch Lookup person resource for %s: %s', username, e)
+        future.set_exception(e)
+    else:
+        future.set_result(person)
+    finally:
+        with _fetches_lock:
+            _fetches.pop(username, None)
+
+
+def _cache_person(username, person):
+    """Cache *person* as the fresh person resource for *username*."""
+    cache.set(
+        get_cache_key(username),
+        _CachedPerson(person=person,
+                      fresh_until=time.time() + settings.LOOKUP_PEOPLE_CACHE_LIFETIME),
+        settings.LOOKUP_PEOPLE_CACHE_LIFETIME + settings.IAR_LOOKUP_PEOPLE_CACHE_GRACE)
+
+
+def _get_executor():
+    """Return the executor for background refreshes in this process."""
+    global _executor_state
+    pid, executor = _executor_state
+    if pid == os.getpid():
+        return executor
+    with _executor_lock:
+        pid, executor = _executor_state
+        if pid != os.getpid():
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=settings.IAR_LOOKUP_REFRESH_WORKERS,
+                thread_name_prefix='lookup-refresh')
+            _executor_state = (os.getpid(), executor)
+        return executor
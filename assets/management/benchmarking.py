@@ -0,0 +1,141 @@
+"""
+Helpers shared by the benchmarking management commands. Benchmarks create synthetic data inside a
+transaction which is rolled back afterwards so that they leave the database unchanged.
+
+"""
+import contextlib
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from assets import lookup
+from assets.models import Asset
+from assets.views import AssetViewSet, REQUIRED_SCOPES
+from automationlookup.models import UserLookup
+
+
+#: Department used for the benchmarking user and the first synthetic department.
+BENCHMARK_DEPARTMENT = 'BENCHDEPT0'
+
+#: Words used to build synthetic free text.
+_WORDS = (
+    'research', 'student', 'records', 'finance', 'payroll', 'alumni', 'survey', 'archive',
+    'clinical', 'trial', 'admissions', 'library', 'estates', 'contracts', 'marketing', 'images',
+    'interviews', 'grants', 'examinations', 'timetable', 'server', 'cabinet', 'backup', 'cloud',
+)
+
+
+# Users created by create_benchmark_user whose Lookup person resources are cached.
+_benchmark_users = []
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def rolled_back_transaction():
+    """
+    A context manager which runs its body in a transaction which is always rolled back. The Lookup
+    person resources cached for users created by :py:func:`create_benchmark_user` are removed
+    afterwards.
+
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback()
+    except _Rollback:
+        pass
+    finally:
+        while _benchmark_users:
+            lookup.clear_cached_person_for_user(_benchmark_users.pop())
+
+
+def create_synthetic_assets(count, n_departments=20, seed=0, batch_size=1000):
+    """
+    Create *count* synthetic, non-private assets spread over *n_departments* departments with
+    field values drawn at random from each field's choices.
+
+    """
+    rng = random.Random(seed)
+
+    def text(n_words):
+        return ' '.join(rng.choice(_WORDS) for _ in range(n_words))
+
+    def multi(choices):
+        return [key for key, _ in choices if rng.random() < 0.3]
+
+    assets = []
+    for idx in range(count):
+        assets.append(Asset(
+            name='{} {}'.format(text(3), idx),
+            department='BENCHDEPT{}'.format(idx % n_departments),
+            purpose=rng.choice(Asset.PURPOSE_CHOICES)[0],
+            purpose_other=text(20),
+            owner='crsid{}'.format(rng.randrange(1000)),
+            personal_data=rng.choice([True, False, None]),
+            data_subject=multi(Asset.DATA_SUBJECT_CHOICES),
+            data_category=multi(Asset.DATA_CATEGORY_CHOICES),
+            recipients_outside_uni=rng.choice(Asset.RECIPIENTS_OUTSIDE_CHOICES)[0],
+            recipients_outside_uni_description=text(5),
+            recipients_outside_eea=rng.choice(Asset.RECIPIENTS_OUTSIDE_CHOICES)[0],
+            retention=rng.choice(Asset.RETENTION_CHOICES)[0],
+            risk_type=multi(Asset.RISK_CHOICES),
+            risk_type_additional=text(20),
+            storage_location=text(4),
+            storage_format=multi(Asset.STORAGE_FORMAT_CHOICES),
+            paper_storage_security=multi(Asset.PAPER_STORAGE_SECURITY_CHOICES),
+            digital_storage_security=multi(Asset.DIGITAL_STORAGE_SECURITY_CHOICES),
+        ))
+        if len(assets) >= batch_size:
+            Asset.objects.bulk_create(assets)
+            assets = []
+    Asset.objects.bulk_create(assets)
+
+
+def create_benchmark_user(username='benchmark0001'):
+    """
+    Create a user in the IAR users group and in :py:data:`BENCHMARK_DEPARTMENT` whose Lookup
+    person resource is cached.
+
+    """
+    user = get_user_model().objects.create_user(username=username)
+    UserLookup.objects.create(user=user, scheme='mock', identifier=username)
+    lookup.set_cached_person_for_user(user, {
+        'institutions': [{'instid': BENCHMARK_DEPARTMENT}],
+        'groups': [{'name': settings.IAR_USERS_LOOKUP_GROUP}],
+    })
+    _benchmark_users.append(user)
+    return user
+
+
+def make_asset_view(user, method='get', path='/assets/', data=None, action='list'):
+    """
+    Return an :py:class:`~assets.views.AssetViewSet` instance initialised with a request made by
+    *user* with a token granting the required scopes.
+
+    """
+    django_request = getattr(APIRequestFactory(), method)(path, data)
+    force_authenticate(django_request, user=user, token={'scope': ' '.join(REQUIRED_SCOPES)})
+
+    view = AssetViewSet()
+    view.action_map = {method: action}
+    view.args, view.kwargs, view.format_kwarg = (), {}, None
+    view.request = view.initialize_request(django_request)
+    return view
+
+
+def time_call(func, repeat=5):
+    """Call *func* *repeat* times and return the median wall-clock time in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
@@ -0,0 +1,77 @@
+"""
+Benchmark serialising pages of the asset list, comparing the batched computation of
+``allowed_methods`` with running the permission checks for every asset.
+
+"""
+from django.core.management.base import BaseCommand
+from rest_framework.exceptions import PermissionDenied
+
+from assets.management import benchmarking
+from assets.serializers import AssetSerializer, setting_request_method
+
+
+class UnbatchedAssetSerializer(AssetSerializer):
+    """An AssetSerializer which runs the full permission checks for every asset."""
+    def get_allowed_methods(self, obj):
+        """
+        Retrieve a list of allowed_methods by running the full view permission checks for each
+        method on the object being serialised.
+
+        """
+        # We need a request and view to return a result
+        request = self.context.get('request')
+        view = self.context.get('view')
+        if request is None or view is None:
+            return None
+
+        allowed_methods = []
+        for method in self.ALLOWED_METHODS_CANDIDATES:
+            with setting_request_method(request, method):
+                try:
+                    # We check all the permissions and append the method to the list of allowed
+                    # methods. If we fail any permissions checks, then a PermissionDenied exception
+                    # is thrown which we silently swallow.
+                    view.check_permissions(request)
+                    view.check_object_permissions(request, obj)
+                    allowed_methods.append(method)
+                except PermissionDenied:
+                    pass
+
+        return allowed_methods
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark asset list serialisation against page size. Synthetic data is created in a '
+        'transaction which is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[10, 25, 50, 100, 250])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        page_sizes = options['page_sizes']
+
+        with benchmarking.rolled_back_transaction():
+            benchmarking.create_synthetic_assets(max(page_sizes))
+            user = benchmarking.create_benchmark_user()
+
+            self.stdout.write('{:>10} {:>14} {:>14}'.format(
+                'page size', 'unbatched (ms)', 'batched (ms)'))
+            for page_size in page_sizes:
+                timings = [
+                    benchmarking.time_call(
+                        lambda: self.serialize(serializer_class, user, page_size),
+                        repeat=options['repeat'])
+                    for serializer_class in (UnbatchedAssetSerializer, AssetSerializer)
+                ]
+                self.stdout.write('{:>10} {:>14.1f} {:>14.1f}'.format(
+                    page_size, *(1e3 * timing for timing in timings)))
+
+    @staticmethod
+    def serialize(serializer_class, user, page_size):
+        """Serialise one page of assets as the list view would for a fresh request."""
+        view = benchmarking.make_asset_view(user)
+        page = list(view.get_queryset()[:page_size])
+        return serializer_class(page, many=True, context=view.get_serializer_context()).data
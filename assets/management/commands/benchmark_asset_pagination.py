@@ -0,0 +1,77 @@
+"""
+Benchmark paging through the asset list, comparing Django REST framework's cursor pagination with
+the keyset pagination of :py:class:`assets.pagination.AssetCursorPagination` for each ordering.
+
+"""
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.pagination import CursorPagination
+
+from assets.management import benchmarking
+from assets.pagination import AssetCursorPagination
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the time taken to reach a page of the asset list for each ordering. Synthetic '
+        'data is created in a transaction which is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets', type=int, default=100000)
+        parser.add_argument(
+            '--orderings', nargs='+',
+            default=['-created_at', '-updated_at', 'name', 'department', 'owner', 'purpose'])
+        parser.add_argument('--pages', type=int, default=20,
+                            help='Number of pages to follow from the first page')
+        parser.add_argument('--page-size', type=int, default=25)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        pagination_classes = [('drf', CursorPagination), ('keyset', AssetCursorPagination)]
+
+        with benchmarking.rolled_back_transaction():
+            benchmarking.create_synthetic_assets(options['assets'])
+            user = benchmarking.create_benchmark_user()
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE assets_asset')
+
+            self.stdout.write('{:>20} '.format('ordering') + ' '.join(
+                '{:>16}'.format('{} (ms)'.format(name)) for name, _ in pagination_classes))
+            for ordering in options['orderings']:
+                timings = [
+                    benchmarking.time_call(
+                        lambda: self.walk(pagination_class, user, ordering, options['pages'],
+                                          options['page_size']),
+                        repeat=options['repeat'])
+                    for _, pagination_class in pagination_classes
+                ]
+                self.stdout.write('{:>20} '.format(ordering) + ' '.join(
+                    '{:>16.1f}'.format(1e3 * timing) for timing in timings))
+
+    @staticmethod
+    def walk(pagination_class, user, ordering, pages, page_size):
+        """
+        Fetch the first page of assets ordered by *ordering* and follow the next link *pages*
+        times using *pagination_class*.
+
+        """
+        cursor = None
+        for _ in range(pages + 1):
+            data = {'ordering': ordering}
+            if cursor is not None:
+                data['cursor'] = cursor
+            view = benchmarking.make_asset_view(user, data=data)
+
+            paginator = pagination_class()
+            paginator.page_size = page_size
+            queryset = view.filter_queryset(view.get_queryset())
+            paginator.paginate_queryset(queryset, view.request, view=view)
+
+            next_link = paginator.get_next_link()
+            if next_link is None:
+                break
+            cursor = parse_qs(urlparse(next_link).query)['cursor'][0]
@@ -0,0 +1,57 @@
+"""
+Benchmark searching the asset list, comparing Django REST framework's ``icontains`` search over
+the view's search fields with the full-text search used on PostgreSQL.
+
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.filters import SearchFilter
+
+from assets.management import benchmarking
+from assets.search import FullTextSearchFilter, is_full_text_search_supported
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark asset search against the number of assets. Synthetic data is created in a '
+        'transaction which is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets', type=int, default=100000)
+        parser.add_argument('--terms', nargs='+', default=['records', 'clinical trial', 'arch'])
+        parser.add_argument('--page-size', type=int, default=25)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        filter_classes = [('icontains', SearchFilter)]
+        if is_full_text_search_supported(connection.alias):
+            filter_classes.append(('full-text', FullTextSearchFilter))
+        else:
+            self.stdout.write('Full-text search requires PostgreSQL; timing icontains only.')
+
+        with benchmarking.rolled_back_transaction():
+            benchmarking.create_synthetic_assets(options['assets'])
+            user = benchmarking.create_benchmark_user()
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE assets_asset')
+
+            self.stdout.write('{:>20} '.format('terms') + ' '.join(
+                '{:>16}'.format('{} (ms)'.format(name)) for name, _ in filter_classes))
+            for terms in options['terms']:
+                timings = [
+                    benchmarking.time_call(
+                        lambda: self.search(filter_class, user, terms, options['page_size']),
+                        repeat=options['repeat'])
+                    for _, filter_class in filter_classes
+                ]
+                self.stdout.write('{:>20} '.format(terms) + ' '.join(
+                    '{:>16.1f}'.format(1e3 * timing) for timing in timings))
+
+    @staticmethod
+    def search(filter_class, user, terms, page_size):
+        """Fetch the first page of results of searching for *terms* with *filter_class*."""
+        view = benchmarking.make_asset_view(user, data={'search': terms})
+        queryset = filter_class().filter_queryset(view.request, view.get_queryset(), view)
+        return list(queryset.order_by('-created_at')[:page_size])
@@ -0,0 +1,29 @@
+"""
+Check that the stored ``is_complete`` column agrees with the completeness condition.
+
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.models import Asset
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the stored is_complete flag of every asset matches the completeness '
+        'condition. Exits with an error if any do not.'
+    )
+
+    def handle(self, *args, **options):
+        inconsistent = list(
+            Asset.objects.inconsistent_is_complete().values_list('pk', 'is_complete')
+        )
+
+        for pk, is_complete in inconsistent:
+            self.stdout.write('{}: stored is_complete is {}'.format(pk, is_complete))
+
+        if len(inconsistent) > 0:
+            raise CommandError(
+                '{} asset(s) have an inconsistent is_complete flag. Run the '
+                'update_is_complete command to fix them.'.format(len(inconsistent)))
+
+        self.stdout.write('All assets have a consistent is_complete flag.')
@@ -0,0 +1,258 @@
+"""
+Import assets from a CSV, JSON or newline-delimited JSON file.
+
+"""
+import concurrent.futures
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework import fields
+
+from assets.models import Asset, AssetQuerySet
+from assets.serializers import AssetSerializer
+
+
+#: Input formats and the file extensions which imply them.
+FORMATS = {'.csv': 'csv', '.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+#: Size of the chunks read from JSON files.
+_JSON_CHUNK_SIZE = 64 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Import assets from a CSV file with a header row, a JSON file holding a list of assets or '
+        'a newline-delimited JSON file. Files in the format written by the export endpoint can be '
+        'imported. Each asset is validated with AssetSerializer and valid assets are inserted in '
+        'batches. Invalid assets are reported and skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import or - to read standard input')
+        parser.add_argument(
+            '--format', choices=sorted(set(FORMATS.values())),
+            help='Format of the file. By default, this is given by the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of assets inserted by each query')
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording the number of input records processed after each batch. If it '
+                 'exists, the import resumes after the records it records. Assets imported with '
+                 'a checkpoint are given ids derived from their position in the input so that '
+                 'a batch imported before an interruption is not imported again on resuming')
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help='Number of processes used to validate assets. By default, assets are validated '
+                 'in this process')
+
+    def handle(self, *args, **options):
+        input_format = options['format'] or FORMATS.get(os.path.splitext(options['path'])[1])
+        if input_format is None:
+            raise CommandError('Cannot determine the format of {}; use --format.'.format(
+                options['path']))
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        checkpoint, import_id, n_skipped = options['checkpoint'], None, 0
+        if checkpoint is not None:
+            n_skipped, import_id = read_checkpoint(checkpoint)
+            # The import id must be recorded before any asset derives its id from it.
+            write_checkpoint(checkpoint, n_skipped, import_id)
+        if n_skipped:
+            self.stdout.write('Resuming after {} record(s).'.format(n_skipped))
+
+        executor = None
+        if options['workers'] > 0:
+            # Worker processes must not share the database connections of this process.
+            connections.close_all()
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=options['workers'])
+
+        if options['path'] == '-':
+            stream = sys.stdin
+        else:
+            stream = open(options['path'], newline='' if input_format == 'csv' else None,
+                          encoding='utf8')
+
+        n_records, n_imported, n_invalid = n_skipped, 0, 0
+        start = time.perf_counter()
+        try:
+            records = itertools.islice(read_records(stream, input_format), n_skipped, None)
+            while True:
+                batch = list(itertools.islice(records, options['batch_size']))
+                if not batch:
+                    break
+
+                if executor is not None:
+                    results = executor.map(
+                        validate_record, batch,
+                        chunksize=max(1, len(batch) // (4 * options['workers'])))
+                else:
+                    results = map(validate_record, batch)
+
+                assets = []
+                for idx, (validated_data, errors) in enumerate(results):
+                    if errors is not None:
+                        n_invalid += 1
+                        self.stderr.write('Record {}: {}'.format(
+                            n_records + idx + 1, json.dumps(errors)))
+                        continue
+                    asset = Asset(**validated_data)
+                    if import_id is not None:
+                        asset.id = record_asset_id(import_id, n_records + idx)
+                    assets.append(asset)
+
+                # The checkpoint is written once the batch is committed and so if the import was
+                # interrupted in between, the first batch after the checkpoint may already have
+                # been imported. Its assets are recognised by their ids and skipped.
+                if import_id is not None and n_records == n_skipped:
+                    assets = exclude_existing(assets)
+
+                Asset.objects.bulk_create(assets)
+                n_records += len(batch)
+                n_imported += len(assets)
+                if checkpoint is not None:
+                    write_checkpoint(checkpoint, n_records, import_id)
+
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    'Imported {} asset(s) from {} record(s) ({:.0f} assets/s).'.format(
+                        n_imported, n_records, n_imported / elapsed if elapsed > 0 else 0))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            'Done: imported {} asset(s), skipped {} invalid record(s) in {:.1f}s '
+            '({:.0f} assets/s).'.format(
+                n_imported, n_invalid, elapsed, n_imported / elapsed if elapsed > 0 else 0))
+
+
+def validate_record(record):
+    """
+    Validate *record*, a dict of field values, with
+    :py:class:`~assets.serializers.AssetSerializer`. Returns a (validated_data, errors) pair where
+    one of the pair is None. This is a module-level function so that it can be run in worker
+    processes.
+
+    """
+    serializer = AssetSerializer(data=record, context={})
+    if not serializer.is_valid():
+        return None, serializer.errors
+    return dict(serializer.validated_data), None
+
+
+def read_records(stream, input_format):
+    """Generate the records in *stream* as dicts of field values."""
+    if input_format == 'csv':
+        return _read_csv_records(stream)
+    if input_format == 'ndjson':
+        return (json.loads(line) for line in stream if line.strip() != '')
+    return _read_json_array(stream)
+
+
+def record_asset_id(import_id, record_idx):
+    """Return the id of the asset imported from the record at index *record_idx* of the input."""
+    return uuid.uuid5(import_id, str(record_idx))
+
+
+def exclude_existing(assets):
+    """Return the assets in the list *assets* whose ids are not in the database."""
+    existing = set()
+    for idx in range(0, len(assets), AssetQuerySet.BATCH_SIZE):
+        existing.update(Asset.objects.filter(pk__in=[
+            asset.id for asset in assets[idx:idx + AssetQuerySet.BATCH_SIZE]
+        ]).values_list('pk', flat=True))
+    return [asset for asset in assets if asset.id not in existing]
+
+
+def read_checkpoint(path):
+    """
+    Return the number of records and the import id recorded by the checkpoint file at *path*. If
+    there is no file, the number of records is 0. If no import id is recorded, a new one is
+    returned.
+
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+        n_records = checkpoint['records']
+        import_id = checkpoint.get('import_id')
+        return n_records, uuid.uuid4() if import_id is None else uuid.UUID(import_id)
+    except FileNotFoundError:
+        return 0, uuid.uuid4()
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise CommandError('Invalid checkpoint file {}: {}'.format(path, e))
+
+
+def write_checkpoint(path, n_records, import_id):
+    """
+    Atomically record that *n_records* records have been processed by the import with
+    *import_id* in the file at *path*.
+
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'records': n_records, 'import_id': str(import_id)}, f)
+    os.replace(tmp_path, path)
+
+
+def _read_csv_records(stream):
+    """
+    Generate records from CSV with a header row. Empty cells are read as null and multi-select
+    fields as comma-separated lists of keys.
+
+    """
+    multi_select_fields = {
+        name for name, field in AssetSerializer(context={}).fields.items()
+        if isinstance(field, fields.MultipleChoiceField)
+    }
+    for row in csv.DictReader(stream):
+        record = {}
+        for name, value in row.items():
+            if name in multi_select_fields:
+                record[name] = [key for key in value.split(',') if key != '']
+            else:
+                record[name] = None if value == '' else value
+        yield record
+
+
+def _read_json_array(stream):
+    """Generate the items of a JSON array read from *stream* in chunks."""
+    decoder = json.JSONDecoder()
+    buffer, pos, started = '', 0, False
+    while True:
+        # Skip whitespace and the separators between items.
+        while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+            pos += 1
+        if pos < len(buffer) and not started:
+            if buffer[pos] != '[':
+                raise CommandError('Expected a JSON list of assets.')
+            started, pos = True, pos + 1
+            continue
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except ValueError as e:
+            # The buffer may hold an incomplete item.
+            chunk = stream.read(_JSON_CHUNK_SIZE)
+            if chunk == '':
+                if buffer[pos:].strip() == '':
+                    raise CommandError('Unexpected end of JSON input.')
+                raise CommandError('Invalid JSON: {}'.format(e))
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        yield item
+        pos = end
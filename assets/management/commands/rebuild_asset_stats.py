@@ -0,0 +1,16 @@
+"""
+Recompute the per-department asset statistics from scratch.
+
+"""
+from django.core.management.base import BaseCommand
+
+from assets.models import DepartmentAssetStats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-department asset statistics summary table from the assets.'
+
+    def handle(self, *args, **options):
+        DepartmentAssetStats.objects.rebuild()
+        self.stdout.write('Rebuilt statistics for {} department(s).'.format(
+            DepartmentAssetStats.objects.count()))
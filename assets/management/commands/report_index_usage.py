@@ -0,0 +1,64 @@
+"""
+Report how the indexes on the assets application's tables are used on PostgreSQL.
+
+"""
+import math
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+INDEX_USAGE_SQL = '''
+SELECT s.relname, s.indexrelname, s.indexrelid, s.idx_scan, s.idx_tup_read,
+       pg_relation_size(s.indexrelid), am.amname, i.indisunique
+FROM pg_stat_user_indexes s
+JOIN pg_index i ON i.indexrelid = s.indexrelid
+JOIN pg_class c ON c.oid = s.indexrelid
+JOIN pg_am am ON am.oid = c.relam
+WHERE s.relname = ANY(%s)
+ORDER BY s.relname, s.idx_scan, s.indexrelname
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Report the number of scans, size and bloat of each index on the assets tables from '
+        'pg_stat_user_indexes. Bloat is only reported for b-tree indexes if the pgstattuple '
+        'extension is installed. Usage counts are since the statistics were last reset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--unused', action='store_true',
+            help='Only report indexes which have never been scanned and do not enforce uniqueness')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Index usage can only be reported on PostgreSQL.')
+
+        tables = [model._meta.db_table for model in apps.get_app_config('assets').get_models()]
+
+        with connection.cursor() as cursor:
+            cursor.execute(INDEX_USAGE_SQL, [tables])
+            rows = cursor.fetchall()
+
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple'")
+            has_pgstattuple = cursor.fetchone() is not None
+
+            self.stdout.write('{:<24} {:<48} {:>10} {:>12} {:>10} {:>8}'.format(
+                'table', 'index', 'scans', 'tuples read', 'size (kB)', 'bloat %'))
+            for table, index, index_oid, scans, tuples_read, size, method, unique in rows:
+                if options['unused'] and (scans > 0 or unique):
+                    continue
+
+                bloat = None
+                if has_pgstattuple and method == 'btree':
+                    cursor.execute(
+                        'SELECT 100 - avg_leaf_density FROM pgstatindex(%s::regclass)',
+                        [index_oid])
+                    bloat = cursor.fetchone()[0]
+
+                self.stdout.write('{:<24} {:<48} {:>10} {:>12} {:>10} {:>8}'.format(
+                    table, index, scans, tuples_read, size // 1024,
+                    'n/a' if bloat is None or math.isnan(bloat) else '{:.1f}'.format(bloat)))
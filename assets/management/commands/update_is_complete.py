@@ -0,0 +1,15 @@
+"""
+Recompute the stored ``is_complete`` column for all assets.
+
+"""
+from django.core.management.base import BaseCommand
+
+from assets.models import Asset
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored is_complete flag for every asset.'
+
+    def handle(self, *args, **options):
+        n_updated = Asset.objects.all().refresh_is_complete()
+        self.stdout.write('Updated is_complete for {} asset(s).'.format(n_updated))
@@ -0,0 +1,54 @@
+"""
+Fill the cache of Lookup person resources ahead of need.
+
+"""
+import datetime
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from assets.lookup import prefetch_people
+
+
+class Command(BaseCommand):
+    help = (
+        'Fetch the Lookup person resources for the given users, or for all users who have logged '
+        'in recently, into the cache used by the API. Resources are fetched in parallel. Users '
+        'whose resources are fresh in the cache are skipped unless --refresh is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Users to fetch resources for')
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='If no users are given, fetch resources for users who have logged in within '
+                 'this many days')
+        parser.add_argument(
+            '--workers', type=int,
+            help='Maximum number of resources fetched at once. By default, this is the '
+                 'IAR_LOOKUP_PREFETCH_WORKERS setting')
+        parser.add_argument('--refresh', action='store_true',
+                            help='Fetch resources which are fresh in the cache')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(lookup__isnull=False).select_related('lookup')
+        if options['usernames']:
+            users = list(users.filter(username__in=options['usernames']))
+            missing = set(options['usernames']) - {user.username for user in users}
+            for username in sorted(missing):
+                self.stderr.write('{}: no such user with a Lookup identity'.format(username))
+        else:
+            users = users.filter(
+                last_login__gte=timezone.now() - datetime.timedelta(days=options['days']))
+
+        start = time.perf_counter()
+        result = prefetch_people(users, max_workers=options['workers'], refresh=options['refresh'])
+        elapsed = time.perf_counter() - start
+
+        for username, exception in sorted(result.failed.items()):
+            self.stderr.write('{}: {}'.format(username, exception))
+        self.stdout.write(
+            'Fetched {} resource(s), skipped {} and failed to fetch {} in {:.1f}s.'.format(
+                result.fetched, result.skipped, len(result.failed), elapsed))
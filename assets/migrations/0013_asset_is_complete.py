@@ -0,0 +1,50 @@
+from django.db import migrations, models
+from django.db.models import Case, When, Q, BooleanField, Value
+
+
+def populate_is_complete(apps, schema_editor):
+    """
+    Compute the new is_complete column for existing assets. The completeness condition is copied
+    here as it stood when this migration was written so that later changes to the model don't
+    affect it.
+
+    """
+    Asset = apps.get_model('assets', 'Asset')
+    Asset.objects.update(is_complete=Case(When(Q(
+        Q(name__isnull=False),
+        Q(department__isnull=False),
+        Q(purpose__isnull=False),
+        Q(Q(purpose='research', owner__isnull=False) | ~Q(purpose='research')),
+        Q(Q(purpose='other', purpose_other__isnull=False) | ~Q(purpose='other')),
+        Q(Q(personal_data=False) |
+          Q(Q(personal_data=True), ~Q(data_subject=[]), ~Q(data_category=[]),
+            recipients_outside_uni__isnull=False, recipients_outside_eea__isnull=False,
+            retention__isnull=False)),
+        Q(Q(recipients_outside_uni='yes', recipients_outside_uni_description__isnull=False) |
+          ~Q(recipients_outside_uni='yes')),
+        Q(Q(recipients_outside_eea='yes', recipients_outside_eea_description__isnull=False) |
+          ~Q(recipients_outside_eea='yes')),
+        ~Q(risk_type=[]),
+        Q(storage_location__isnull=False),
+        ~Q(storage_format=[]),
+        Q(~Q(storage_format__contains='paper') |
+          Q(Q(storage_format__contains='paper'), ~Q(paper_storage_security=[]))),
+        Q(~Q(storage_format__contains='digital') |
+          Q(Q(storage_format__contains='digital'), ~Q(digital_storage_security=[])))),
+        then=Value(True)), default=Value(False), output_field=BooleanField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0012_auto_20180424_1049'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='is_complete',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.RunPython(populate_is_complete, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_department_asset_stats(apps, schema_editor):
+    """Compute the initial per-department statistics from the existing assets."""
+    Asset = apps.get_model('assets', 'Asset')
+    DepartmentAssetStats = apps.get_model('assets', 'DepartmentAssetStats')
+    rows = Asset.objects.filter(deleted_at__isnull=True).values('department').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(is_complete=True)),
+        with_personal_data=Count('id', filter=Q(personal_data=True)),
+    ).order_by('department')
+    DepartmentAssetStats.objects.bulk_create([DepartmentAssetStats(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0013_asset_is_complete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentAssetStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False,
+                                        verbose_name='ID')),
+                ('department', models.CharField(blank=True, max_length=255, null=True,
+                                                unique=True)),
+                ('total', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('with_personal_data', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_department_asset_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+"""
+Add a full-text search vector to the asset table on PostgreSQL. The column is maintained by a
+trigger and indexed with a GIN index. It is not part of the Asset model. On other databases this
+migration does nothing.
+
+"""
+from django.db import migrations
+
+
+# Searchable columns and the weight each is given in the search vector.
+SEARCH_COLUMNS = [
+    ('name', 'A'),
+    ('department', 'B'), ('owner', 'B'), ('storage_location', 'B'),
+    ('purpose_other', 'C'), ('recipients_outside_uni_description', 'C'),
+    ('recipients_outside_eea_description', 'C'), ('risk_type_additional', 'C'),
+    ('purpose', 'D'), ('data_subject', 'D'), ('data_category', 'D'), ('retention', 'D'),
+    ('risk_type', 'D'), ('storage_format', 'D'), ('paper_storage_security', 'D'),
+    ('digital_storage_security', 'D'),
+]
+
+FORWARD_SQL = [
+    'ALTER TABLE assets_asset ADD COLUMN search_vector tsvector',
+    '''
+    CREATE FUNCTION assets_asset_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    '''.format(' || '.join(
+        "setweight(to_tsvector('pg_catalog.english', coalesce(NEW.{}, '')), '{}')".format(
+            column, weight)
+        for column, weight in SEARCH_COLUMNS
+    )),
+    '''
+    CREATE TRIGGER assets_asset_search_vector_update BEFORE INSERT OR UPDATE
+    ON assets_asset FOR EACH ROW EXECUTE PROCEDURE assets_asset_search_vector_update()
+    ''',
+    # Fire the trigger for existing rows.
+    'UPDATE assets_asset SET id = id',
+    'CREATE INDEX assets_asset_search_vector_gin ON assets_asset USING gin (search_vector)',
+]
+
+REVERSE_SQL = [
+    'DROP INDEX assets_asset_search_vector_gin',
+    'DROP TRIGGER assets_asset_search_vector_update ON assets_asset',
+    'DROP FUNCTION assets_asset_search_vector_update()',
+    'ALTER TABLE assets_asset DROP COLUMN search_vector',
+]
+
+
+def run_sql_on_postgresql(statements):
+    """Return a RunPython function which executes *statements* only on PostgreSQL."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0014_departmentassetstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql_on_postgresql(FORWARD_SQL),
+                             run_sql_on_postgresql(REVERSE_SQL)),
+    ]
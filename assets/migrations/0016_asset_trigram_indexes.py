@@ -0,0 +1,41 @@
+"""
+Add trigram indexes used by the type-ahead endpoint on PostgreSQL. These support ILIKE substring
+matches and similarity ranking. On other databases this migration does nothing.
+
+"""
+from django.db import migrations
+
+
+TRIGRAM_COLUMNS = ['name', 'owner', 'department', 'storage_location']
+
+FORWARD_SQL = ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+    'CREATE INDEX assets_asset_{0}_trgm ON assets_asset USING gin ({0} gin_trgm_ops)'.format(
+        column)
+    for column in TRIGRAM_COLUMNS
+]
+
+REVERSE_SQL = [
+    'DROP INDEX assets_asset_{}_trgm'.format(column) for column in TRIGRAM_COLUMNS
+]
+
+
+def run_sql_on_postgresql(statements):
+    """Return a RunPython function which executes *statements* only on PostgreSQL."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0015_asset_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql_on_postgresql(FORWARD_SQL),
+                             run_sql_on_postgresql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,244 @@
+"""
+Store the multi-select fields as integer bitmasks with ChoiceBitmaskField. The n-th choice of each
+field is stored as bit n. Their b-tree indexes, which are of no use for set membership queries,
+are dropped.
+
+On PostgreSQL, the columns are converted in a single ALTER TABLE statement so that the table is
+rewritten once. The search vector trigger function no longer reads these columns since choices
+are searched by their labels and the same statement recomputes the search vector of each row. On
+other databases, the keys in each row are replaced by their bitmask before the column types are
+changed.
+
+"""
+from django.db import migrations
+
+import assets.fields
+import multiselectfield.db.fields
+
+
+# Multi-select columns, their maximum lengths and choices.
+MULTI_SELECT_COLUMNS = [
+    ('data_subject', 55, [
+        ('students', 'Students, applicants'), ('staff', 'Staff, job applicants'),
+        ('alumni', 'Alumni, supporters'), ('research', 'Research participants'),
+        ('patients', 'Patients'),
+        ('supplier', 'Suppliers, professional advisers and consultants'),
+        ('public', 'Members of public')]),
+    ('data_category', 160, [
+        ('education', 'Education records'), ('alumni', 'Alumni records'),
+        ('contact', 'Basic contact details'), ('employment', 'Employment records'),
+        ('financial', 'Financial details'), ('social', 'Lifestyle and social circumstances'),
+        ('visual', 'Visual images'), ('research', 'Research data'),
+        ('medical', 'Medical records'), ('children', 'Personal data about children under 16'),
+        ('racial', 'Racial or ethic origin'), ('political', 'Political opinions'),
+        ('unions', 'Trade union membership'), ('religious', 'Religious or similar beliefs'),
+        ('health', 'Physical or mental health details'),
+        ('sexual', 'Sexual life and orientation'), ('genetic', 'Genetic information'),
+        ('biometric', 'Biometric information'),
+        ('criminal', 'Criminal proceedings, outcomes and sentences')]),
+    ('risk_type', 57, [
+        ('financial', 'Financial'), ('operational', 'Operational'),
+        ('compliance', 'Compliance'), ('reputational', 'Reputational'),
+        ('safety', 'Personal Safety'), ('none', 'None of the above')]),
+    ('storage_format', 13, [('digital', 'Digital'), ('paper', 'Paper')]),
+    ('paper_storage_security', 52, [
+        ('locked_cabinet', 'Locked filing cabinet'), ('safe', 'Safe'),
+        ('locked_room', 'Locked room'), ('locked_building', 'Locked building'),
+        ('none', 'None of the above')]),
+    ('digital_storage_security', 39, [
+        ('pwd_controls', 'Password controls'), ('acl', 'Access control lists'),
+        ('backup', 'Backup'), ('encryption', 'Encryption'), ('none', 'None of the above')]),
+]
+
+MULTI_SELECT_COLUMN_NAMES = {column for column, _, _ in MULTI_SELECT_COLUMNS}
+
+# Searchable columns and their weights as in 0015_asset_search_vector.
+SEARCH_COLUMNS = [
+    ('name', 'A'),
+    ('department', 'B'), ('owner', 'B'), ('storage_location', 'B'),
+    ('purpose_other', 'C'), ('recipients_outside_uni_description', 'C'),
+    ('recipients_outside_eea_description', 'C'), ('risk_type_additional', 'C'),
+    ('purpose', 'D'), ('data_subject', 'D'), ('data_category', 'D'), ('retention', 'D'),
+    ('risk_type', 'D'), ('storage_format', 'D'), ('paper_storage_security', 'D'),
+    ('digital_storage_security', 'D'),
+]
+
+
+def bitmask_sql(column, choices):
+    """Return a PostgreSQL expression for the bitmask of the comma-separated keys in *column*."""
+    return '({})::bigint'.format(' | '.join(
+        "(CASE WHEN strpos(',' || coalesce({}, '') || ',', ',{},') > 0 THEN {} ELSE 0 END)".format(
+            column, key, 1 << idx)
+        for idx, (key, _) in enumerate(choices)
+    ))
+
+
+def keys_sql(column, choices):
+    """Return a PostgreSQL expression for the comma-separated keys of the bitmask in *column*."""
+    return "array_to_string(ARRAY[{}]::text[], ',')".format(', '.join(
+        "CASE WHEN {} & {} <> 0 THEN '{}' END".format(column, 1 << idx, key)
+        for idx, (key, _) in enumerate(choices)
+    ))
+
+
+def search_vector_sql(column_sql):
+    """
+    Return a PostgreSQL expression for the search vector. *column_sql* maps the name of each
+    searched column to an expression for its text.
+
+    """
+    return ' || '.join(
+        "setweight(to_tsvector('pg_catalog.english', coalesce({}, '')), '{}')".format(
+            column_sql[column], weight)
+        for column, weight in SEARCH_COLUMNS if column in column_sql
+    )
+
+
+def search_vector_function_sql(column_sql):
+    """
+    Return SQL defining the search vector trigger function for the expressions in *column_sql*
+    as passed to :py:func:`search_vector_sql`.
+
+    """
+    return '''
+    CREATE OR REPLACE FUNCTION assets_asset_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    '''.format(search_vector_sql(column_sql))
+
+
+# The columns other than the multi-select columns are searched as they are.
+TEXT_SEARCH_COLUMNS = [
+    column for column, _ in SEARCH_COLUMNS if column not in MULTI_SELECT_COLUMN_NAMES
+]
+
+# A change of column type does not fire the trigger and so the search vector is recomputed by the
+# same statement. Expressions in the USING clauses refer to the columns before the change.
+FORWARD_SQL = [
+    search_vector_function_sql({column: 'NEW.' + column for column in TEXT_SEARCH_COLUMNS}),
+    'ALTER TABLE assets_asset {}'.format(', '.join([
+        'ALTER COLUMN {} TYPE bigint USING {}'.format(column, bitmask_sql(column, choices))
+        for column, _, choices in MULTI_SELECT_COLUMNS
+    ] + [
+        'ALTER COLUMN search_vector TYPE tsvector USING {}'.format(search_vector_sql({
+            column: column for column in TEXT_SEARCH_COLUMNS
+        })),
+    ])),
+]
+
+REVERSE_SQL = [
+    search_vector_function_sql({column: 'NEW.' + column for column, _ in SEARCH_COLUMNS}),
+    'ALTER TABLE assets_asset {}'.format(', '.join([
+        'ALTER COLUMN {} TYPE varchar({}) USING {}'.format(
+            column, length, keys_sql(column, choices))
+        for column, length, choices in MULTI_SELECT_COLUMNS
+    ] + [
+        'ALTER COLUMN search_vector TYPE tsvector USING {}'.format(search_vector_sql(dict(
+            [(column, column) for column in TEXT_SEARCH_COLUMNS] +
+            [(column, keys_sql(column, choices)) for column, _, choices in MULTI_SELECT_COLUMNS]
+        ))),
+    ])),
+]
+
+
+def bitmask_field(model, column, length, choices):
+    """Return the ChoiceBitmaskField for *column* of *model*."""
+    field = assets.fields.ChoiceBitmaskField(
+        blank=True, choices=choices, max_length=length, null=True)
+    field.set_attributes_from_name(column)
+    field.model = model
+    return field
+
+
+def rewrite_columns(schema_editor, convert):
+    """
+    Replace the value of each multi-select column in every row with the result of calling
+    *convert* with its choices and the value.
+
+    """
+    quote_name = schema_editor.connection.ops.quote_name
+    columns = ', '.join(quote_name(column) for column, _, _ in MULTI_SELECT_COLUMNS)
+    assignments = ', '.join(
+        '{} = %s'.format(quote_name(column)) for column, _, _ in MULTI_SELECT_COLUMNS)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT id, {} FROM assets_asset'.format(columns))
+        for pk, *values in cursor.fetchall():
+            cursor.execute('UPDATE assets_asset SET {} WHERE id = %s'.format(assignments), [
+                convert(choices, value)
+                for (_, _, choices), value in zip(MULTI_SELECT_COLUMNS, values)
+            ] + [pk])
+
+
+def keys_to_bitmask(choices, value):
+    """Return the bitmask of the comma-separated keys in *value*, ignoring unknown keys."""
+    keys = set((value or '').split(','))
+    return sum(1 << idx for idx, (key, _) in enumerate(choices) if key in keys)
+
+
+def bitmask_to_keys(choices, value):
+    """Return the comma-separated keys of the bitmask in *value*."""
+    return ','.join(
+        key for idx, (key, _) in enumerate(choices) if int(value or 0) & (1 << idx))
+
+
+def convert_to_bitmasks(apps, schema_editor):
+    """Convert the multi-select columns from comma-separated keys to bitmasks."""
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in FORWARD_SQL:
+            schema_editor.execute(statement)
+        return
+
+    Asset = apps.get_model('assets', 'Asset')
+    rewrite_columns(schema_editor, keys_to_bitmask)
+    for column, length, choices in MULTI_SELECT_COLUMNS:
+        schema_editor.alter_field(
+            Asset, Asset._meta.get_field(column), bitmask_field(Asset, column, length, choices))
+
+
+def convert_to_keys(apps, schema_editor):
+    """Convert the multi-select columns from bitmasks to comma-separated keys."""
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in REVERSE_SQL:
+            schema_editor.execute(statement)
+        return
+
+    Asset = apps.get_model('assets', 'Asset')
+    for column, length, choices in MULTI_SELECT_COLUMNS:
+        schema_editor.alter_field(
+            Asset, bitmask_field(Asset, column, length, choices), Asset._meta.get_field(column))
+    rewrite_columns(schema_editor, bitmask_to_keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0016_asset_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asset',
+            name=column,
+            field=multiselectfield.db.fields.MultiSelectField(
+                blank=True, choices=choices, max_length=length, null=True),
+        )
+        for column, length, choices in MULTI_SELECT_COLUMNS
+    ] + [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(convert_to_bitmasks, convert_to_keys),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='asset',
+                    name=column,
+                    field=assets.fields.ChoiceBitmaskField(
+                        blank=True, choices=choices, max_length=length, null=True),
+                )
+                for column, length, choices in MULTI_SELECT_COLUMNS
+            ],
+        ),
+    ]
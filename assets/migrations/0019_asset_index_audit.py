@@ -0,0 +1,111 @@
+"""
+Drop single-column indexes which no query uses and add partial indexes on non-deleted assets
+matching the queries made by the API.
+
+"""
+from django.db import migrations, models
+
+
+# Partial indexes on non-deleted assets as (name, columns).
+PARTIAL_INDEXES = [
+    ('assets_asset_live_department', 'department'),
+    ('assets_asset_live_created_at', 'created_at'),
+    ('assets_asset_live_private', 'private'),
+    # Matches "private = false OR (private = true AND department IN (...))" ordered by creation.
+    ('assets_asset_live_privacy', 'private, department, created_at'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0018_choice_bitmask_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asset',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='department',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='is_complete',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='personal_data',
+            field=models.NullBooleanField(),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='private',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='purpose_other',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='recipients_outside_eea',
+            field=models.CharField(
+                blank=True, choices=[('yes', 'Yes'), ('no', 'No'), ('not_sure', 'Not Sure')],
+                max_length=8, null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='recipients_outside_eea_description',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='recipients_outside_uni',
+            field=models.CharField(
+                blank=True, choices=[('yes', 'Yes'), ('no', 'No'), ('not_sure', 'Not Sure')],
+                max_length=8, null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='recipients_outside_uni_description',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='retention',
+            field=models.CharField(blank=True, choices=[('<1', 'Less than 1 year'),
+                                                        ('>=1,<=5', '1 to 5 years'),
+                                                        ('>5,<=10', '5 to 10 years'),
+                                                        ('>10,<=75', '10 to 75 years'),
+                                                        ('forever', 'Forever')],
+                                   max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='risk_type_additional',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='storage_location',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='asset',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ] + [
+        migrations.RunSQL(
+            'CREATE INDEX {} ON assets_asset ({}) WHERE deleted_at IS NULL'.format(name, columns),
+            'DROP INDEX {}'.format(name),
+        )
+        for name, columns in PARTIAL_INDEXES
+    ]
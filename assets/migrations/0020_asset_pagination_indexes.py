@@ -0,0 +1,104 @@
+"""
+Add composite indexes on (field, id) for the common orderings used with cursor pagination and drop
+the single-column indexes on name, owner and purpose which the new indexes make redundant.
+
+"""
+from django.db import migrations, models
+
+
+# Columns whose single-column indexes are replaced.
+REPLACED_INDEX_COLUMNS = ['name', 'owner', 'purpose']
+
+
+def drop_single_column_indexes(apps, schema_editor):
+    """
+    Drop the indexes created for db_index on the replaced columns. They are dropped by name rather
+    than by altering the fields as altering a field on SQLite rebuilds the table, losing the partial
+    indexes from 0019_asset_index_audit.
+
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, 'assets_asset')
+    for name, constraint in sorted(constraints.items()):
+        if (constraint['index'] and not constraint['unique'] and not constraint['primary_key'] and
+                constraint['columns'] in [[column] for column in REPLACED_INDEX_COLUMNS]):
+            schema_editor.execute('DROP INDEX {}'.format(schema_editor.quote_name(name)))
+
+
+def create_single_column_indexes(apps, schema_editor):
+    for column in REPLACED_INDEX_COLUMNS:
+        schema_editor.execute('CREATE INDEX assets_asset_{0}_idx ON assets_asset ({0})'.format(
+            column))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0019_asset_index_audit'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(drop_single_column_indexes, create_single_column_indexes),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='asset',
+                    name='name',
+                    field=models.CharField(blank=True, max_length=255, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='asset',
+                    name='owner',
+                    field=models.CharField(blank=True, max_length=50, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='asset',
+                    name='purpose',
+                    field=models.CharField(
+                        blank=True,
+                        choices=[('teaching', 'Teaching'),
+                                 ('research', 'Research (Academic)'),
+                                 ('research_organisational', 'Research (Organisational)'),
+                                 ('student_administration', 'Student administration'),
+                                 ('staff_administration', 'Staff administration (HR)'),
+                                 ('alumni_supporter_administration',
+                                  'Alumni/supporter administration'),
+                                 ('supplier_customer_administration',
+                                  'Supplier/customer administration'),
+                                 ('financial_estate_administration',
+                                  'Financial/estate administration'),
+                                 ('governance_compliance', 'Governance/compliance'),
+                                 ('security', 'Security'), ('marketing', 'Marketing'),
+                                 ('public_engagement', 'Public engagement'), ('other', 'Other')],
+                        max_length=255, null=True),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['created_at', 'id'], name='asset_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['updated_at', 'id'], name='asset_updated_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['name', 'id'], name='asset_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['department', 'id'], name='asset_department_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['owner', 'id'], name='asset_owner_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['purpose', 'id'], name='asset_purpose_id_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+"""
+Declare the partial indexes on non-deleted assets in the model and add one on is_complete, whose
+index was dropped by 0019_asset_index_audit. The indexes created by 0019_asset_index_audit
+already exist in the database and so are only added to the migration state.
+
+"""
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0020_asset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='asset',
+                    index=models.Index(
+                        condition=models.Q(deleted_at__isnull=True), fields=['department'],
+                        name='assets_asset_live_department'),
+                ),
+                migrations.AddIndex(
+                    model_name='asset',
+                    index=models.Index(
+                        condition=models.Q(deleted_at__isnull=True), fields=['created_at'],
+                        name='assets_asset_live_created_at'),
+                ),
+                migrations.AddIndex(
+                    model_name='asset',
+                    index=models.Index(
+                        condition=models.Q(deleted_at__isnull=True), fields=['private'],
+                        name='assets_asset_live_private'),
+                ),
+                migrations.AddIndex(
+                    model_name='asset',
+                    index=models.Index(
+                        condition=models.Q(deleted_at__isnull=True),
+                        fields=['private', 'department', 'created_at'],
+                        name='assets_asset_live_privacy'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(
+                condition=models.Q(deleted_at__isnull=True), fields=['is_complete'],
+                name='assets_asset_live_is_complete'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+"""
+Add GIN indexes for the contains_any and contains_all lookups on the multi-select fields on
+PostgreSQL. The bitmask columns are indexed by the array of the positions of their set bits, given
+by the assets_bitmask_bits function, which the lookups compare with the && and @> operators. On
+other databases this migration does nothing.
+
+"""
+from django.db import migrations
+
+
+MULTI_SELECT_COLUMNS = [
+    'data_subject', 'data_category', 'risk_type', 'storage_format', 'paper_storage_security',
+    'digital_storage_security',
+]
+
+FORWARD_SQL = ['''
+    CREATE FUNCTION assets_bitmask_bits(bitmask bigint) RETURNS integer[] AS $$
+        SELECT coalesce(array_agg(bit), '{}')
+        FROM generate_series(0, 62) AS bit
+        WHERE bitmask & (1::bigint << bit) <> 0
+    $$ LANGUAGE sql IMMUTABLE
+'''] + [
+    'CREATE INDEX assets_asset_{0}_bits ON assets_asset USING gin (assets_bitmask_bits({0}))'
+    .format(column)
+    for column in MULTI_SELECT_COLUMNS
+]
+
+REVERSE_SQL = [
+    'DROP INDEX assets_asset_{}_bits'.format(column) for column in MULTI_SELECT_COLUMNS
+] + ['DROP FUNCTION assets_bitmask_bits(bigint)']
+
+
+def run_sql_on_postgresql(statements):
+    """Return a RunPython function which executes *statements* only on PostgreSQL."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0021_asset_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql_on_postgresql(FORWARD_SQL),
+                             run_sql_on_postgresql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,40 @@
+"""
+Allow only one DepartmentAssetStats row for assets without a department. The unique constraint on
+department does not prevent duplicate NULL departments and so concurrent creation of the row
+could insert several. Any existing duplicates are merged before adding a unique index on the
+expression "department IS NULL" restricted to those rows, which has a single value.
+
+"""
+from django.db import migrations
+from django.db.models import Sum
+
+
+def merge_null_department_stats(apps, schema_editor):
+    """Merge the statistics rows with a NULL department into one."""
+    DepartmentAssetStats = apps.get_model('assets', 'DepartmentAssetStats')
+    rows = DepartmentAssetStats.objects.filter(department__isnull=True).order_by('id')
+    first = rows.first()
+    if first is None:
+        return
+    totals = rows.aggregate(
+        total=Sum('total'), completed=Sum('completed'),
+        with_personal_data=Sum('with_personal_data'),
+    )
+    rows.exclude(id=first.id).delete()
+    DepartmentAssetStats.objects.filter(id=first.id).update(**totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0022_choice_bitmask_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_null_department_stats, migrations.RunPython.noop),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX assets_departmentassetstats_null_department '
+            'ON assets_departmentassetstats ((department IS NULL)) WHERE department IS NULL',
+            'DROP INDEX assets_departmentassetstats_null_department',
+        ),
+    ]
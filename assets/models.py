@@ -1,53 +1,345 @@
 import uuid
+from collections import namedtuple
 
-from automationcommon.models import ModelChangeMixin
-from django.db import models
-from django.db.models import Case, When, Q, BooleanField, Value
-from multiselectfield import MultiSelectField
-
-
-class AssetManager(models.Manager):
-    """Custom :py:class:`models.Manager` sub class which adds an :py:attr:`is_complete`
-    annotation to the :py:class:`~.Asset` instances in the query set. The :py:attr:`is_complete`
-    annotation reflects whether the asset record is "complete" as defined in the requirements."""
-    def get_queryset(self):
-        """A QuerySet to add an annotation to specify if an Asset is complete or not"""
-        return self.annotate_is_complete(self.get_base_queryset())
-
-    def annotate_is_complete(self, queryset):
-        """Add an annotation to a queryset to specify if an Asset is complete or not"""
-        return queryset.annotate(is_complete=Case(When(Q(
-            Q(name__isnull=False),
-            Q(department__isnull=False),
-            Q(purpose__isnull=False),
-            Q(Q(purpose='research', owner__isnull=False) |
-              ~Q(purpose='research')),
-            Q(Q(purpose='other', purpose_other__isnull=False) |
-              ~Q(purpose='other')),
-            Q(Q(personal_data=False) |
-              Q(Q(personal_data=True), ~Q(data_subject=[]), ~Q(data_category=[]),
-                recipients_outside_uni__isnull=False, recipients_outside_eea__isnull=False,
-                retention__isnull=False)),
-            Q(Q(recipients_outside_uni='yes', recipients_outside_uni_description__isnull=False) |
-              ~Q(recipients_outside_uni='yes')),
-            Q(Q(recipients_outside_eea='yes', recipients_outside_eea_description__isnull=False) |
-              ~Q(recipients_outside_eea='yes')),
-            ~Q(risk_type=[]),
-            Q(storage_location__isnull=False),
-            ~Q(storage_format=[]),
-            Q(~Q(storage_format__contains='paper') |
-              Q(Q(storage_format__contains='paper'), ~Q(paper_storage_security=[]))),
-            Q(~Q(storage_format__contains='digital') |
-              Q(Q(storage_format__contains='digital'), ~Q(digital_storage_security=[])))),
-            then=Value(True)), default=Value(False), output_field=BooleanField()))
-
-    def get_base_queryset(self):
-        """
-        Return the original un-annotated queryset. Useful when the is_complete annotation is not
-        required.
-
-        """
-        return super().get_queryset()
+from automationcommon.models import Audit, ModelChangeMixin, get_local_user
+from django.db import models, transaction
+from django.db.models import Case, When, Q, F, BooleanField, Value, Count
+from django.forms.models import model_to_dict
+
+from . import completeness
+from .fields import ChoiceBitmaskField
+from .signals import asset_stats_changed
+
+
+IS_COMPLETE_RULE = completeness.All(
+    completeness.IsSet('name'),
+    completeness.IsSet('department'),
+    completeness.IsSet('purpose'),
+    completeness.Implies(completeness.Equals('purpose', 'research'), completeness.IsSet('owner')),
+    completeness.Implies(
+        completeness.Equals('purpose', 'other'), completeness.IsSet('purpose_other')),
+    completeness.Any(
+        completeness.Equals('personal_data', False),
+        completeness.All(
+            completeness.Equals('personal_data', True),
+            completeness.IsNotEmpty('data_subject'),
+            completeness.IsNotEmpty('data_category'),
+            completeness.IsSet('recipients_outside_uni'),
+            completeness.IsSet('recipients_outside_eea'),
+            completeness.IsSet('retention'),
+        ),
+    ),
+    completeness.Implies(
+        completeness.Equals('recipients_outside_uni', 'yes'),
+        completeness.IsSet('recipients_outside_uni_description')),
+    completeness.Implies(
+        completeness.Equals('recipients_outside_eea', 'yes'),
+        completeness.IsSet('recipients_outside_eea_description')),
+    completeness.IsNotEmpty('risk_type'),
+    completeness.IsSet('storage_location'),
+    completeness.IsNotEmpty('storage_format'),
+    completeness.Implies(
+        completeness.Contains('storage_format', 'paper'),
+        completeness.IsNotEmpty('paper_storage_security')),
+    completeness.Implies(
+        completeness.Contains('storage_format', 'digital'),
+        completeness.IsNotEmpty('digital_storage_security')),
+)
+"""
+Rule which holds for an asset record which is "complete" as defined in the requirements. It is
+the single definition of completeness from which :py:data:`IS_COMPLETE_CONDITION` and
+:py:data:`IS_COMPLETE_PREDICATE` are built.
+
+"""
+
+IS_COMPLETE_CONDITION = IS_COMPLETE_RULE.as_q()
+"""
+Condition which is true for an asset record which is "complete" as defined in the requirements.
+
+"""
+
+IS_COMPLETE_PREDICATE = IS_COMPLETE_RULE.as_predicate()
+"""
+Predicate which takes an :py:class:`~.Asset` or a dict of asset field values, such as validated
+serializer data, and returns whether the asset is "complete" without querying the database. It
+is the Python equivalent of :py:data:`IS_COMPLETE_CONDITION`.
+
+"""
+
+IS_COMPLETE_FIELDS = IS_COMPLETE_RULE.fields
+"""
+Names of the fields which :py:data:`IS_COMPLETE_RULE` depends on.
+
+"""
+
+
+STATS_FIELDS = IS_COMPLETE_FIELDS | {'is_complete', 'deleted_at'}
+"""
+Names of the fields which the contribution of an asset to :py:class:`~.DepartmentAssetStats`
+depends on.
+
+"""
+
+LIVE_CONDITION = Q(deleted_at__isnull=True)
+"""
+Condition matching assets which have not been deleted. Partial indexes in
+:py:attr:`Asset.Meta.indexes` are restricted to these assets.
+
+"""
+
+# Fields which must be loaded to compute the contribution of an asset to department statistics.
+_DEPARTMENT_COUNTS_FIELDS = frozenset(['department', 'is_complete', 'personal_data', 'deleted_at'])
+
+AssetCounts = namedtuple('AssetCounts', 'total completed with_personal_data')
+
+
+def _department_counts_for_values(values):
+    """
+    Return the contribution to the department statistics of an asset with the field values in
+    the dict *values*, which has the :py:data:`_DEPARTMENT_COUNTS_FIELDS`, in the form returned by
+    :py:meth:`~.AssetQuerySet.department_counts`.
+
+    """
+    if values['deleted_at'] is not None:
+        return {}
+    return {values['department']: AssetCounts(
+        total=1, completed=int(values['is_complete']),
+        with_personal_data=int(values['personal_data'] is True),
+    )}
+
+
+def _is_complete_expression():
+    """Return an expression which evaluates :py:data:`IS_COMPLETE_CONDITION` for a row."""
+    return Case(
+        When(IS_COMPLETE_CONDITION, then=Value(True)),
+        default=Value(False), output_field=BooleanField()
+    )
+
+
+def _add_counts(first, second, scale=1):
+    """
+    Given two dicts mapping departments to :py:class:`~.AssetCounts`, return a dict mapping
+    departments to the counts in *first* plus *scale* times the counts in *second*.
+
+    """
+    zero = AssetCounts(0, 0, 0)
+    return {
+        department: AssetCounts(*(
+            a + scale * b
+            for a, b in zip(first.get(department, zero), second.get(department, zero))
+        ))
+        for department in set(first) | set(second)
+    }
+
+
+def audit_changes(changes):
+    """
+    Record an :py:class:`automationcommon.models.Audit` for each audited difference between the
+    assets in *changes*, a sequence of (old, new) pairs of :py:class:`~.Asset` instances, with a
+    single INSERT. This is the equivalent of the audit records made by
+    :py:class:`~automationcommon.models.ModelChangeMixin` when saving each new asset and is used
+    when assets are updated in bulk. Differences are found with :py:meth:`~.Asset.audit_compare`.
+    As with :py:class:`~automationcommon.models.ModelChangeMixin`, nothing is recorded if there
+    is no local user.
+
+    """
+    who = get_local_user()
+    if not who:
+        return
+
+    audits = []
+    for old, new in changes:
+        for field in new._meta.concrete_fields:
+            if field.primary_key or not field.editable:
+                continue
+            old_value, new_value = field.value_from_object(old), field.value_from_object(new)
+            if not new.audit_compare(field, old_value, new_value):
+                continue
+            audits.append(Audit(
+                who=who, model=new.__class__.__name__, model_pk=repr(new.pk), field=field.name,
+                old=None if old_value is None else str(old_value),
+                new=None if new_value is None else str(new_value),
+            ))
+    Audit.objects.bulk_create(audits)
+
+
+class AssetQuerySet(models.QuerySet):
+    """
+    Custom :py:class:`models.QuerySet` sub class which keeps the stored :py:attr:`is_complete`
+    column of :py:class:`~.Asset` and the :py:class:`~.DepartmentAssetStats` table up to date when
+    rows are changed in bulk.
+
+    """
+    #: Number of primary keys to use in each statement when updating rows in batches.
+    BATCH_SIZE = 500
+
+    def update(self, **kwargs):
+        """
+        Update all rows in the queryset. If any field which completeness depends on is changed,
+        the :py:attr:`is_complete` column is recomputed for the affected rows. If the change
+        affects department statistics, :py:class:`~.DepartmentAssetStats` is updated. Both happen
+        within the same transaction as the update.
+
+        """
+        if STATS_FIELDS.isdisjoint(kwargs):
+            return super().update(**kwargs)
+
+        assert self.query.can_filter(), "Cannot update a query once a slice has been taken."
+        with transaction.atomic(using=self.db):
+            # The update may change which rows the queryset matches so lock and record them
+            # beforehand and update only those rows.
+            pks, before = self._lock_department_counts()
+
+            n_rows = 0
+            for batch in self._batches(pks):
+                n_rows += models.QuerySet.update(batch, **kwargs)
+
+            if 'is_complete' not in kwargs and not IS_COMPLETE_FIELDS.isdisjoint(kwargs):
+                for batch in self._batches(pks):
+                    models.QuerySet.update(batch, is_complete=_is_complete_expression())
+
+            after = self._department_counts_for_pks(pks)
+            DepartmentAssetStats.objects.apply_deltas(_add_counts(after, before, -1))
+
+        return n_rows
+
+    def delete(self):
+        """
+        Delete all rows in the queryset, removing them from :py:class:`~.DepartmentAssetStats`
+        within the same transaction.
+
+        """
+        assert self.query.can_filter(), "Cannot use 'limit' or 'offset' with delete."
+        with transaction.atomic(using=self.db):
+            pks, before = self._lock_department_counts()
+
+            n_deleted, deleted_per_model = 0, {}
+            for batch in self._batches(pks):
+                batch_deleted, batch_per_model = models.QuerySet.delete(batch)
+                n_deleted += batch_deleted
+                for label, count in batch_per_model.items():
+                    deleted_per_model[label] = deleted_per_model.get(label, 0) + count
+
+            DepartmentAssetStats.objects.apply_deltas(_add_counts({}, before, -1))
+
+        return n_deleted, deleted_per_model
+
+    def bulk_create(self, objs, batch_size=None):
+        """
+        Insert *objs* with :py:meth:`~django.db.models.query.QuerySet.bulk_create`, computing the
+        :py:attr:`is_complete` column of each and adding them to :py:class:`~.DepartmentAssetStats`
+        within the same transaction.
+
+        """
+        objs = list(objs)
+        for obj in objs:
+            obj.is_complete = obj.compute_is_complete()
+
+        counts = {}
+        for obj in objs:
+            counts = _add_counts(counts, obj._department_counts())
+
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, batch_size=batch_size)
+            DepartmentAssetStats.objects.apply_deltas(counts)
+
+        return objs
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        """
+        As ``QuerySet.bulk_update()`` except that fields with ``auto_now`` are updated and, if any
+        field completeness depends on is saved, :py:attr:`is_complete` is computed for each
+        object. Batches are of :py:attr:`BATCH_SIZE` objects by default. The update goes through
+        :py:meth:`update` and so department statistics are kept up to date.
+
+        """
+        objs = list(objs)
+        field_names = set(fields)
+        if not IS_COMPLETE_FIELDS.isdisjoint(field_names):
+            field_names.add('is_complete')
+            for obj in objs:
+                obj.is_complete = obj.compute_is_complete()
+
+        for field in self.model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) and field.name not in field_names:
+                field_names.add(field.name)
+                for obj in objs:
+                    field.pre_save(obj, add=False)
+
+        super().bulk_update(objs, sorted(field_names), batch_size=batch_size or self.BATCH_SIZE)
+
+    def refresh_is_complete(self):
+        """
+        Recompute the stored :py:attr:`is_complete` column for all rows in the queryset from
+        :py:data:`IS_COMPLETE_CONDITION` in a single UPDATE. Returns the number of rows matched.
+
+        """
+        return self.update(is_complete=_is_complete_expression())
+
+    def inconsistent_is_complete(self):
+        """
+        Return a queryset of the rows whose stored :py:attr:`is_complete` column does not match
+        the value computed from :py:data:`IS_COMPLETE_CONDITION`.
+
+        """
+        complete = self.model._base_manager.filter(IS_COMPLETE_CONDITION).values('pk')
+        return self.filter(
+            Q(is_complete=True) & ~Q(pk__in=complete) | Q(is_complete=False, pk__in=complete)
+        )
+
+    def department_counts(self):
+        """
+        Return a dict mapping departments to :py:class:`~.AssetCounts` for the non-deleted assets
+        in the queryset. The counts are computed in a single query which groups by department and
+        uses conditional aggregation.
+
+        """
+        rows = self.filter(deleted_at__isnull=True).values('department').annotate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(is_complete=True)),
+            with_personal_data=Count('id', filter=Q(personal_data=True)),
+        ).order_by('department')
+
+        return {
+            row['department']: AssetCounts(
+                total=row['total'],
+                completed=row['completed'],
+                with_personal_data=row['with_personal_data'],
+            )
+            for row in rows
+        }
+
+    def _batches(self, pks):
+        """Yield querysets over the rows with primary keys in *pks* in batches."""
+        for idx in range(0, len(pks), self.BATCH_SIZE):
+            yield self.model.objects.using(self.db).filter(pk__in=pks[idx:idx+self.BATCH_SIZE])
+
+    def _lock_department_counts(self):
+        """
+        Lock the rows in the queryset until the end of the transaction, which must be in progress,
+        and return a list of their primary keys and their :py:meth:`department_counts`. The counts
+        are computed from the locked rows since PostgreSQL does not allow FOR UPDATE with GROUP BY.
+
+        """
+        pks, counts = [], {}
+        for values in self.select_for_update().values('pk', *_DEPARTMENT_COUNTS_FIELDS):
+            pks.append(values['pk'])
+            for department, row_counts in _department_counts_for_values(values).items():
+                counts[department] = AssetCounts(*(
+                    a + b for a, b in zip(counts.get(department, (0, 0, 0)), row_counts)))
+        return pks, counts
+
+    def _department_counts_for_pks(self, pks):
+        """Return :py:meth:`department_counts` for the rows with primary keys in *pks*."""
+        counts = {}
+        for batch in self._batches(pks):
+            counts = _add_counts(counts, batch.department_counts())
+        return counts
+
+
+class AssetManager(models.Manager.from_queryset(AssetQuerySet)):
+    """Custom :py:class:`models.Manager` sub class whose querysets are
+    :py:class:`~.AssetQuerySet` instances."""
 
 
 class Asset(ModelChangeMixin, models.Model):
@@ -55,27 +347,119 @@ class Asset(ModelChangeMixin, models.Model):
     def audit_compare(self, field, old, new):
         """
         Overridden as the base implementation doesn't correctly detect differences for
-        MultiSelectField fields.
+        multi-select fields. These are compared by their bitmasks.
 
         :param field: The field being compared
         :param old: the original value
         :param new: the updated value
         :return: whether or not a change has been detected
         """
-        if isinstance(field, MultiSelectField):
-            return len(set(old if old else []) ^ set(new if new else [])) != 0
+        if field.name == 'is_complete':
+            # is_complete is derived from the other fields and so changes to it are not audited.
+            return False
+        if isinstance(field, ChoiceBitmaskField):
+            return field.get_bitmask(old) ^ field.get_bitmask(new) != 0
         return super(Asset, self).audit_compare(field, old, new)
 
+    @property
+    def _dict(self):
+        """
+        Overridden as the base implementation reads every field and so, for assets loaded with
+        deferred fields, loads each of them from the database while the asset is being
+        constructed. Fields which were deferred when the asset was loaded are not audited.
+
+        """
+        unaudited = self.__dict__.setdefault('_unaudited_fields', self.get_deferred_fields())
+        return model_to_dict(self, fields=[
+            field.name for field in self._meta.fields if field.attname not in unaudited
+        ])
+
+    def compute_is_complete(self):
+        """
+        Return whether this asset is "complete" as defined in the requirements by evaluating
+        :py:data:`~.IS_COMPLETE_PREDICATE`. This is used to keep the stored
+        :py:attr:`is_complete` column up to date when the asset is saved.
+
+        """
+        return IS_COMPLETE_PREDICATE(self)
+
+    def save(self, *args, **kwargs):
+        """
+        Save the asset, recomputing the stored :py:attr:`is_complete` column and applying the
+        change in this asset's contribution to :py:class:`~.DepartmentAssetStats` within the same
+        transaction.
+
+        """
+        # Load any deferred fields needed below in one query rather than one query per field.
+        deferred = self.get_deferred_fields() & STATS_FIELDS
+        if deferred:
+            self.refresh_from_db(fields=deferred)
+
+        self.is_complete = self.compute_is_complete()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'is_complete' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['is_complete']
+
+        department_counts = self._department_counts()
+        with transaction.atomic(using=kwargs.get('using')):
+            saved_department_counts = self._get_saved_department_counts(kwargs.get('using'))
+            super().save(*args, **kwargs)
+            DepartmentAssetStats.objects.apply_deltas(
+                _add_counts(department_counts, saved_department_counts, -1))
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete the asset, removing its contribution to :py:class:`~.DepartmentAssetStats` within
+        the same transaction.
+
+        """
+        with transaction.atomic(using=kwargs.get('using')):
+            saved_department_counts = self._get_saved_department_counts(kwargs.get('using'))
+            result = super().delete(*args, **kwargs)
+            DepartmentAssetStats.objects.apply_deltas(
+                _add_counts({}, saved_department_counts, -1))
+        return result
+
+    def _get_saved_department_counts(self, using=None):
+        """
+        Return the contribution of this asset to the department statistics as currently saved in
+        the database. The row is locked until the end of the transaction, which must be in
+        progress, so that concurrent changes to the asset apply their deltas one after another.
+
+        """
+        if self._state.adding:
+            return {}
+        values = Asset.objects.db_manager(using or self._state.db).select_for_update().filter(
+            pk=self.pk).values(*_DEPARTMENT_COUNTS_FIELDS).first()
+        return {} if values is None else _department_counts_for_values(values)
+
+    def _department_counts(self):
+        """
+        Return the contribution of this asset to the department statistics as a dict in the form
+        returned by :py:meth:`~.AssetQuerySet.department_counts`.
+
+        """
+        return _department_counts_for_values(
+            {name: getattr(self, name) for name in _DEPARTMENT_COUNTS_FIELDS})
+
     """"Model to store Assets for the Information Asset Register"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
 
-    # a custom manager to include the annotation is_complete
+    # a custom manager which keeps is_complete up to date on bulk updates
     objects = AssetManager()
 
+    # Columns which are filtered for equality on their own are indexed by the composite indexes
+    # for pagination in Meta.indexes which start with them. Almost all queries are restricted to
+    # non-deleted assets and so the indexes on department, created_at, private and is_complete,
+    # and the composite index used by the privacy rules, are partial indexes on those assets.
+    # Search uses the full-text and trigram indexes from migrations 0015 and 0016. The
+    # report_index_usage management command reports how indexes are used.
+
     # General - asset level
-    name = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    name = models.CharField(max_length=255, null=True, blank=True)
     # TODO when issues with import data have been resolved this should be required
-    department = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    department = models.CharField(max_length=255, null=True, blank=True)
 
     PURPOSE_CHOICES = (
         ('teaching', 'Teaching'),
@@ -92,14 +476,13 @@ class Asset(ModelChangeMixin, models.Model):
         ('public_engagement', 'Public engagement'),
         ('other', 'Other'),
     )
-    purpose = models.CharField(max_length=255, choices=PURPOSE_CHOICES, null=True, blank=True,
-                               db_index=True)
-    purpose_other = models.TextField(null=True, blank=True, db_index=True)
-    owner = models.CharField(max_length=50, null=True, blank=True, db_index=True)
-    private = models.BooleanField(default=False, db_index=True)
+    purpose = models.CharField(max_length=255, choices=PURPOSE_CHOICES, null=True, blank=True)
+    purpose_other = models.TextField(null=True, blank=True)
+    owner = models.CharField(max_length=50, null=True, blank=True)
+    private = models.BooleanField(default=False)
 
     # Persona Data
-    personal_data = models.NullBooleanField(null=True, blank=True, db_index=True)
+    personal_data = models.NullBooleanField(null=True, blank=True)
     DATA_SUBJECT_CHOICES = (
         ('students', 'Students, applicants'),
         ('staff', 'Staff, job applicants'),
@@ -109,8 +492,9 @@ class Asset(ModelChangeMixin, models.Model):
         ('supplier', 'Suppliers, professional advisers and consultants'),
         ('public', 'Members of public'),
     )
-    data_subject = MultiSelectField(choices=DATA_SUBJECT_CHOICES, null=True, blank=True,
-                                    db_index=True)
+    # The multi-select fields are stored as bitmasks. New choices must be added at the end of the
+    # choices. See ChoiceBitmaskField.
+    data_subject = ChoiceBitmaskField(choices=DATA_SUBJECT_CHOICES, null=True, blank=True)
     DATA_CATEGORY_CHOICES = (
         ('education', 'Education records'),
         ('alumni', 'Alumni records'),
@@ -132,8 +516,7 @@ class Asset(ModelChangeMixin, models.Model):
         ('biometric', 'Biometric information'),
         ('criminal', 'Criminal proceedings, outcomes and sentences'),
     )
-    data_category = MultiSelectField(choices=DATA_CATEGORY_CHOICES, null=True, blank=True,
-                                     db_index=True)
+    data_category = ChoiceBitmaskField(choices=DATA_CATEGORY_CHOICES, null=True, blank=True)
 
     RECIPIENTS_OUTSIDE_CHOICES = (
         ('yes', 'Yes'),
@@ -141,14 +524,12 @@ class Asset(ModelChangeMixin, models.Model):
         ('not_sure', 'Not Sure'),
     )
     recipients_outside_uni = models.CharField(max_length=8, choices=RECIPIENTS_OUTSIDE_CHOICES,
-                                              null=True, blank=True, db_index=True)
+                                              null=True, blank=True)
     recipients_outside_eea = models.CharField(max_length=8, choices=RECIPIENTS_OUTSIDE_CHOICES,
-                                              null=True, blank=True, db_index=True)
+                                              null=True, blank=True)
 
-    recipients_outside_uni_description = models.CharField(max_length=255, null=True, blank=True,
-                                                          db_index=True)
-    recipients_outside_eea_description = models.CharField(max_length=255, null=True, blank=True,
-                                                          db_index=True)
+    recipients_outside_uni_description = models.CharField(max_length=255, null=True, blank=True)
+    recipients_outside_eea_description = models.CharField(max_length=255, null=True, blank=True)
 
     RETENTION_CHOICES = (
         ('<1', 'Less than 1 year'),
@@ -157,8 +538,7 @@ class Asset(ModelChangeMixin, models.Model):
         ('>10,<=75', '10 to 75 years'),
         ('forever', 'Forever'),
     )
-    retention = models.CharField(max_length=255, choices=RETENTION_CHOICES, null=True, blank=True,
-                                 db_index=True)
+    retention = models.CharField(max_length=255, choices=RETENTION_CHOICES, null=True, blank=True)
 
     # Risks
     RISK_CHOICES = (
@@ -169,17 +549,16 @@ class Asset(ModelChangeMixin, models.Model):
         ('safety', 'Personal Safety'),
         ('none', 'None of the above'),
     )
-    risk_type = MultiSelectField(choices=RISK_CHOICES, null=True, blank=True, db_index=True)
-    risk_type_additional = models.TextField(null=True, blank=True, db_index=True)
+    risk_type = ChoiceBitmaskField(choices=RISK_CHOICES, null=True, blank=True)
+    risk_type_additional = models.TextField(null=True, blank=True)
 
     # Storage
-    storage_location = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    storage_location = models.CharField(max_length=255, null=True, blank=True)
     STORAGE_FORMAT_CHOICES = (
         ('digital', 'Digital'),
         ('paper', 'Paper'),
     )
-    storage_format = MultiSelectField(choices=STORAGE_FORMAT_CHOICES, null=True, blank=True,
-                                      db_index=True)
+    storage_format = ChoiceBitmaskField(choices=STORAGE_FORMAT_CHOICES, null=True, blank=True)
     # Storage # Only if storage_format = 'paper'
     PAPER_STORAGE_SECURITY_CHOICES = (
         ('locked_cabinet', 'Locked filing cabinet'),
@@ -188,8 +567,8 @@ class Asset(ModelChangeMixin, models.Model):
         ('locked_building', 'Locked building'),
         ('none', 'None of the above'),
     )
-    paper_storage_security = MultiSelectField(choices=PAPER_STORAGE_SECURITY_CHOICES,
-                                              null=True, blank=True, db_index=True)
+    paper_storage_security = ChoiceBitmaskField(choices=PAPER_STORAGE_SECURITY_CHOICES,
+                                                null=True, blank=True)
     # Storage # Only if storage_format = 'digital'
     DIGITAL_STORAGE_SECURITY_CHOICES = (
         ('pwd_controls', 'Password controls'),
@@ -198,10 +577,102 @@ class Asset(ModelChangeMixin, models.Model):
         ('encryption', 'Encryption'),
         ('none', 'None of the above'),
     )
-    digital_storage_security = MultiSelectField(choices=DIGITAL_STORAGE_SECURITY_CHOICES,
-                                                null=True, blank=True, db_index=True)
+    digital_storage_security = ChoiceBitmaskField(choices=DIGITAL_STORAGE_SECURITY_CHOICES,
+                                                  null=True, blank=True)
+
+    # Whether the asset is "complete". This is derived from the other fields when the asset is
+    # saved. See IS_COMPLETE_RULE.
+    is_complete = models.BooleanField(default=False, editable=False)
 
     # Asset logs
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
-    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(default=None, blank=True, null=True)
+
+    class Meta:
+        # Indexes supporting cursor pagination of the common orderings. The primary key is the
+        # tiebreaker appended to every ordering by AssetCursorPagination.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='asset_created_at_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='asset_updated_at_id_idx'),
+            models.Index(fields=['name', 'id'], name='asset_name_id_idx'),
+            models.Index(fields=['department', 'id'], name='asset_department_id_idx'),
+            models.Index(fields=['owner', 'id'], name='asset_owner_id_idx'),
+            models.Index(fields=['purpose', 'id'], name='asset_purpose_id_idx'),
+
+            # Partial indexes on non-deleted assets. They keep the names they were created with by
+            # migration 0019_asset_index_audit.
+            models.Index(fields=['department'], name='assets_asset_live_department',
+                         condition=LIVE_CONDITION),
+            models.Index(fields=['created_at'], name='assets_asset_live_created_at',
+                         condition=LIVE_CONDITION),
+            models.Index(fields=['private'], name='assets_asset_live_private',
+                         condition=LIVE_CONDITION),
+            models.Index(fields=['is_complete'], name='assets_asset_live_is_complete',
+                         condition=LIVE_CONDITION),
+            # Matches "private = false OR (private = true AND department IN (...))" ordered by
+            # creation.
+            models.Index(fields=['private', 'department', 'created_at'],
+                         name='assets_asset_live_privacy', condition=LIVE_CONDITION),
+        ]
+
+
+class DepartmentAssetStatsManager(models.Manager):
+    """Custom :py:class:`models.Manager` for :py:class:`~.DepartmentAssetStats`."""
+
+    def apply_deltas(self, deltas):
+        """
+        Apply changes to the statistics. *deltas* is a dict mapping departments to
+        :py:class:`~.AssetCounts` giving the amount each count should change by. The counts are
+        updated in the database so that concurrent changes are not lost. If any count changes,
+        :py:data:`~assets.signals.asset_stats_changed` is sent.
+
+        """
+        changed = False
+        for department, delta in deltas.items():
+            if not any(delta):
+                continue
+            self.get_or_create(department=department)
+            self.filter(department=department).update(
+                total=F('total') + delta.total,
+                completed=F('completed') + delta.completed,
+                with_personal_data=F('with_personal_data') + delta.with_personal_data,
+            )
+            changed = True
+
+        if changed:
+            asset_stats_changed.send(sender=self.model)
+
+    def rebuild(self):
+        """Recompute the statistics for all departments from the assets themselves."""
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            self.bulk_create([
+                DepartmentAssetStats(department=department, **counts._asdict())
+                for department, counts in Asset.objects.all().department_counts().items()
+            ])
+        asset_stats_changed.send(sender=self.model)
+
+
+class DepartmentAssetStats(models.Model):
+    """
+    Summary table holding the :py:class:`~.AssetCounts` for the non-deleted assets of each
+    department. It is maintained by :py:class:`~.Asset` and :py:class:`~.AssetQuerySet` as assets
+    are changed so that statistics can be read without scanning the assets.
+
+    """
+    objects = DepartmentAssetStatsManager()
+
+    # Only one row may have a NULL department. This is enforced by the unique index on
+    # "department IS NULL" created in 0023_departmentassetstats_null_department.
+    department = models.CharField(max_length=255, null=True, blank=True, unique=True)
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    with_personal_data = models.IntegerField(default=0)
+
+    def as_counts(self):
+        """Return the statistics as an :py:class:`~.AssetCounts` instance."""
+        return AssetCounts(
+            total=self.total, completed=self.completed,
+            with_personal_data=self.with_personal_data,
+        )
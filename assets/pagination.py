@@ -0,0 +1,320 @@
+"""
+Pagination of asset lists.
+
+"""
+import datetime
+import functools
+import json
+import operator
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.utils import encoders
+
+
+class AssetCursorPagination(CursorPagination):
+    """
+    A :py:class:`~rest_framework.pagination.CursorPagination` which always orders by a unique
+    tiebreaker, the primary key, after the requested ordering and whose cursors record the
+    position of the last item in every ordering field.
+
+    Django REST framework's cursor pagination only records the value of the first ordering field
+    and skips items sharing that value with an offset. When ordering by a column with many equal
+    values, such as the department, each page must then sort and skip all of the equal items
+    before it. Here, each page is selected with a condition on all of the ordering fields which
+    can be satisfied by an index on those fields followed by the primary key. ``NULL`` values sort
+    after all others in ascending order and before them in descending order on all databases.
+
+    Clients may choose the page size with the ``page_size`` query parameter up to the
+    ``IAR_MAX_PAGE_SIZE`` setting. Pages larger than ``IAR_STREAMED_PAGE_SIZE`` may be streamed
+    with :py:meth:`get_streaming_response`.
+
+    """
+    #: Unique field appended to every ordering.
+    tiebreaker = 'pk'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        names = {name.lstrip('-') for name in ordering}
+        if self.tiebreaker in names or queryset.model._meta.pk.name in names:
+            return ordering
+
+        # The tiebreaker has the same direction as the first field so that an index on the first
+        # field and the tiebreaker can be scanned in one direction.
+        direction = '-' if ordering and ordering[0].startswith('-') else ''
+        return ordering + (direction + self.tiebreaker,)
+
+    #: Query parameter which clients may use to choose the page size.
+    page_size_query_param = 'page_size'
+
+    @property
+    def max_page_size(self):
+        """The largest page size which may be requested. See ``IAR_MAX_PAGE_SIZE``."""
+        return settings.IAR_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+
+        # Fetch an extra item to determine if there is a following page.
+        results = list(queryset)
+        page = results[:self.page_size]
+        following = results[-1] if len(results) > len(page) else None
+        self._set_page(page, following)
+
+        return self.page
+
+    def is_streamed(self, request):
+        """
+        Return whether the page requested by *request* should be streamed by
+        :py:meth:`get_streaming_response`. Pages are streamed if they are larger than the
+        ``IAR_STREAMED_PAGE_SIZE`` setting, are rendered as JSON and are not reached via a previous
+        link, whose items are fetched in reverse order.
+
+        """
+        page_size = self.get_page_size(request)
+        if page_size is None or page_size <= settings.IAR_STREAMED_PAGE_SIZE:
+            return False
+        if getattr(request, 'accepted_renderer', None) is None or \
+                request.accepted_renderer.format != 'json':
+            return False
+        cursor = self.decode_cursor(request)
+        return cursor is None or not cursor.reverse
+
+    def get_streaming_response(self, queryset, request, view):
+        """
+        Return a :py:class:`~django.http.StreamingHttpResponse` with the page of *queryset*
+        requested by *request* serialised as JSON by *view*'s serializer. Items are fetched from
+        the database in chunks of ``IAR_STREAMED_PAGE_SIZE`` and serialised as they are fetched so
+        that memory use does not grow with the page size. The response has the same fields as a
+        paginated response but the results come before the links since the links depend on the
+        last item.
+
+        """
+        queryset = self._get_page_queryset(queryset, request, view)
+        serializer = view.get_serializer(many=True)
+        return StreamingHttpResponse(
+            self._stream_page(queryset, serializer), content_type='application/json')
+
+    def _stream_page(self, queryset, serializer):
+        """Generate the JSON for the page of items from *queryset* serialised by *serializer*."""
+        def encode(data):
+            return json.dumps(
+                data, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+        yield '{"results":['
+        first, last, following = None, None, None
+        items = queryset.iterator(chunk_size=settings.IAR_STREAMED_PAGE_SIZE)
+        for idx, instance in enumerate(items):
+            if idx == self.page_size:
+                following = instance
+                break
+            if first is None:
+                first = instance
+            else:
+                yield ','
+            yield encode(serializer.child.to_representation(instance))
+            last = instance
+
+        # Positions are unique and so only the first and last items of the page are needed to
+        # build the links.
+        if first is None:
+            page = []
+        elif first is last:
+            page = [first]
+        else:
+            page = [first, last]
+        self._set_page(page, following)
+        yield '],"next":{},"previous":{}}}'.format(
+            encode(self.get_next_link()), encode(self.get_previous_link()))
+
+    def _get_page_queryset(self, queryset, request, view):
+        """
+        Decode the cursor of *request* and return the slice of *queryset* holding the requested
+        page followed by at most one item from the following page. Returns None if pagination is
+        disabled.
+
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*(_order_by_expression(name) for name in ordering))
+
+        if current_position is not None:
+            queryset = queryset.filter(
+                _after_position_q(
+                    queryset.model, ordering, self._decode_position(current_position)))
+
+        return queryset[offset:offset + self.page_size + 1]
+
+    def _set_page(self, page, following):
+        """
+        Record *page*, the list of items fetched for the current cursor, and the state needed to
+        build the links. *following* is the first item after the page or None if there is none.
+
+        """
+        (offset, reverse, current_position) = (
+            (0, False, None) if self.cursor is None else self.cursor)
+
+        self.page = page
+        if following is not None:
+            has_following_position = True
+            following_position = self._get_position_from_instance(following, self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+    def _get_position_from_instance(self, instance, ordering):
+        """Return the position of *instance* as a JSON list of its ordering field values."""
+        values = []
+        for name in ordering:
+            attr = name.lstrip('-')
+            if attr == 'pk':
+                attr = instance._meta.pk.name
+            value = instance[attr] if isinstance(instance, dict) else getattr(instance, attr)
+            values.append(_encode_value(instance, attr, value))
+        return json.dumps(values, separators=(',', ':'))
+
+    def _decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+
+def _encode_value(instance, attr, value):
+    """Return the value of *attr* on a model instance in a form which can be encoded as JSON."""
+    try:
+        field = instance._meta.get_field(attr)
+    except (AttributeError, FieldDoesNotExist):
+        # The attribute is an annotation.
+        field = None
+    if field is not None and value is not None:
+        value = field.get_prep_value(value)
+
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _order_by_expression(name):
+    """
+    Return an ordering expression for the field named by *name* with ``NULL`` values last in
+    ascending order and first in descending order.
+
+    """
+    if name.startswith('-'):
+        return F(name[1:]).desc(nulls_first=True)
+    return F(name).asc(nulls_last=True)
+
+
+def _after_position_q(model, ordering, values):
+    """
+    Return a :py:class:`~django.db.models.Q` matching items strictly after the item whose ordering
+    field values are *values* in the order given by *ordering*.
+
+    """
+    conditions = []
+    equal_so_far = []
+    for name, value in zip(ordering, values):
+        descending = name.startswith('-')
+        attr = name.lstrip('-')
+        nullable = _is_nullable(model, attr)
+
+        after = _after_value_q(attr, value, descending, nullable)
+        if after is not None:
+            conditions.append(functools.reduce(operator.and_, equal_so_far + [after]))
+
+        equal_so_far.append(
+            Q(**{attr + '__isnull': True}) if value is None else Q(**{attr: value}))
+
+    if not conditions:
+        # Nothing can come after the last possible position.
+        return Q(pk__in=[])
+    condition = functools.reduce(operator.or_, conditions)
+
+    # Add a bound on the first field alone which the database can use to start an index scan.
+    name, value = ordering[0], values[0]
+    attr = name.lstrip('-')
+    if value is not None:
+        if name.startswith('-'):
+            bound = Q(**{attr + '__lte': value})
+        else:
+            bound = Q(**{attr + '__gte': value})
+            if _is_nullable(model, attr):
+                bound |= Q(**{attr + '__isnull': True})
+        condition = bound & condition
+
+    return condition
+
+
+def _after_value_q(attr, value, descending, nullable):
+    """
+    Return a :py:class:`~django.db.models.Q` matching values of *attr* after *value* or None if no
+    value can be after it. *nullable* is whether *attr* may be ``NULL``.
+
+    """
+    if descending:
+        # NULL values come first.
+        if value is None:
+            return Q(**{attr + '__isnull': False})
+        return Q(**{attr + '__lt': value})
+
+    # NULL values come last.
+    if value is None:
+        return None
+    if nullable:
+        return Q(**{attr + '__gt': value}) | Q(**{attr + '__isnull': True})
+    return Q(**{attr + '__gt': value})
+
+
+def _is_nullable(model, attr):
+    """Return whether *attr* of *model* may be ``NULL``. Annotations are assumed to be."""
+    if attr == 'pk':
+        return False
+    try:
+        return model._meta.get_field(attr).null
+    except FieldDoesNotExist:
+        return True
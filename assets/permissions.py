@@ -8,7 +8,7 @@ from django.conf import settings
 from rest_framework import permissions
 from rest_framework.exceptions import ValidationError
 
-from automationlookup.lookup import get_person_for_user
+from .lookup import get_person_for_request
 
 LOG = logging.getLogger(__name__)
 
@@ -56,6 +56,15 @@ def OrPermission(*args):
                     return True
             return False
 
+        def get_object_permission_checker(self, request, view):
+            """Return a checker which is true when any permission whose has_permission() is true
+            has an object permission which is true."""
+            checkers = [
+                get_object_permission_checker(permission, request, view)
+                for permission in self.permissions if permission.has_permission(request, view)
+            ]
+            return lambda obj: any(checker(obj) for checker in checkers)
+
     return OrPermissionClass
 
 
@@ -95,9 +104,44 @@ def AndPermission(*args):
                     return False
             return True
 
+        def get_object_permission_checker(self, request, view):
+            """Return a checker which is false when any of the permissions' checkers is false."""
+            checkers = [
+                get_object_permission_checker(permission, request, view)
+                for permission in self.permissions
+            ]
+            return lambda obj: all(checker(obj) for checker in checkers)
+
     return AndPermissionClass
 
 
+def get_object_permission_checker(permission, request, view):
+    """
+    Return a callable which takes an object and returns the same value as
+    ``permission.has_object_permission(request, view, obj)`` for the current state of *request*.
+    Permissions may implement a ``get_object_permission_checker(request, view)`` method which does
+    any work which is independent of the object once so that checking many objects is cheap.
+    Otherwise the returned callable calls :py:meth:`has_object_permission` with the request
+    method set to its current value.
+
+    """
+    get_checker = getattr(permission, 'get_object_permission_checker', None)
+    if get_checker is not None:
+        return get_checker(request, view)
+
+    method = request.method
+
+    def checker(obj):
+        original_method = request.method
+        request.method = method
+        try:
+            return permission.has_object_permission(request, view, obj)
+        finally:
+            request.method = original_method
+
+    return checker
+
+
 class HasScopesPermission(permissions.BasePermission):
     """
     Django REST framework permission which requires that the scopes granted to an OAuth2 token are
@@ -134,11 +178,25 @@ class UserInInstitutionPermission(permissions.BasePermission):
         if request.method != 'POST':
             return True
 
+        # Bulk creation has a list of assets and the user must be associated with the department
+        # of each of them. Lists are not accepted by other views.
+        if isinstance(request.data, list):
+            if getattr(view, 'action', None) != 'bulk_create':
+                return False
+            departments = set()
+            for item in request.data:
+                department = item.get('department') if isinstance(item, dict) else None
+                if not department:
+                    raise ValidationError('department is required')
+                departments.add(department)
+            institutions = self._get_user_institutions(request)
+            return institutions is not None and departments <= set(institutions)
+
         department = request.data.get('department')
         if not department:
             raise ValidationError('department is required')
 
-        return self._validate_asset_user_institution(request.user, department)
+        return self._validate_asset_user_institution(request, department)
 
     def has_object_permission(self, request, view, obj):
         """
@@ -149,33 +207,55 @@ class UserInInstitutionPermission(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        if not self._validate_asset_user_institution(request.user, obj.department):
+        if not self._validate_asset_user_institution(request, obj.department):
             return False
         # in the case of PATCH, department may not have have been given
         if 'department' in request.data and not \
-                self._validate_asset_user_institution(request.user, request.data['department']):
+                self._validate_asset_user_institution(request, request.data['department']):
             return False
         return True
 
+    def get_object_permission_checker(self, request, view):
+        """
+        Return a checker equivalent to has_object_permission() which resolves the user's
+        institutions and checks any given department once.
+        """
+        if request.method in permissions.SAFE_METHODS:
+            return lambda obj: True
+
+        institutions = self._get_user_institutions(request)
+        if institutions is None:
+            return lambda obj: False
+
+        # in the case of PATCH, department may not have have been given
+        if 'department' in request.data and request.data['department'] not in institutions:
+            return lambda obj: False
+
+        institutions = frozenset(institutions)
+        return lambda obj: obj.department in institutions
+
+    @classmethod
+    def _validate_asset_user_institution(cls, request, department):
+        """Validates that the user making the request is member of the department that the asset
+        belongs to (asset_department)."""
+        institutions = cls._get_user_institutions(request)
+        return institutions is not None and department in institutions
+
     @staticmethod
-    def _validate_asset_user_institution(user, department):
-        """Validates that the user is member of the department that the asset belongs to
-        (asset_department)."""
+    def _get_user_institutions(request):
+        """Return a list of the instids of the institutions of the user making the request or None
+        if they are not known."""
 
-        lookup_response = get_person_for_user(user)
+        lookup_response = get_person_for_request(request)
         if lookup_response is None:
-            LOG.error('No cached lookup response for %s', user)
-            return False
+            LOG.error('No cached lookup response for %s', request.user)
+            return None
 
         if lookup_response.get('institutions') is None:
-            LOG.error('No institutions in cached lookup response for %s', user)
-            return False
+            LOG.error('No institutions in cached lookup response for %s', request.user)
+            return None
 
-        for institution in lookup_response['institutions']:
-            if department == institution['instid']:
-                return True
-
-        return False
+        return [institution['instid'] for institution in lookup_response['institutions']]
 
 
 class UserInIARGroupPermission(permissions.BasePermission):
@@ -183,7 +263,7 @@ class UserInIARGroupPermission(permissions.BasePermission):
     Django REST framework permission which requires that the user be in the IAR_USERS_LOOKUP_GROUP.
     """
     def has_permission(self, request, view):
-        lookup_response = get_person_for_user(request.user)
+        lookup_response = get_person_for_request(request)
         if lookup_response is None:
             LOG.error('No cached lookup response for %s', request.user)
             return False
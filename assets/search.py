@@ -0,0 +1,224 @@
+"""
+Full-text search for assets.
+
+On PostgreSQL, the ``search_vector`` column of the asset table holds a weighted ``tsvector`` built
+from the searchable fields. It is maintained by a database trigger and indexed with a GIN index.
+See migration ``0015_asset_search_vector``. The column is not part of the
+:py:class:`~assets.models.Asset` model so it is never fetched or written by Django.
+
+On other databases, searching falls back to Django REST framework's
+:py:class:`~rest_framework.filters.SearchFilter`.
+
+Fields with choices store a mnemonic rather than the label users see. Search terms are also
+matched against the labels using a :py:class:`ChoiceLabelIndex` which maps words in the labels to
+the choice keys. The matching keys are then filtered for in SQL.
+
+"""
+import bisect
+import functools
+import operator
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter, OrderingFilter
+
+from .fields import ChoiceBitmaskField
+
+
+SEARCH_CONFIG = 'english'
+"""PostgreSQL text search configuration used to build and query the search vector."""
+
+SEARCH_RANK_ANNOTATION = 'search_rank'
+"""Name of the annotation added to searched querysets holding each result's rank."""
+
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def is_full_text_search_supported(using):
+    """Return True if the database with alias *using* supports full-text search."""
+    return connections[using].vendor == 'postgresql'
+
+
+def get_tsquery(terms):
+    """
+    Return a PostgreSQL ``tsquery`` string matching documents which contain all of *terms* as
+    words or word prefixes. Each term is quoted so that it cannot alter the query syntax.
+
+    """
+    return ' & '.join(
+        "'{}':*".format(term.replace('\\', '\\\\').replace("'", "''")) for term in terms
+    )
+
+
+class ChoiceLabelIndex:
+    """
+    An inverted index from the lower-cased words of the choice labels of some model fields to the
+    choice keys whose labels contain them.
+
+    :param model: Model class whose fields are indexed
+    :param field_names: Names of the fields with choices to index
+
+    """
+    def __init__(self, model, field_names):
+        self.fields = {name: model._meta.get_field(name) for name in field_names}
+
+        self._index = {}
+        for name, field in self.fields.items():
+            for key, label in field.flatchoices:
+                for word in _WORD_RE.findall(str(label).lower()):
+                    self._index.setdefault(word, set()).add((name, key))
+        self._words = sorted(self._index)
+
+    def lookup(self, term):
+        """
+        Return a dict mapping field names to the set of choice keys whose labels contain a word
+        starting with each word in *term*. Fields with no matching keys are omitted.
+
+        """
+        words = _WORD_RE.findall(term.lower())
+        if not words:
+            return {}
+
+        matches = functools.reduce(operator.and_, (self._prefix_matches(word) for word in words))
+        keys = {}
+        for name, key in matches:
+            keys.setdefault(name, set()).add(key)
+        return keys
+
+    def get_q(self, term):
+        """
+        Return a :py:class:`~django.db.models.Q` matching objects with a choice whose label matches
+        *term* or None if no label matches.
+
+        """
+        queries = [
+            get_choice_keys_q(self.fields[name], keys)
+            for name, keys in sorted(self.lookup(term).items())
+        ]
+        if not queries:
+            return None
+        return functools.reduce(operator.or_, queries)
+
+    def _prefix_matches(self, prefix):
+        matches = set()
+        for word in self._words[bisect.bisect_left(self._words, prefix):]:
+            if not word.startswith(prefix):
+                break
+            matches |= self._index[word]
+        return matches
+
+
+@functools.lru_cache()
+def get_choice_label_index(model, field_names):
+    """
+    Return a :py:class:`ChoiceLabelIndex` for the fields of *model* named in the tuple
+    *field_names*. Indices are built once and shared.
+
+    """
+    return ChoiceLabelIndex(model, field_names)
+
+
+def get_choice_keys_q(field, keys):
+    """
+    Return a :py:class:`~django.db.models.Q` matching objects where *field* has any of the choice
+    *keys*.
+
+    """
+    if isinstance(field, ChoiceBitmaskField):
+        return Q(**{field.name + '__contains_any': sorted(keys)})
+    return Q(**{field.name + '__in': sorted(keys)})
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    A :py:class:`~rest_framework.filters.SearchFilter` which, on PostgreSQL, matches the search
+    terms against the asset search vector and annotates each result with its rank. On other
+    databases, it matches the terms against the ``search_fields`` of the view.
+
+    Each term may alternatively match the label of a choice of one of the fields named in the
+    view's ``search_choice_fields`` attribute.
+
+    """
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+
+        label_index = get_choice_label_index(
+            queryset.model, tuple(getattr(view, 'search_choice_fields', ())))
+
+        if is_full_text_search_supported(queryset.db):
+            queryset, text_queries = self._full_text_queries(queryset, search_terms)
+        else:
+            text_queries = self._search_fields_queries(view, search_terms)
+
+        conditions = []
+        for term, text_query in zip(search_terms, text_queries):
+            label_query = label_index.get_q(term)
+            conditions.append(text_query if label_query is None else text_query | label_query)
+
+        return queryset.filter(*conditions)
+
+    def _search_fields_queries(self, view, search_terms):
+        """Return a Q for each term matching it against the view's search fields."""
+        orm_lookups = [
+            self.construct_search(str(field)) for field in getattr(view, 'search_fields', ())
+        ]
+        return [
+            functools.reduce(operator.or_, (Q(**{lookup: term}) for lookup in orm_lookups), Q())
+            for term in search_terms
+        ]
+
+    def _full_text_queries(self, queryset, search_terms):
+        """
+        Annotate *queryset* with the search rank and with whether each term matches the search
+        vector. Return the annotated queryset and a Q for each term matching it.
+
+        """
+        connection = connections[queryset.db]
+        search_vector = '{}.{}'.format(
+            connection.ops.quote_name(queryset.model._meta.db_table),
+            connection.ops.quote_name('search_vector')
+        )
+
+        annotations = {
+            SEARCH_RANK_ANNOTATION: RawSQL(
+                # Ranks are cast to double precision so that they survive a round trip through
+                # the pagination cursor exactly.
+                'ts_rank({}, to_tsquery(%s, %s))::double precision'.format(search_vector),
+                (SEARCH_CONFIG, get_tsquery(search_terms)), output_field=FloatField()
+            ),
+        }
+        queries = []
+        for idx, term in enumerate(search_terms):
+            name = '{}_match_{}'.format(SEARCH_RANK_ANNOTATION, idx)
+            annotations[name] = RawSQL(
+                '{} @@ to_tsquery(%s, %s)'.format(search_vector),
+                (SEARCH_CONFIG, get_tsquery([term])), output_field=BooleanField()
+            )
+            queries.append(Q(**{name: True}))
+
+        return queryset.annotate(**annotations), queries
+
+
+class SearchRankOrderingFilter(OrderingFilter):
+    """
+    An :py:class:`~rest_framework.filters.OrderingFilter` which, when a full-text search is made
+    and no explicit ordering is requested, orders results by descending search rank before the
+    view's default ordering.
+
+    """
+    def get_default_ordering(self, view):
+        ordering = super().get_default_ordering(view)
+
+        request = getattr(view, 'request', None)
+        if request is None or not SearchFilter().get_search_terms(request):
+            return ordering
+        queryset = getattr(view, 'queryset', None)
+        if queryset is None or not is_full_text_search_supported(queryset.db):
+            return ordering
+
+        return ('-' + SEARCH_RANK_ANNOTATION,) + tuple(ordering or ())
@@ -3,11 +3,41 @@ Django REST framework serialisers.
 
 """
 import contextlib
+import copy
 
+from django.db import transaction
 from rest_framework import serializers, fields
 from rest_framework.exceptions import PermissionDenied
 
-from assets.models import Asset
+from assets.models import Asset, audit_changes
+from assets.permissions import get_object_permission_checker
+
+
+class AssetListSerializer(serializers.ListSerializer):
+    """
+    Serialise a list of :py:class:`assets.models.Asset` objects. Creating or updating assets via
+    this serializer writes all of them with bulk queries in one transaction and records the audits
+    of updated assets with a single query.
+
+    """
+    def create(self, validated_data):
+        return Asset.objects.bulk_create([Asset(**attrs) for attrs in validated_data])
+
+    def update(self, instances, validated_data):
+        """Update each of *instances*, a list of assets, with the same item of *validated_data*."""
+        changes, field_names = [], set()
+        for instance, attrs in zip(instances, validated_data):
+            old = copy.copy(instance)
+            for name, value in attrs.items():
+                setattr(instance, name, value)
+            field_names.update(attrs)
+            changes.append((old, instance))
+
+        with transaction.atomic():
+            Asset.objects.bulk_update(instances, field_names)
+            audit_changes(changes)
+
+        return instances
 
 
 class AssetSerializer(serializers.HyperlinkedModelSerializer):
@@ -18,6 +48,8 @@ class AssetSerializer(serializers.HyperlinkedModelSerializer):
     methods on this object. These fields are set by the default get_serializer_context()
     implementation on ViewSets.
 
+    If the requested_fields field of the context is set, only the fields it names are serialised.
+
     """
     id = fields.UUIDField(format='hex_verbose', read_only=True)
 
@@ -42,33 +74,102 @@ class AssetSerializer(serializers.HyperlinkedModelSerializer):
         model = Asset
         exclude = ('deleted_at',)
         read_only_fields = ('created_at', 'updated_at', 'is_complete')
+        list_serializer_class = AssetListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # If the context specifies a set of requested fields, drop all others.
+        requested_fields = self.context.get('requested_fields')
+        if requested_fields is not None:
+            for name in set(self.fields) - set(requested_fields):
+                self.fields.pop(name)
+
+    #: Methods which are reported in allowed_methods if the user may perform them.
+    ALLOWED_METHODS_CANDIDATES = ('PUT', 'PATCH', 'DELETE')
 
     def get_allowed_methods(self, obj):
         """
         Retrieve a list of allowed_methods the current user has on the object being serialised if
         the current request and view are present in the context.
 
+        The view-level permission checks and any per-request work done by the object permissions
+        are performed once for each method and shared between all objects serialised by the root
+        serializer. This gives the same result as running the full view permission checks for
+        each method on each object.
+
+        """
+        checkers = self._get_allowed_methods_checkers()
+        if checkers is None:
+            return None
+
+        return [method for method, checker in checkers if checker(obj)]
+
+    def _get_allowed_methods_checkers(self):
+        """
+        Return a list of (method, checker) pairs where checker is a callable taking an object and
+        returning whether the method is allowed on it. Returns None if there is no request or view
+        in the context. The list is computed once and cached on the root serializer.
+
         """
-        # We need a request and view to return a result
+        root = self.root
+        if not hasattr(root, '_allowed_methods_checkers'):
+            root._allowed_methods_checkers = self._build_allowed_methods_checkers()
+        return root._allowed_methods_checkers
+
+    def _build_allowed_methods_checkers(self):
         request = self.context.get('request')
         view = self.context.get('view')
         if request is None or view is None:
             return None
 
-        allowed_methods = []
-        for method in ['PUT', 'PATCH', 'DELETE']:
+        checkers = []
+        for method in self.ALLOWED_METHODS_CANDIDATES:
             with setting_request_method(request, method):
                 try:
-                    # We check all the permissions and append the method to the list of allowed
-                    # methods. If we fail any permissions checks, then a PermissionDenied exception
-                    # is thrown which we silently swallow.
                     view.check_permissions(request)
-                    view.check_object_permissions(request, obj)
-                    allowed_methods.append(method)
                 except PermissionDenied:
-                    pass
+                    # The method is not allowed on any object.
+                    continue
+
+                # check_object_permissions() requires all permissions to be satisfied.
+                object_checkers = [
+                    get_object_permission_checker(permission, request, view)
+                    for permission in view.get_permissions()
+                ]
+
+            checkers.append((method, _all_checker(object_checkers)))
+
+        return checkers
+
 
-        return allowed_methods
+class RowHyperlinkedIdentityField(serializers.HyperlinkedIdentityField):
+    """
+    A :py:class:`rest_framework.serializers.HyperlinkedIdentityField` for rows fetched as dicts
+    with :py:meth:`django.db.models.query.QuerySet.values`.
+
+    """
+    def get_url(self, obj, view_name, request, format):
+        return self.reverse(view_name, kwargs={self.lookup_url_kwarg: obj[self.lookup_field]},
+                            request=request, format=format)
+
+
+class AssetTypeaheadSerializer(serializers.HyperlinkedModelSerializer):
+    """
+    Serialise the fields of an asset, fetched as a dict, needed to present it as a type-ahead
+    suggestion.
+
+    """
+    url = RowHyperlinkedIdentityField(
+        view_name='asset-detail', lookup_field='id', lookup_url_kwarg='pk')
+    id = fields.UUIDField(format='hex_verbose', read_only=True)
+    similarity = serializers.FloatField(
+        read_only=True, help_text='How closely the asset matches the query text, from 0 to 1')
+
+    class Meta:
+        model = Asset
+        fields = ('url', 'id', 'name', 'owner', 'department', 'storage_location', 'similarity')
+        read_only_fields = fields
 
 
 class AssetDeptStatsSerializer(serializers.Serializer):
@@ -83,7 +184,7 @@ class AssetDeptStatsSerializer(serializers.Serializer):
 
 class AssetCountsSerializer(serializers.Serializer):
     """
-    Serialise a :py:class:`assets.views.AssetCounts` object.
+    Serialise a :py:class:`assets.models.AssetCounts` object.
     """
     total = serializers.IntegerField(help_text='Total number of asset entries')
     completed = serializers.IntegerField(help_text='Total number of completed asset entries')
@@ -112,3 +213,8 @@ def setting_request_method(request, method):
     request.method = method
     yield request
     request.method = original_method
+
+
+def _all_checker(checkers):
+    """Return a checker which is true for an object when all of *checkers* are true for it."""
+    return lambda obj: all(checker(obj) for checker in checkers)
@@ -0,0 +1,14 @@
+"""
+Custom signals sent by the :py:mod:`assets` application.
+
+"""
+from django.dispatch import Signal
+
+
+asset_stats_changed = Signal()
+"""
+Sent whenever an asset is created, changed or deleted in a way which changes the per-department
+statistics held in :py:class:`assets.models.DepartmentAssetStats`. This includes bulk changes made
+via :py:class:`assets.models.AssetQuerySet`.
+
+"""
@@ -0,0 +1,65 @@
+"""
+Caching of responses from the statistics endpoint. The serialised statistics are stored in the
+cache named by :py:attr:`~assets.defaultsettings.IAR_STATS_CACHE_ALIAS` along with an ETag
+computed from their content. No modification time is stored since the time an entry is cached is
+not the time the statistics changed. Cached entries are removed when the
+:py:data:`~assets.signals.asset_stats_changed` signal is sent. The receiver is registered by the
+:py:class:`~assets.apps.AssetsConfig` class's :py:meth:`~assets.apps.AssetsConfig.ready` method.
+
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+
+from .signals import asset_stats_changed
+
+
+CACHE_KEY = 'assets:stats'
+
+
+def get_cached_stats():
+    """
+    Return the cached statistics entry as a dict with keys ``data`` and ``etag`` or None if there
+    is no cached entry.
+
+    """
+    return _get_cache().get(CACHE_KEY)
+
+
+def set_cached_stats(data):
+    """
+    Cache the serialised statistics *data* for at most
+    :py:attr:`~assets.defaultsettings.IAR_STATS_CACHE_MAX_STALENESS` seconds and return the new
+    cache entry.
+
+    """
+    entry = {
+        'data': data,
+        'etag': '"{}"'.format(hashlib.sha1(JSONRenderer().render(data)).hexdigest()),
+    }
+    _get_cache().set(CACHE_KEY, entry, settings.IAR_STATS_CACHE_MAX_STALENESS)
+    return entry
+
+
+def invalidate_cached_stats():
+    """Remove any cached statistics entry."""
+    _get_cache().delete(CACHE_KEY)
+
+
+@receiver(asset_stats_changed)
+def _invalidate_on_stats_changed(sender, **kwargs):
+    """
+    Invalidate the cached statistics immediately and again once the current transaction commits
+    so that an entry cached from a concurrent request before the commit is not kept.
+
+    """
+    invalidate_cached_stats()
+    transaction.on_commit(invalidate_cached_stats)
+
+
+def _get_cache():
+    return caches[settings.IAR_STATS_CACHE_ALIAS]
@@ -0,0 +1,156 @@
+"""
+A fake OAuth2 and Lookup server for tests which serves token, token introspection and Lookup
+people endpoints on the local host from background threads.
+
+"""
+import json
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeOAuth2Server:
+    """
+    A fake OAuth2 server. Use as a context manager to start and stop the server. While running,
+    :py:attr:`token_url`, :py:attr:`introspect_url` and :py:attr:`lookup_root` are the URLs of its
+    endpoints. Connections are kept alive between requests.
+
+    The token endpoint issues client credentials tokens to any client. The introspection endpoint
+    reports tokens added with :py:meth:`add_token` as active and all others as not active. The
+    Lookup people endpoint returns the people added with :py:meth:`add_person`. The introspection
+    and Lookup endpoints require a token issued by the token endpoint.
+
+    :ivar dict counts: number of requests made to each endpoint keyed by path, with the Lookup
+        people endpoint counted as ``/people``
+    :ivar set issued_tokens: access tokens issued by the token endpoint
+
+    """
+    #: Lifetime in seconds of the tokens issued by the token endpoint.
+    token_lifetime = 3600
+
+    #: Time in seconds which the token endpoint waits before responding.
+    token_delay = 0
+
+    #: Time in seconds which the Lookup people endpoint waits before responding.
+    lookup_delay = 0
+
+    def __init__(self):
+        self.tokens = {}
+        self.people = {}
+        self.issued_tokens = set()
+        self.counts = {'/token': 0, '/introspect': 0, '/people': 0}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def root(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    @property
+    def token_url(self):
+        return self.root + '/token'
+
+    @property
+    def introspect_url(self):
+        return self.root + '/introspect'
+
+    @property
+    def lookup_root(self):
+        return self.root + '/'
+
+    def add_token(self, token, scope='', sub='test0001', expires_in=3600):
+        """Add an active token which expires in *expires_in* seconds."""
+        self.tokens[token] = {
+            'active': True, 'scope': scope, 'sub': sub, 'client_id': 'test-client',
+            'iat': int(time.time()), 'exp': int(time.time()) + expires_in,
+        }
+
+    def add_person(self, scheme, identifier, person):
+        """Add the Lookup person resource *person* for the given identity."""
+        self.people[(scheme, identifier)] = person
+
+    def __enter__(self):
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _count(self, path):
+        with self._lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+
+    def _issue_token(self):
+        with self._lock:
+            access_token = 'server-token-{}'.format(len(self.issued_tokens) + 1)
+            self.issued_tokens.add(access_token)
+        return access_token
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                match = re.match(r'^/people/([^/]+)/([^/]+)$', urlsplit(self.path).path)
+                if match is None:
+                    self._send_json({}, status=404)
+                    return
+
+                server._count('/people')
+                time.sleep(server.lookup_delay)
+                if not self._is_authorised():
+                    self._send_json({}, status=401)
+                    return
+
+                person = server.people.get(match.groups())
+                self._send_json(person or {}, status=200 if person is not None else 404)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf8')
+                form = {key: values[0] for key, values in parse_qs(body).items()}
+                server._count(self.path)
+
+                if self.path == '/token':
+                    time.sleep(server.token_delay)
+                    self._send_json({
+                        'access_token': server._issue_token(), 'token_type': 'bearer',
+                        'expires_in': server.token_lifetime, 'scope': form.get('scope', ''),
+                    })
+                elif self.path == '/introspect':
+                    if not self._is_authorised():
+                        self._send_json({}, status=401)
+                        return
+                    self._send_json(server.tokens.get(form.get('token'), {'active': False}))
+                else:
+                    self._send_json({}, status=404)
+
+            def _is_authorised(self):
+                authorization = self.headers.get('Authorization', '')
+                return authorization[len('Bearer '):] in server.issued_tokens
+
+            def _send_json(self, data, status=200):
+                body = json.dumps(data).encode('utf8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
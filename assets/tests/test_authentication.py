@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from assets import authentication, httpclient
+from assets.tests.fakeoauth2 import FakeOAuth2Server
+
+
+class CachedOAuth2TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = FakeOAuth2Server()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+        settings_override = override_settings(
+            OAUTH2_TOKEN_URL=self.server.token_url,
+            OAUTH2_INTROSPECT_URL=self.server.introspect_url,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(httpclient.clear_access_tokens)
+        self.addCleanup(httpclient.close_session)
+
+        cache.clear()
+        authentication.cache_stats.reset()
+        self.authenticator = authentication.CachedOAuth2TokenAuthentication()
+        get_user_model().objects.create_user(username='test0001')
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION='Bearer ' + token)
+        return self.authenticator.authenticate(request)
+
+    def test_active_token_cached(self):
+        """Active tokens are introspected once and then answered from the cache."""
+        self.server.add_token('good', scope='assetregister')
+        for _ in range(3):
+            self.assertEqual(self.authenticate('good')[1]['scope'], 'assetregister')
+        self.assertEqual(self.server.counts['/introspect'], 1)
+        self.assertEqual(
+            (authentication.cache_stats.hits, authentication.cache_stats.misses), (2, 1))
+
+    def test_inactive_token_cached(self):
+        """Tokens which are not active are cached for the negative lifetime."""
+        for _ in range(2):
+            self.assertIsNone(self.authenticator.validate_token('bad'))
+        self.assertEqual(self.server.counts['/introspect'], 1)
+
+        with self.settings(IAR_TOKEN_CACHE_NEGATIVE_LIFETIME=0):
+            cache.clear()
+            for _ in range(2):
+                self.assertIsNone(self.authenticator.validate_token('bad'))
+        self.assertEqual(self.server.counts['/introspect'], 3)
+
+    def test_tokens_not_stored(self):
+        """The cache is keyed by a hash of the token."""
+        key = authentication.get_cache_key('good')
+        self.assertNotIn('good', key)
+        self.assertNotEqual(key, authentication.get_cache_key('other'))
+
+    def test_lifetime_bounded_by_expiry(self):
+        """Entries never outlive the token or the configured maximum."""
+        with self.settings(IAR_TOKEN_CACHE_MAX_LIFETIME=60):
+            self.assertEqual(authentication.get_cache_lifetime({'exp': 1030}, now=1000), 30)
+            self.assertEqual(authentication.get_cache_lifetime({'exp': 2000}, now=1000), 60)
+            self.assertEqual(authentication.get_cache_lifetime({}, now=1000), 60)
+            self.assertLessEqual(authentication.get_cache_lifetime({'exp': 900}, now=1000), 0)
@@ -0,0 +1,167 @@
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from assets import httpclient
+from assets.tests.fakeoauth2 import FakeOAuth2Server
+
+
+class HTTPClientTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = FakeOAuth2Server()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.add_person('mock', 'test0001', {'identifier': 'test0001'})
+
+        settings_override = override_settings(
+            OAUTH2_TOKEN_URL=self.server.token_url,
+            OAUTH2_INTROSPECT_URL=self.server.introspect_url,
+            LOOKUP_ROOT=self.server.lookup_root,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        httpclient.close_session()
+        httpclient.clear_access_tokens()
+        self.addCleanup(httpclient.clear_access_tokens)
+        self.addCleanup(httpclient.close_session)
+
+    def get_person(self):
+        response = httpclient.authenticated_request(
+            'GET', self.server.lookup_root + 'people/mock/test0001', ['lookup'])
+        response.raise_for_status()
+        return response.json()
+
+    def test_connections_reused(self):
+        """Requests to the same host share one kept-alive connection."""
+        for _ in range(5):
+            self.assertEqual(self.get_person(), {'identifier': 'test0001'})
+
+        # One request to the token endpoint and five to Lookup.
+        stats = httpclient.get_connection_stats()
+        self.assertEqual(stats, (6, 1))
+        self.assertEqual(stats.reused, 5)
+
+    def test_token_reused(self):
+        """The access token is fetched once and used until it is about to expire."""
+        for _ in range(3):
+            self.get_person()
+        self.assertEqual(self.server.counts['/token'], 1)
+
+        httpclient.clear_access_tokens()
+        self.server.token_lifetime = httpclient.TOKEN_EXPIRY_MARGIN
+        for _ in range(2):
+            self.get_person()
+        self.assertEqual(self.server.counts['/token'], 3)
+
+    def test_tokens_per_scopes(self):
+        """Tokens are fetched for each set of scopes."""
+        httpclient.get_access_token(['a'])
+        httpclient.get_access_token(['a'])
+        httpclient.get_access_token(['a', 'b'])
+        self.assertEqual(self.server.counts['/token'], 2)
+
+    def test_default_timeout(self):
+        """Requests have the configured timeouts by default."""
+        with self.settings(IAR_HTTP_CONNECT_TIMEOUT=1, IAR_HTTP_READ_TIMEOUT=2):
+            httpclient.close_session()
+            adapter = httpclient.get_session().get_adapter(self.server.root)
+            self.assertEqual(adapter.timeout, (1, 2))
+            self.assertEqual(adapter.max_retries.total, settings.OAUTH2_MAX_RETRIES)
+
+    def test_session_per_process(self):
+        """Each process has its own session."""
+        session = httpclient.get_session()
+        self.assertIs(httpclient.get_session(), session)
+        with mock.patch('os.getpid', return_value=-1):
+            self.assertIsNot(httpclient.get_session(), session)
+
+    def test_threads(self):
+        """The session and token are shared between threads."""
+        errors = []
+
+        def get_people():
+            try:
+                for _ in range(5):
+                    self.get_person()
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+
+        threads = [threading.Thread(target=get_people) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.server.counts['/token'], 1)
+        stats = httpclient.get_connection_stats()
+        self.assertEqual(stats.requests, 21)
+        self.assertLessEqual(stats.connections, 4)
+
+
+class TokenManagerTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = FakeOAuth2Server()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.token_delay = 0.2
+
+        settings_override = override_settings(OAUTH2_TOKEN_URL=self.server.token_url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        httpclient.close_session()
+        httpclient.clear_access_tokens()
+        self.addCleanup(httpclient.close_session)
+        self.addCleanup(httpclient.clear_access_tokens)
+        self.manager = httpclient.get_token_manager(['lookup'])
+
+    def test_concurrent_fetches_merged(self):
+        """Callers waiting for the first token share one fetch."""
+        tokens = []
+        threads = [
+            threading.Thread(target=lambda: tokens.append(self.manager.get_token()))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(tokens)), 1)
+        self.assertEqual(len(tokens), 8)
+        self.assertEqual(self.server.counts['/token'], 1)
+        self.assertEqual(self.manager.fetches, 1)
+
+    def test_refreshed_in_background(self):
+        """Tokens due to be refreshed are refreshed without waiting."""
+        with mock.patch.object(httpclient, 'TOKEN_REFRESH_FRACTION', 0):
+            first_token = self.manager.get_token()
+
+            start = time.monotonic()
+            for _ in range(10):
+                self.assertEqual(self.manager.get_token(), first_token)
+            self.assertLess(time.monotonic() - start, self.server.token_delay)
+
+            self.manager.join()
+        self.assertEqual(self.server.counts['/token'], 2)
+        self.assertNotEqual(self.manager.get_token(), first_token)
+
+    def test_failed_refresh(self):
+        """The current token is used if refreshing fails."""
+        with mock.patch.object(httpclient, 'TOKEN_REFRESH_FRACTION', 0):
+            first_token = self.manager.get_token()
+            with self.settings(OAUTH2_TOKEN_URL=self.server.root + '/missing'), \
+                    self.assertLogs(httpclient.LOG, 'ERROR'):
+                self.assertEqual(self.manager.get_token(), first_token)
+                self.manager.join()
+
+            # Refreshing is not attempted again immediately.
+            self.assertEqual(self.manager.get_token(), first_token)
+        self.assertEqual(self.manager.fetches, 1)
@@ -0,0 +1,182 @@
+"""
+Test fetching and request-scoped memoisation of Lookup person resources.
+
+"""
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+
+from assets import httpclient, lookup
+from assets.lookup import clear_cached_person_for_user, set_cached_person_for_user
+from assets.tests.fakeoauth2 import FakeOAuth2Server
+from automationlookup.models import UserLookup
+
+
+class GetPersonForRequestTests(TestCase):
+    def setUp(self):
+        self.request = Request(HttpRequest())
+        self.user = get_user_model().objects.create_user(username="test0001")
+        UserLookup.objects.create(user=self.user, scheme='mock', identifier=self.user.username)
+        self.request.user = self.user
+        set_cached_person_for_user(self.user, {'institutions': [{'instid': 'UIS'}]})
+
+        self.get_person_patch = mock.patch(
+            'assets.lookup.get_person_for_user', wraps=lookup.get_person_for_user)
+        self.mock_get_person = self.get_person_patch.start()
+
+    def tearDown(self):
+        self.get_person_patch.stop()
+        clear_cached_person_for_user(self.user)
+
+    def test_memoised(self):
+        """Lookup is only consulted once per request."""
+        for _ in range(3):
+            self.assertEqual(
+                lookup.get_person_for_request(self.request),
+                {'institutions': [{'instid': 'UIS'}]}
+            )
+        self.assertEqual(self.mock_get_person.call_count, 1)
+
+        memo = lookup.get_person_memo(self.request)
+        self.assertEqual((memo.hits, memo.misses), (2, 1))
+
+    def test_per_request(self):
+        """Each request has its own memo."""
+        other_request = Request(HttpRequest())
+        other_request.user = self.user
+        lookup.get_person_for_request(self.request)
+        lookup.get_person_for_request(other_request)
+        self.assertEqual(self.mock_get_person.call_count, 2)
+
+    def test_per_user(self):
+        """The memo is keyed by user."""
+        other_user = get_user_model().objects.create_user(username="test0002")
+        UserLookup.objects.create(user=other_user, scheme='mock', identifier=other_user.username)
+        set_cached_person_for_user(other_user, {'institutions': []})
+
+        lookup.get_person_for_request(self.request)
+        self.request.user = other_user
+        self.assertEqual(lookup.get_person_for_request(self.request), {'institutions': []})
+        self.assertEqual(self.mock_get_person.call_count, 2)
+        clear_cached_person_for_user(other_user)
+
+
+class GetPersonForUserTests(TestCase):
+    def setUp(self):
+        self.server = FakeOAuth2Server()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.server.add_person('mock', 'test0001', {'institutions': [{'instid': 'UIS'}]})
+
+        settings_override = override_settings(
+            OAUTH2_TOKEN_URL=self.server.token_url, LOOKUP_ROOT=self.server.lookup_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(httpclient.clear_access_tokens)
+        self.addCleanup(httpclient.close_session)
+
+        self.user = get_user_model().objects.create_user(username="test0001")
+        UserLookup.objects.create(user=self.user, scheme='mock', identifier=self.user.username)
+        clear_cached_person_for_user(self.user)
+        self.addCleanup(clear_cached_person_for_user, self.user)
+
+    def test_fetched_and_cached(self):
+        """Person resources are fetched from Lookup once and then cached."""
+        for _ in range(2):
+            self.assertEqual(
+                lookup.get_person_for_user(self.user), {'institutions': [{'instid': 'UIS'}]})
+        self.assertEqual(self.server.counts['/people'], 1)
+
+    def test_automationlookup_cache_not_shared(self):
+        """Resources cached by automationlookup are not read and are not overwritten."""
+        cache.set('{}:lookup'.format(self.user.username), {'institutions': []})
+        self.addCleanup(cache.delete, '{}:lookup'.format(self.user.username))
+
+        self.assertEqual(
+            lookup.get_person_for_user(self.user), {'institutions': [{'instid': 'UIS'}]})
+        self.assertEqual(self.server.counts['/people'], 1)
+        self.assertEqual(
+            cache.get('{}:lookup'.format(self.user.username)), {'institutions': []})
+
+    def test_no_lookup_identity(self):
+        """Users without a Lookup identity have no person resource."""
+        other_user = get_user_model().objects.create_user(username="test0002")
+        self.assertIsNone(lookup.get_person_for_user(other_user))
+        self.assertIsNone(lookup.get_person_for_user(AnonymousUser()))
+        self.assertEqual(self.server.counts['/people'], 0)
+
+    def test_stale_served_while_refreshed(self):
+        """Stale resources are returned while they are refreshed in the background."""
+        with self.settings(LOOKUP_PEOPLE_CACHE_LIFETIME=0, IAR_LOOKUP_PEOPLE_CACHE_GRACE=60):
+            lookup.get_person_for_user(self.user)
+            self.server.add_person('mock', 'test0001', {'institutions': []})
+            self.server.lookup_delay = 0.2
+
+            self.assertEqual(
+                lookup.get_person_for_user(self.user), {'institutions': [{'instid': 'UIS'}]})
+            # The refresh started above is still in progress and so is not started again.
+            self.assertEqual(
+                lookup.refresh_person_for_user(self.user).result(), {'institutions': []})
+        # The cache is checked directly since getting the still stale resource would start
+        # another refresh which could outlive the test.
+        self.assertEqual(
+            cache.get(lookup.get_cache_key(self.user.username)).person, {'institutions': []})
+        self.assertEqual(self.server.counts['/people'], 2)
+
+    def test_concurrent_misses_merged(self):
+        """Concurrent fetches for the same user make one request to Lookup."""
+        self.server.lookup_delay = 0.2
+        self.user.lookup  # fetch the identity before it is needed by other threads
+        people = []
+        threads = [
+            threading.Thread(target=lambda: people.append(lookup.get_person_for_user(self.user)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(people, [{'institutions': [{'instid': 'UIS'}]}] * 8)
+        self.assertEqual(self.server.counts['/people'], 1)
+
+    def test_past_grace_fails(self):
+        """Resources past the grace window are not returned if Lookup cannot be reached."""
+        with self.settings(LOOKUP_PEOPLE_CACHE_LIFETIME=0, IAR_LOOKUP_PEOPLE_CACHE_GRACE=60):
+            lookup.get_person_for_user(self.user)
+        del self.server.people[('mock', 'test0001')]
+
+        with self.settings(IAR_LOOKUP_PEOPLE_CACHE_GRACE=0), \
+                self.assertRaises(lookup.LookupUnavailable):
+            lookup.get_person_for_user(self.user)
+        self.assertEqual(self.server.counts['/people'], 2)
+
+    def test_prefetch(self):
+        """Person resources for many users are fetched into the cache."""
+        other_user = get_user_model().objects.create_user(username="test0002")
+        UserLookup.objects.create(user=other_user, scheme='mock', identifier=other_user.username)
+        self.addCleanup(clear_cached_person_for_user, other_user)
+        self.server.add_person('mock', 'test0002', {'institutions': []})
+        no_lookup_user = get_user_model().objects.create_user(username="test0003")
+        users = [self.user, other_user, no_lookup_user]
+
+        self.assertEqual(lookup.prefetch_people(users, max_workers=2), (2, 1, {}))
+        self.assertEqual(lookup.get_person_for_user(other_user), {'institutions': []})
+        self.assertEqual(self.server.counts['/people'], 2)
+
+        # Fresh resources are only fetched again if asked.
+        self.assertEqual(lookup.prefetch_people(users), (0, 3, {}))
+        self.assertEqual(lookup.prefetch_people(users, refresh=True), (2, 1, {}))
+
+    def test_prefetch_failures(self):
+        """Failures to fetch person resources are reported."""
+        del self.server.people[('mock', 'test0001')]
+        result = lookup.prefetch_people([self.user])
+        self.assertEqual((result.fetched, result.skipped), (0, 0))
+        self.assertEqual(list(result.failed), ['test0001'])
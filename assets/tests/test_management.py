@@ -0,0 +1,212 @@
+"""
+Test the management commands shipped with the assets application.
+
+"""
+import json
+import os
+import tempfile
+import unittest
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command, CommandError
+from django.db import connection, models
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from assets import httpclient
+from assets.lookup import clear_cached_person_for_user
+from assets.management.commands import import_assets
+from assets.models import Asset, DepartmentAssetStats
+from assets.tests.fakeoauth2 import FakeOAuth2Server
+from assets.tests.test_models import COMPLETE_ASSET
+from automationlookup.models import UserLookup
+
+
+class IsCompleteCommandsTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.asset = Asset.objects.create(**COMPLETE_ASSET)
+
+        # Bypass the maintenance of is_complete by using the base QuerySet implementation.
+        models.QuerySet.update(Asset.objects.filter(pk=self.asset.pk), is_complete=False)
+
+    def test_check_fails_for_inconsistent_asset(self):
+        """check_is_complete fails if an asset has an inconsistent is_complete flag."""
+        stdout = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_is_complete', stdout=stdout)
+        self.assertIn(str(self.asset.pk), stdout.getvalue())
+
+    def test_update_fixes_inconsistent_asset(self):
+        """update_is_complete makes all is_complete flags consistent."""
+        call_command('update_is_complete', stdout=StringIO())
+        self.assertTrue(Asset.objects.get(pk=self.asset.pk).is_complete)
+        call_command('check_is_complete', stdout=StringIO())
+
+
+class RebuildAssetStatsTests(TestCase):
+    def test_rebuild(self):
+        """rebuild_asset_stats recomputes the summary table."""
+        Asset.objects.create(**COMPLETE_ASSET)
+        DepartmentAssetStats.objects.all().delete()
+        call_command('rebuild_asset_stats', stdout=StringIO())
+        stats = DepartmentAssetStats.objects.get(department='TESTDEPT')
+        self.assertEqual((stats.total, stats.completed, stats.with_personal_data), (1, 1, 1))
+
+
+class ReportIndexUsageTests(TestCase):
+    @unittest.skipIf(connection.vendor == 'postgresql', 'index usage is reported on PostgreSQL')
+    def test_requires_postgresql(self):
+        """report_index_usage fails on databases other than PostgreSQL."""
+        with self.assertRaises(CommandError):
+            call_command('report_index_usage', stdout=StringIO())
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'index usage requires PostgreSQL')
+    def test_report(self):
+        """report_index_usage lists the partial indexes on the asset table."""
+        stdout = StringIO()
+        call_command('report_index_usage', stdout=stdout)
+        self.assertIn('assets_asset_live_privacy', stdout.getvalue())
+
+
+class ImportAssetsTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf8') as f:
+            f.write(content)
+        return path
+
+    def test_csv(self):
+        """Assets are imported from CSV with multi-select fields as comma-separated keys."""
+        header = ['name', 'department', 'storage_format', 'personal_data', 'owner']
+        path = self.write_file('assets.csv', '\n'.join([
+            ','.join(header),
+            'asset1,TESTDEPT,"digital,paper",true,',
+            'asset2,,,false,amc203',
+        ]) + '\n')
+        call_command('import_assets', path, stdout=StringIO())
+
+        asset1, asset2 = Asset.objects.order_by('name')
+        self.assertEqual(set(asset1.storage_format), {'digital', 'paper'})
+        self.assertIsNone(asset1.owner)
+        self.assertTrue(asset1.personal_data)
+        self.assertIsNone(asset2.department)
+        self.assertEqual(list(asset2.storage_format), [])
+
+    def test_json_and_ndjson(self):
+        """Assets are imported from JSON lists, read in chunks, and newline-delimited JSON."""
+        assets = [dict(COMPLETE_ASSET, name='asset{}'.format(idx)) for idx in range(5)]
+        json_path = self.write_file('assets.json', json.dumps(assets, indent=2))
+        ndjson_path = self.write_file(
+            'assets.ndjson', ''.join(json.dumps(asset) + '\n' for asset in assets))
+
+        with mock.patch('assets.management.commands.import_assets._JSON_CHUNK_SIZE', 16):
+            call_command('import_assets', json_path, '--batch-size', '2', stdout=StringIO())
+        call_command('import_assets', ndjson_path, stdout=StringIO())
+
+        self.assertEqual(Asset.objects.filter(is_complete=True).count(), 10)
+        self.assertEqual(DepartmentAssetStats.objects.get(department='TESTDEPT').total, 10)
+
+    def test_invalid_records_skipped(self):
+        """Invalid records are reported and the others imported."""
+        path = self.write_file('assets.ndjson', '\n'.join([
+            json.dumps(COMPLETE_ASSET), json.dumps(dict(COMPLETE_ASSET, purpose='not-a-purpose')),
+        ]))
+        stderr = StringIO()
+        call_command('import_assets', path, stdout=StringIO(), stderr=stderr)
+        self.assertEqual(Asset.objects.count(), 1)
+        self.assertIn('Record 2', stderr.getvalue())
+
+    def test_checkpoint(self):
+        """Imports resume after the records recorded by the checkpoint."""
+        path = self.write_file('assets.ndjson', ''.join(
+            json.dumps(dict(COMPLETE_ASSET, name='asset{}'.format(idx))) + '\n'
+            for idx in range(5)))
+        checkpoint = os.path.join(self.tmpdir.name, 'checkpoint')
+        with open(checkpoint, 'w') as f:
+            json.dump({'records': 3}, f)
+
+        call_command('import_assets', path, '--checkpoint', checkpoint, '--batch-size', '1',
+                     stdout=StringIO())
+        self.assertEqual(
+            sorted(Asset.objects.values_list('name', flat=True)), ['asset3', 'asset4'])
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f)['records'], 5)
+
+    def test_checkpoint_interrupted(self):
+        """A batch imported before the checkpoint was written is not imported again."""
+        path = self.write_file('assets.ndjson', ''.join(
+            json.dumps(dict(COMPLETE_ASSET, name='asset{}'.format(idx))) + '\n'
+            for idx in range(5)))
+        checkpoint = os.path.join(self.tmpdir.name, 'checkpoint')
+
+        # Interrupt the import after the second batch is inserted but before it is recorded. The
+        # checkpoint is written when the import starts and after each batch.
+        original_write_checkpoint = import_assets.write_checkpoint
+
+        def write_checkpoint(*args):
+            if write.call_count == 3:
+                raise KeyboardInterrupt()
+            original_write_checkpoint(*args)
+
+        with mock.patch.object(import_assets, 'write_checkpoint',
+                               side_effect=write_checkpoint) as write:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('import_assets', path, '--checkpoint', checkpoint,
+                             '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(Asset.objects.count(), 4)
+
+        call_command('import_assets', path, '--checkpoint', checkpoint, '--batch-size', '2',
+                     stdout=StringIO())
+        self.assertEqual(sorted(Asset.objects.values_list('name', flat=True)),
+                         ['asset{}'.format(idx) for idx in range(5)])
+        self.assertEqual(DepartmentAssetStats.objects.get(department='TESTDEPT').total, 5)
+
+    def test_unknown_format(self):
+        """Files whose format can't be determined are rejected."""
+        with self.assertRaises(CommandError):
+            call_command('import_assets', self.write_file('assets.txt', ''), stdout=StringIO())
+
+
+class WarmLookupCacheTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = FakeOAuth2Server()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+        settings_override = override_settings(
+            OAUTH2_TOKEN_URL=self.server.token_url, LOOKUP_ROOT=self.server.lookup_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(httpclient.clear_access_tokens)
+        self.addCleanup(httpclient.close_session)
+
+        for username, last_login in [('test0001', timezone.now()), ('test0002', None)]:
+            user = get_user_model().objects.create_user(username=username, last_login=last_login)
+            UserLookup.objects.create(user=user, scheme='mock', identifier=username)
+            self.server.add_person('mock', username, {'institutions': []})
+            clear_cached_person_for_user(user)
+            self.addCleanup(clear_cached_person_for_user, user)
+
+    def test_recent_users(self):
+        """By default, resources are fetched for users who have logged in recently."""
+        stdout = StringIO()
+        call_command('warm_lookup_cache', stdout=stdout)
+        self.assertIn('Fetched 1 resource(s)', stdout.getvalue())
+        self.assertEqual(self.server.counts['/people'], 1)
+
+    def test_given_users(self):
+        """Resources are fetched for the given users."""
+        stdout, stderr = StringIO(), StringIO()
+        call_command('warm_lookup_cache', 'test0001', 'test0002', 'missing', '--workers', '2',
+                     stdout=stdout, stderr=stderr)
+        self.assertIn('Fetched 2 resource(s)', stdout.getvalue())
+        self.assertIn('missing', stderr.getvalue())
@@ -1,10 +1,17 @@
 import copy
+import random
 
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, models, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
 from multiselectfield.db.fields import MSFList
 
-from assets.models import Asset
+from assets.models import (
+    Asset, AssetCounts, DepartmentAssetStats, IS_COMPLETE_CONDITION, IS_COMPLETE_PREDICATE,
+    audit_changes
+)
 
 # A complete asset used as a fixture in the following tests.
 from automationcommon.models import set_local_user, clear_local_user, Audit
@@ -195,6 +202,257 @@ class AssetTests(TestCase):
         Asset.objects.create(**asset_dict)
         self.assertFalse(Asset.objects.first().is_complete)
 
+    def test_is_complete_updated_on_save(self):
+        """The stored is_complete flag follows changes made via save()."""
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+        self.assertTrue(asset.is_complete)
+        asset.name = None
+        asset.save()
+        self.assertFalse(Asset.objects.get(pk=asset.pk).is_complete)
+
+    def test_is_complete_updated_on_save_with_update_fields(self):
+        """The stored is_complete flag is saved even if not listed in update_fields."""
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+        asset.name = None
+        asset.save(update_fields=['name'])
+        self.assertFalse(Asset.objects.get(pk=asset.pk).is_complete)
+
+    def test_is_complete_updated_on_bulk_update(self):
+        """The stored is_complete flag follows changes made via QuerySet.update()."""
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+        Asset.objects.filter(name='asset1').update(name=None)
+        self.assertFalse(Asset.objects.get(pk=asset.pk).is_complete)
+        Asset.objects.filter(pk=asset.pk).update(name='asset1')
+        self.assertTrue(Asset.objects.get(pk=asset.pk).is_complete)
+
+    def test_inconsistent_is_complete(self):
+        """Assets whose stored is_complete flag is wrong are found and can be fixed."""
+        complete = Asset.objects.create(**COMPLETE_ASSET)
+        incomplete = Asset.objects.create(name='incomplete')
+        self.assertFalse(Asset.objects.inconsistent_is_complete().exists())
+
+        # Bypass the maintenance of is_complete by using the base QuerySet implementation.
+        models.QuerySet.update(Asset.objects.filter(pk=complete.pk), is_complete=False)
+        models.QuerySet.update(Asset.objects.filter(pk=incomplete.pk), is_complete=True)
+        self.assertEqual(
+            {asset.pk for asset in Asset.objects.inconsistent_is_complete()},
+            {complete.pk, incomplete.pk}
+        )
+
+        Asset.objects.all().refresh_is_complete()
+        self.assertFalse(Asset.objects.inconsistent_is_complete().exists())
+        self.assertTrue(Asset.objects.get(pk=complete.pk).is_complete)
+        self.assertFalse(Asset.objects.get(pk=incomplete.pk).is_complete)
+
+
+class CompletenessRuleTests(TestCase):
+    """
+    The SQL condition and Python predicate built from the completeness rule agree.
+    """
+    #: Number of randomly generated assets to compare.
+    N_SAMPLES = 500
+
+    def test_condition_matches_predicate(self):
+        """For random assets, the SQL condition and Python predicate give the same result."""
+        rng = random.Random(0)
+        samples = [self.random_values(rng) for _ in range(self.N_SAMPLES)]
+        assets = models.QuerySet.bulk_create(
+            Asset.objects.all(), [Asset(**values) for values in samples])
+
+        complete_in_db = set(
+            Asset.objects.filter(IS_COMPLETE_CONDITION).values_list('pk', flat=True))
+        fetched = Asset.objects.in_bulk([asset.pk for asset in assets])
+        for asset, values in zip(assets, samples):
+            expected = asset.pk in complete_in_db
+            with self.subTest(values=values):
+                self.assertEqual(IS_COMPLETE_PREDICATE(values), expected)
+                self.assertEqual(IS_COMPLETE_PREDICATE(fetched[asset.pk]), expected)
+
+        # The samples should cover both outcomes.
+        self.assertTrue(0 < len(complete_in_db) < self.N_SAMPLES)
+
+    @staticmethod
+    def random_values(rng):
+        """
+        Return a dict of random values for the fields the completeness rule depends on. Values
+        are drawn from those the rule distinguishes between and are biased towards complete
+        assets.
+
+        """
+        def maybe(value):
+            return None if rng.random() < 0.1 else value
+
+        def subset(choices):
+            keys = [key for key, _ in choices if rng.random() < 0.3]
+            return keys if rng.random() < 0.9 else []
+
+        return {
+            'name': maybe('name'),
+            'department': maybe('TESTDEPT'),
+            'purpose': maybe(rng.choice(['research', 'other', 'teaching'])),
+            'owner': maybe('amc203'),
+            'purpose_other': maybe('other purpose'),
+            'personal_data': rng.choice([None, True, False, False]),
+            'data_subject': subset(Asset.DATA_SUBJECT_CHOICES),
+            'data_category': subset(Asset.DATA_CATEGORY_CHOICES),
+            'recipients_outside_uni': maybe(rng.choice(['yes', 'no'])),
+            'recipients_outside_uni_description': maybe('description'),
+            'recipients_outside_eea': maybe(rng.choice(['yes', 'no'])),
+            'recipients_outside_eea_description': maybe('description'),
+            'retention': maybe(Asset.RETENTION_CHOICES[0][0]),
+            'risk_type': subset(Asset.RISK_CHOICES),
+            'storage_location': maybe('location'),
+            'storage_format': subset(Asset.STORAGE_FORMAT_CHOICES),
+            'paper_storage_security': subset(Asset.PAPER_STORAGE_SECURITY_CHOICES),
+            'digital_storage_security': subset(Asset.DIGITAL_STORAGE_SECURITY_CHOICES),
+        }
+
+
+class ChoiceBitmaskFieldTests(TestCase):
+    def setUp(self):
+        self.both = Asset.objects.create(
+            name='both', paper_storage_security=['locked_room', 'locked_building'])
+        self.room = Asset.objects.create(name='room', paper_storage_security=['locked_room'])
+        self.empty = Asset.objects.create(name='empty', paper_storage_security=[])
+        self.field = Asset._meta.get_field('paper_storage_security')
+
+    def names(self, **kwargs):
+        return set(Asset.objects.filter(**kwargs).values_list('name', flat=True))
+
+    def test_bitmask(self):
+        """The n-th choice is stored as bit n."""
+        self.assertEqual(self.field.get_bitmask(None), 0)
+        self.assertEqual(self.field.get_bitmask(['locked_cabinet', 'locked_room']), 0b101)
+        self.assertEqual(self.field.get_bitmask('safe,locked_building'), 0b1010)
+        self.assertEqual(self.field.get_keys(0b1010), ['safe', 'locked_building'])
+        with self.assertRaises(ValueError):
+            self.field.get_bitmask(['locked'])
+
+    def test_round_trip(self):
+        """Values are read back as they were saved."""
+        self.assertEqual(
+            set(Asset.objects.get(pk=self.both.pk).paper_storage_security),
+            {'locked_room', 'locked_building'})
+        self.assertFalse(Asset.objects.get(pk=self.empty.pk).paper_storage_security)
+
+    def test_contains_any(self):
+        """contains_any matches values with at least one of the keys."""
+        self.assertEqual(
+            self.names(paper_storage_security__contains_any=['locked_room', 'safe']),
+            {'both', 'room'})
+        self.assertEqual(self.names(paper_storage_security__contains_any=['safe']), set())
+
+    def test_contains_all(self):
+        """contains_all matches values with all of the keys."""
+        self.assertEqual(
+            self.names(paper_storage_security__contains_all=['locked_room', 'locked_building']),
+            {'both'})
+        self.assertEqual(
+            self.names(paper_storage_security__contains_all=['locked_room']), {'both', 'room'})
+
+    def test_empty(self):
+        """Empty values are matched by comparing with an empty list."""
+        self.assertEqual(self.names(paper_storage_security=[]), {'empty'})
+
+
+class DepartmentAssetStatsTests(TestCase):
+    """
+    Tests for the maintenance of the DepartmentAssetStats summary table.
+    """
+
+    def test_create(self):
+        """Creating assets adds to the statistics."""
+        Asset.objects.create(**COMPLETE_ASSET)
+        Asset.objects.create(department='TESTDEPT')
+        self.assertStats({'TESTDEPT': AssetCounts(2, 1, 1)})
+
+    def test_department_move(self):
+        """Moving an asset between departments moves its contribution."""
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+        asset.department = 'TESTDEPT2'
+        asset.save()
+        self.assertStats({'TESTDEPT': AssetCounts(0, 0, 0), 'TESTDEPT2': AssetCounts(1, 1, 1)})
+
+    def test_completeness_flip(self):
+        """An asset becoming incomplete is reflected in the statistics."""
+        asset = Asset.objects.get(pk=Asset.objects.create(**COMPLETE_ASSET).pk)
+        asset.name = None
+        asset.save()
+        self.assertStats({'TESTDEPT': AssetCounts(1, 0, 1)})
+
+    def test_soft_delete(self):
+        """Soft-deleting an asset removes its contribution."""
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+        asset.deleted_at = now()
+        asset.save()
+        self.assertStats({'TESTDEPT': AssetCounts(0, 0, 0)})
+
+    def test_delete(self):
+        """Deleting assets removes their contribution."""
+        Asset.objects.create(**COMPLETE_ASSET).delete()
+        Asset.objects.create(**COMPLETE_ASSET)
+        self.assertEqual(Asset.objects.all().delete(), (1, {'assets.Asset': 1}))
+        self.assertStats({'TESTDEPT': AssetCounts(0, 0, 0)})
+
+    def test_bulk_update(self):
+        """Bulk updates are reflected in the statistics."""
+        Asset.objects.create(**COMPLETE_ASSET)
+        Asset.objects.create(**COMPLETE_ASSET)
+        self.assertEqual(
+            Asset.objects.filter(department='TESTDEPT').update(department='TESTDEPT2', name=None),
+            2)
+        self.assertStats({'TESTDEPT': AssetCounts(0, 0, 0), 'TESTDEPT2': AssetCounts(2, 0, 2)})
+
+    def test_deferred_save(self):
+        """Saving an asset loaded with deferred fields maintains the statistics."""
+        asset_pk = Asset.objects.create(**COMPLETE_ASSET).pk
+        asset = Asset.objects.only('name').get(pk=asset_pk)
+        asset.deleted_at = now()
+        with CaptureQueriesContext(connection) as queries:
+            asset.save()
+        self.assertStats({'TESTDEPT': AssetCounts(0, 0, 0)})
+
+        # The deferred fields and the saved statistics contribution are each read in one query.
+        self.assertEqual(len([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'assets_asset' in query['sql']
+        ]), 2)
+
+    def test_stale_instance_save(self):
+        """Saving an asset changed in the database since it was loaded maintains the statistics."""
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+        stale = Asset.objects.get(pk=asset.pk)
+        asset.department = 'TESTDEPT2'
+        asset.save()
+        stale.name = None
+        stale.save()
+        self.assertStats({'TESTDEPT': AssetCounts(1, 0, 1), 'TESTDEPT2': AssetCounts(0, 0, 0)})
+
+    def test_single_null_department(self):
+        """Only one statistics row may be created for assets without a department."""
+        DepartmentAssetStats.objects.create(department=None)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DepartmentAssetStats.objects.create(department=None)
+
+        Asset.objects.create(department=None)
+        self.assertStats({None: AssetCounts(1, 0, 0)})
+
+    def test_rebuild(self):
+        """Rebuilding the statistics gives the same result as maintaining them."""
+        Asset.objects.create(**COMPLETE_ASSET)
+        Asset.objects.create(department='TESTDEPT2', personal_data=True)
+        expected = Asset.objects.all().department_counts()
+        DepartmentAssetStats.objects.all().delete()
+        DepartmentAssetStats.objects.rebuild()
+        self.assertStats(expected)
+
+    def assertStats(self, expected):
+        """Assert that the summary table has the expected counts for each department."""
+        self.assertEqual(
+            {stats.department: stats.as_counts() for stats in DepartmentAssetStats.objects.all()},
+            expected
+        )
+
 
 class AssetAuditTest(TestCase):
     def setUp(self):
@@ -226,7 +484,7 @@ class AssetAuditTest(TestCase):
         self.assertEqual(audit.who.pk, self.user.pk)
 
     def test_audit_compare_override(self):
-        """Changes to MultiSelectField fields are audited correctly."""
+        """Changes to multi-select fields are audited correctly."""
 
         # fixtures
         field = self.asset._meta.get_field('data_subject')
@@ -245,3 +503,25 @@ class AssetAuditTest(TestCase):
         self.assertTrue(self.asset.audit_compare(
             field, MSFList(choices, ['public', 'alumni']), {'alumni', 'public', 'supplier'},
         ))
+
+    def test_deferred_fields(self):
+        """Assets can be loaded with deferred fields and changes to loaded fields are audited."""
+        Asset.objects.create(name='test-asset-2')
+        with self.assertNumQueries(1):
+            assets = list(Asset.objects.only('name').order_by('name'))
+        self.assertEqual([asset.name for asset in assets], ['test-asset', 'test-asset-2'])
+
+        assets[0].name = 'new-name'
+        assets[0].save()
+        self.assertEqual(
+            list(Audit.objects.values_list('field', 'old', 'new')),
+            [('name', 'test-asset', 'new-name')]
+        )
+
+    def test_audit_changes_without_user(self):
+        """Bulk changes made without a local user are not audited."""
+        clear_local_user()
+        old = copy.copy(self.asset)
+        self.asset.name = 'new-name'
+        audit_changes([(old, self.asset)])
+        self.assertEqual(Audit.objects.count(), 0)
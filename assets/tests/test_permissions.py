@@ -11,11 +11,10 @@ from rest_framework.permissions import BasePermission
 from rest_framework.request import Request
 
 from assets import permissions
+from assets.lookup import clear_cached_person_for_user, set_cached_person_for_user
 from assets.models import Asset
 from automationlookup.models import UserLookup
 
-from automationlookup.tests import clear_cached_person_for_user, set_cached_person_for_user
-
 
 class OrPermissionTests(TestCase):
 
@@ -0,0 +1,135 @@
+"""
+Test full-text search of assets.
+
+"""
+import unittest
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from assets.lookup import set_cached_person_for_user
+from assets.models import Asset
+from assets.search import ChoiceLabelIndex, get_tsquery
+from assets.tests.test_models import COMPLETE_ASSET
+from assets.views import REQUIRED_SCOPES
+from automationlookup.models import UserLookup
+
+
+class GetTsqueryTests(unittest.TestCase):
+    def test_prefix_terms(self):
+        """Each term is a prefix match and all terms must match."""
+        self.assertEqual(get_tsquery(['clin', 'trial']), "'clin':* & 'trial':*")
+
+    def test_quoting(self):
+        """Quotes and backslashes in terms are escaped."""
+        self.assertEqual(get_tsquery(["o'brien\\"]), "'o''brien\\\\':*")
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'full-text search requires PostgreSQL')
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="test0001")
+        UserLookup.objects.create(user=self.user, scheme='mock', identifier=self.user.username)
+        set_cached_person_for_user(self.user, {
+            'institutions': [{'instid': 'UIS'}],
+            'groups': [{'name': settings.IAR_USERS_LOOKUP_GROUP}],
+        })
+        self.client = APIClient()
+        self.client.force_authenticate(
+            user=self.user, token={'scope': ' '.join(REQUIRED_SCOPES)})
+
+        self.in_name = Asset.objects.create(**dict(
+            COMPLETE_ASSET, name='clinical trial records', storage_location='cabinet'))
+        self.in_location = Asset.objects.create(**dict(
+            COMPLETE_ASSET, name='payroll', storage_location='clinical records store'))
+        Asset.objects.create(**dict(COMPLETE_ASSET, name='payroll', storage_location='cabinet'))
+
+    def search(self, terms, **params):
+        response = self.client.get('/assets/', dict(params, search=terms), format='json')
+        self.assertEqual(response.status_code, 200)
+        return [result['id'] for result in response.json()['results']]
+
+    def test_search_matches_words_and_prefixes(self):
+        """Search matches stemmed words and word prefixes in any searchable field."""
+        self.assertEqual(
+            set(self.search('clinic record')), {str(self.in_name.id), str(self.in_location.id)})
+
+    def test_search_ranks_results(self):
+        """Matches in the name rank before matches in other fields."""
+        self.assertEqual(
+            self.search('clinical'), [str(self.in_name.id), str(self.in_location.id)])
+
+    def test_explicit_ordering(self):
+        """An explicit ordering overrides ordering by rank."""
+        self.assertEqual(
+            self.search('clinical', ordering='name'),
+            [str(self.in_location.id), str(self.in_name.id)])
+
+    def test_search_vector_updated(self):
+        """The search vector follows changes to the asset."""
+        self.in_location.storage_location = 'cabinet'
+        self.in_location.save()
+        self.assertEqual(self.search('clinical'), [str(self.in_name.id)])
+
+
+class ChoiceLabelIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index = ChoiceLabelIndex(Asset, ('purpose', 'data_category', 'storage_format'))
+
+    def test_lookup_words(self):
+        """Terms match whole words and word prefixes of labels, ignoring case."""
+        self.assertEqual(self.index.lookup('Paper'), {'storage_format': {'paper'}})
+        self.assertEqual(self.index.lookup('medic'), {'data_category': {'medical'}})
+        self.assertEqual(self.index.lookup('research'), {
+            'purpose': {'research', 'research_organisational'},
+            'data_category': {'research'},
+        })
+
+    def test_lookup_all_words(self):
+        """All words in a term must match the same label."""
+        self.assertEqual(self.index.lookup('research(academic)'), {'purpose': {'research'}})
+        self.assertEqual(self.index.lookup('paper-medical'), {})
+
+    def test_no_match(self):
+        """Terms matching no label give no query."""
+        self.assertEqual(self.index.lookup('xyzzy'), {})
+        self.assertIsNone(self.index.get_q('xyzzy'))
+
+
+class ChoiceLabelSearchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="test0001")
+        UserLookup.objects.create(user=self.user, scheme='mock', identifier=self.user.username)
+        set_cached_person_for_user(self.user, {
+            'institutions': [{'instid': 'UIS'}],
+            'groups': [{'name': settings.IAR_USERS_LOOKUP_GROUP}],
+        })
+        self.client = APIClient()
+        self.client.force_authenticate(
+            user=self.user, token={'scope': ' '.join(REQUIRED_SCOPES)})
+
+        self.medical = Asset.objects.create(**dict(
+            COMPLETE_ASSET, name='one', data_category=['medical', 'contact']))
+        self.governance = Asset.objects.create(**dict(
+            COMPLETE_ASSET, name='two', purpose='governance_compliance',
+            data_category=['contact']))
+
+    def search(self, terms):
+        response = self.client.get('/assets/', {'search': terms}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return {result['id'] for result in response.json()['results']}
+
+    def test_search_multi_select_label(self):
+        """Searching for a label matches assets with that choice in a multi-select field."""
+        self.assertEqual(self.search('Medical records'), {str(self.medical.id)})
+
+    def test_search_choice_label(self):
+        """Searching for a label matches assets with that choice."""
+        self.assertEqual(self.search('compliance'), {str(self.governance.id)})
+
+    def test_search_label_and_text(self):
+        """Each term may match either a label or text."""
+        self.assertEqual(self.search('contact two'), {str(self.governance.id)})
@@ -0,0 +1,102 @@
+"""
+Test the Django REST framework serialisers.
+
+"""
+import itertools
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from assets.lookup import clear_cached_person_for_user, set_cached_person_for_user
+from assets.management.commands.benchmark_asset_list import UnbatchedAssetSerializer
+from assets.models import Asset
+from assets.serializers import AssetSerializer
+from assets.views import AssetViewSet, REQUIRED_SCOPES
+from automationlookup.models import UserLookup
+
+
+class AllowedMethodsTests(TestCase):
+    """
+    The batched computation of allowed_methods matches running the permission checks for every
+    object.
+    """
+    def setUp(self):
+        self.assets = [
+            Asset.objects.create(name='asset', department=department)
+            for department in ('TESTDEPT', 'TESTDEPT2', None)
+        ]
+        self.users = []
+
+    def tearDown(self):
+        for user in self.users:
+            clear_cached_person_for_user(user)
+
+    def test_matches_unbatched(self):
+        """Batched and unbatched allowed_methods agree for all combinations of circumstance."""
+        cases = itertools.product(
+            # Django model permissions granted to the user
+            [(), ('change_asset',), ('delete_asset',), ('change_asset', 'delete_asset')],
+            # Groups the user is in
+            [[], [{'name': settings.IAR_USERS_LOOKUP_GROUP}], None],
+            # Institutions the user is in
+            [
+                [], [{'instid': 'TESTDEPT'}], [{'instid': 'TESTDEPT'}, {'instid': 'TESTDEPT2'}],
+                None,
+            ],
+            # Request method and data
+            [('get', None), ('patch', {'name': 'x'}), ('patch', {'department': 'TESTDEPT2'})],
+            # Scopes granted to the token
+            [REQUIRED_SCOPES, []],
+        )
+        for idx, (perms, groups, institutions, (method, data), scopes) in enumerate(cases):
+            person = {}
+            if groups is not None:
+                person['groups'] = groups
+            if institutions is not None:
+                person['institutions'] = institutions
+            user = self.create_user('test{:04d}'.format(idx), perms, person)
+
+            context = self.get_context(user, scopes, method, data)
+            serializer = AssetSerializer(self.assets, many=True, context=context)
+            unbatched_serializer = UnbatchedAssetSerializer(
+                self.assets, many=True, context=context)
+
+            with self.subTest(perms=perms, person=person, method=method, data=data,
+                              scopes=scopes):
+                self.assertEqual(
+                    [serializer.child.get_allowed_methods(asset) for asset in self.assets],
+                    [unbatched_serializer.child.get_allowed_methods(asset)
+                     for asset in self.assets],
+                )
+
+    def test_no_context(self):
+        """Without a request and view, allowed_methods is None."""
+        serializer = AssetSerializer(self.assets[0], context={'request': None})
+        self.assertIsNone(serializer.data['allowed_methods'])
+
+    def create_user(self, username, perms, person):
+        """Create a user with the given model permissions and cached Lookup person."""
+        user = get_user_model().objects.create_user(username=username)
+        UserLookup.objects.create(user=user, scheme='mock', identifier=username)
+        for codename in perms:
+            user.user_permissions.add(Permission.objects.get(
+                content_type=ContentType.objects.get_for_model(Asset), codename=codename))
+        set_cached_person_for_user(user, person)
+        self.users.append(user)
+        return get_user_model().objects.get(pk=user.pk)
+
+    def get_context(self, user, scopes, method, data):
+        """Return a serializer context for an AssetViewSet request made by user."""
+        factory = APIRequestFactory()
+        django_request = getattr(factory, method)('/assets/', data, format='json')
+        force_authenticate(django_request, user=user, token={'scope': ' '.join(scopes)})
+
+        view = AssetViewSet()
+        view.action_map = {method: 'list' if method == 'get' else 'partial_update'}
+        view.args, view.kwargs, view.format_kwarg = (), {}, None
+        view.request = view.initialize_request(django_request)
+        return {'request': view.request, 'view': view}
@@ -1,22 +1,27 @@
 import copy
+import csv
+import io
 import json
 from unittest import mock
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
-from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import now
 from rest_framework.test import APIClient
-from assets.models import Asset
+from assets import statscache
+from assets.lookup import get_person_for_user, set_cached_person_for_user
+from assets.models import Asset, DepartmentAssetStats
+from assets.pagination import AssetCursorPagination
 from assets.serializers import AssetSerializer
 from assets.tests.test_models import COMPLETE_ASSET
-from assets.views import REQUIRED_SCOPES
-from automationcommon.models import set_local_user
+from assets.views import REQUIRED_SCOPES, AssetCounts, AssetStats
+from automationcommon.models import Audit, set_local_user
 from automationlookup.models import UserLookup
-from automationlookup.tests import set_cached_person_for_user
 
 LOOKUP_RESPONSE = {
     'institutions': [{
@@ -56,7 +61,7 @@ class APIViewsTests(TestCase):
             user=self.user, scheme='mock', identifier=self.user.username)
         self.refresh_user()
 
-        cache.set(f"{self.user.username}:lookup", LOOKUP_RESPONSE)
+        set_cached_person_for_user(self.user, LOOKUP_RESPONSE)
 
     def tearDown(self):
         self.auth_patch.stop()
@@ -148,7 +153,7 @@ class APIViewsTests(TestCase):
         self.assertEqual(result_post.status_code, 201)
         result_get = client.get(result_post.json()['url'], format='json')
         self.assertFalse(result_get.json()["is_complete"])
-        result_put = client.put(result_post.json()['url'], COMPLETE_ASSET)
+        result_put = client.put(result_post.json()['url'], COMPLETE_ASSET, format='json')
         self.assertTrue(result_put.json()["is_complete"])
 
     def test_is_complete_on_patch(self):
@@ -163,6 +168,26 @@ class APIViewsTests(TestCase):
         result_patch = client.patch(result_post.json()['url'], {"name": "asset1"})
         self.assertTrue(result_patch.json()["is_complete"])
 
+    def test_patch_does_not_refetch(self):
+        """The response to a PATCH is serialised from the saved asset without fetching it again."""
+        client = APIClient()
+        asset = Asset.objects.create(**merge_dicts(COMPLETE_ASSET, {'name': None}))
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.patch('/assets/%s/' % asset.pk, {'name': 'asset1'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_complete'])
+
+        # The asset is selected to be updated and its saved statistics columns are re-read, with
+        # the row locked, before the update. It is not selected after it has been updated.
+        asset_queries = [
+            query['sql'] for query in context.captured_queries
+            if '"assets_asset"' in query['sql']
+        ]
+        self.assertEqual(
+            [sql.split()[0] for sql in asset_queries if sql.startswith(('SELECT', 'UPDATE'))],
+            ['SELECT', 'SELECT', 'UPDATE'])
+
     def test_asset_patch_validation(self):
         """User's only allow to PATCH an asset that has a department their are part of, and the
         PATCH department has to be one he belongs to"""
@@ -202,7 +227,7 @@ class APIViewsTests(TestCase):
         asset_dict['department'] = 'TESTDEPT2'
         asset = Asset(**asset_dict)
         asset.save()
-        result_put = client.put('/assets/%s/' % asset.pk, COMPLETE_ASSET)
+        result_put = client.put('/assets/%s/' % asset.pk, COMPLETE_ASSET, format='json')
         # Not allowed because the asset belongs to TESTDEPT2
         self.assert_method_is_not_listed_as_allowed('PUT', asset)
         self.assertEqual(result_put.status_code, 403)
@@ -217,13 +242,13 @@ class APIViewsTests(TestCase):
         self.assert_method_is_listed_as_allowed('PUT', asset)
 
         # ... but not this asset
-        result_put = client.put('/assets/%s/' % asset.pk, asset_dict)
+        result_put = client.put('/assets/%s/' % asset.pk, asset_dict, format='json')
         self.assertEqual(result_put.status_code, 403)
 
         # This one should be allowed
         asset_dict['department'] = 'TESTDEPT'
         asset_dict['name'] = 'asset2'
-        result_put = client.put('/assets/%s/' % asset.pk, asset_dict)
+        result_put = client.put('/assets/%s/' % asset.pk, asset_dict, format='json')
         self.assert_method_is_listed_as_allowed('PUT', asset)
         self.assertEqual(result_put.status_code, 200)
 
@@ -254,13 +279,10 @@ class APIViewsTests(TestCase):
         list_assets = client.get('/assets/', format='json')
         self.assertNotEqual(list_assets.json()['results'], [])
 
-        cache.set(
-            f"{self.user.username}:lookup",
-            {
-                **LOOKUP_RESPONSE,
-                'institutions': [{**LOOKUP_RESPONSE['institutions'][0], 'instid': 'UIS'}]
-            }
-        )
+        set_cached_person_for_user(self.user, {
+            **LOOKUP_RESPONSE,
+            'institutions': [{**LOOKUP_RESPONSE['institutions'][0], 'instid': 'UIS'}]
+        })
 
         result_delete = client.delete(result_post.json()['url'])
         # User's institution doesn't match asset institution
@@ -293,13 +315,10 @@ class APIViewsTests(TestCase):
         asset = Asset.objects.get(pk=result_post.json()['id'])
         self.assertIsNone(asset.deleted_at)
 
-        cache.set(
-            f"{self.user.username}:lookup",
-            {
-                **LOOKUP_RESPONSE,
-                'institutions': [{**LOOKUP_RESPONSE['institutions'][0], 'instid': 'UIS'}]
-            }
-        )
+        set_cached_person_for_user(self.user, {
+            **LOOKUP_RESPONSE,
+            'institutions': [{**LOOKUP_RESPONSE['institutions'][0], 'instid': 'UIS'}]
+        })
 
         # DELETE not in allowed methods
         self.assert_method_is_not_listed_as_allowed('DELETE', asset)
@@ -367,7 +386,7 @@ class APIViewsTests(TestCase):
         # PUT not in allowed methods
         self.assert_method_is_not_listed_as_allowed('PUT', asset)
 
-        result_put = client.put('/assets/%s/' % asset.pk, COMPLETE_ASSET)
+        result_put = client.put('/assets/%s/' % asset.pk, COMPLETE_ASSET, format='json')
 
         # Not allowed because the asset belongs to TESTDEPT2
         self.assertEqual(result_put.status_code, 403)
@@ -385,7 +404,7 @@ class APIViewsTests(TestCase):
         # PUT is now in allowed methods
         self.assert_method_is_listed_as_allowed('PUT', asset)
 
-        result_put = client.put('/assets/%s/' % asset.pk, COMPLETE_ASSET)
+        result_put = client.put('/assets/%s/' % asset.pk, COMPLETE_ASSET, format='json')
         self.assertEqual(result_put.status_code, 200)
 
     def test_post_with_perms(self):
@@ -413,7 +432,7 @@ class APIViewsTests(TestCase):
         client = APIClient()
 
         # remove group membership
-        cache.set(f"{self.user.username}:lookup", {**LOOKUP_RESPONSE, 'groups': []})
+        set_cached_person_for_user(self.user, {**LOOKUP_RESPONSE, 'groups': []})
 
         # create a asset
         asset = Asset.objects.create(**COMPLETE_ASSET)
@@ -431,6 +450,74 @@ class APIViewsTests(TestCase):
         self.assertEqual(client.patch(asset_url, {'name': 'new'}, format='json').status_code, 403)
         self.assertEqual(client.delete(asset_url).status_code, 403)
 
+    def test_lookup_once_per_request(self):
+        """Lookup person data is fetched once per request, however many times it is used."""
+        client = APIClient()
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+        for _ in range(3):
+            Asset.objects.create(**COMPLETE_ASSET)
+
+        with mock.patch('assets.lookup.get_person_for_user',
+                        wraps=get_person_for_user) as mock_get_person:
+            self.assertEqual(client.get('/assets/').status_code, 200)
+            self.assertEqual(mock_get_person.call_count, 1)
+
+        with mock.patch('assets.lookup.get_person_for_user',
+                        wraps=get_person_for_user) as mock_get_person:
+            result_patch = client.patch(
+                '/assets/%s/' % asset.pk, {'name': 'new', 'department': 'TESTDEPT'})
+            self.assertEqual(result_patch.status_code, 200)
+            self.assertEqual(mock_get_person.call_count, 1)
+
+    def test_sparse_fields(self):
+        """The fields query parameter limits the fields returned and fetched."""
+        client = APIClient()
+        for _ in range(3):
+            Asset.objects.create(**COMPLETE_ASSET)
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/assets/', {'fields': 'id,name,department'})
+        self.assertEqual(response.status_code, 200)
+        for result in response.json()['results']:
+            self.assertEqual(set(result), {'id', 'name', 'department'})
+
+        # The assets are fetched in a single query which doesn't include unrequested columns.
+        asset_queries = [
+            query['sql'] for query in context.captured_queries if 'assets_asset' in query['sql']
+        ]
+        self.assertEqual(len(asset_queries), 1)
+        self.assertNotIn('purpose_other', asset_queries[0])
+        self.assertNotIn('risk_type_additional', asset_queries[0])
+
+    def test_sparse_omit(self):
+        """The omit query parameter removes fields from the response."""
+        client = APIClient()
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+
+        result = client.get('/assets/', {'omit': 'allowed_methods,purpose_other'}).json()
+        self.assertEqual(len(result['results']), 1)
+        self.assertNotIn('allowed_methods', result['results'][0])
+        self.assertNotIn('purpose_other', result['results'][0])
+        self.assertIn('name', result['results'][0])
+
+        result = client.get('/assets/%s/' % asset.pk, {'omit': 'allowed_methods'}).json()
+        self.assertNotIn('allowed_methods', result)
+        self.assertEqual(result['name'], COMPLETE_ASSET['name'])
+
+    def test_sparse_skips_allowed_methods_permissions(self):
+        """Omitting allowed_methods skips its permission checks."""
+        client = APIClient()
+        Asset.objects.create(**COMPLETE_ASSET)
+        with mock.patch.object(AssetSerializer, '_get_allowed_methods_checkers') as mock_checkers:
+            self.assertEqual(client.get('/assets/', {'fields': 'id,name'}).status_code, 200)
+        mock_checkers.assert_not_called()
+
+    def test_sparse_unknown_field(self):
+        """Unknown fields passed to fields or omit are an error."""
+        client = APIClient()
+        self.assertEqual(client.get('/assets/', {'fields': 'id,not_a_field'}).status_code, 400)
+        self.assertEqual(client.get('/assets/', {'omit': 'not_a_field'}).status_code, 400)
+
     def test_asset_stats(self):
         """The asset stats endpoint reports correct statistics."""
         set_local_user(self.user)  # Some user which will be used in the audit log
@@ -454,6 +541,7 @@ class APIViewsTests(TestCase):
         asset.save()
 
         # Retrieve the stats
+        statscache.invalidate_cached_stats()
         client = APIClient()
         response = client.get('/stats', format='json')
 
@@ -465,6 +553,17 @@ class APIViewsTests(TestCase):
             },
         })
 
+    def test_asset_stats_single_query(self):
+        """The asset statistics are computed with a single query."""
+        set_local_user(self.user)
+        self.create_asset_from_dict(COMPLETE_ASSET)
+        self.create_asset_from_dict(merge_dicts(COMPLETE_ASSET, {'department': 'TESTDEPT2'}))
+
+        with self.assertNumQueries(1):
+            stats = AssetStats.from_assets(Asset.objects.filter(deleted_at__isnull=True))
+
+        self.assertEqual(stats.all, AssetCounts(total=2, completed=2, with_personal_data=2))
+
     def refresh_user(self):
         """Refresh user from the database."""
         self.user = get_user_model().objects.get(pk=self.user.pk)
@@ -538,6 +637,64 @@ class APIViewsTests(TestCase):
         return Asset.objects.create(**asset_serializer.validated_data)
 
 
+class StatsCacheTests(TestCase):
+    """
+    Tests relating to the caching of responses from the stats endpoint.
+    """
+    def setUp(self):
+        super().setUp()
+        statscache.invalidate_cached_stats()
+        self.client = APIClient()
+
+    def test_cached(self):
+        """A second request for the stats is served from the cache."""
+        Asset.objects.create(**COMPLETE_ASSET)
+        self.client.get('/stats')
+        with self.assertNumQueries(0):
+            response = self.client.get('/stats')
+        self.assertEqual(response.json()['all']['total'], 1)
+
+    def test_invalidated_on_change(self):
+        """Changing an asset invalidates the cached stats."""
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+        self.assertEqual(self.client.get('/stats').json()['all']['total'], 1)
+        Asset.objects.create(**COMPLETE_ASSET)
+        self.assertEqual(self.client.get('/stats').json()['all']['total'], 2)
+        asset.deleted_at = now()
+        asset.save()
+        self.assertEqual(self.client.get('/stats').json()['all']['total'], 1)
+
+    def test_not_invalidated_by_irrelevant_change(self):
+        """Changes which don't affect the stats don't invalidate the cache."""
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+        self.client.get('/stats')
+        asset.name = 'new name'
+        asset.save()
+        self.assertIsNotNone(statscache.get_cached_stats())
+
+    def test_conditional_requests(self):
+        """Requests with a current ETag get a 304 response."""
+        Asset.objects.create(**COMPLETE_ASSET)
+        response = self.client.get('/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+        response_etag = self.client.get('/stats', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_etag.status_code, 304)
+        self.assertEqual(response_etag['ETag'], response['ETag'])
+
+        # Modification times are not used to answer conditional requests.
+        response_modified = self.client.get(
+            '/stats', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response_modified.status_code, 200)
+
+        Asset.objects.create(**COMPLETE_ASSET)
+        response_changed = self.client.get('/stats', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_changed.status_code, 200)
+        self.assertNotEqual(response_changed['ETag'], response['ETag'])
+
+
 # An alternate asset to COMPLETE_ASSET. It is intended the this asset is never filtered for in
 # AssetFilterTests.
 DIFFERENT_ASSET = {
@@ -638,6 +795,23 @@ class AssetFilterTests(TestCase):
             self.client.get('/assets/', data={'is_complete': 'true'}, format='json')
         )
 
+    def test_filter_by_data_subject_contains_any(self):
+        self.assertAsset1(
+            self.client.get('/assets/', data={'data_subject__contains_any': ['staff', 'students']},
+                            format='json')
+        )
+
+    def test_filter_by_risk_type_contains_all(self):
+        response = self.client.get(
+            '/assets/', data={'risk_type__contains_all': ['operational', 'financial']},
+            format='json')
+        self.assertEqual(response.json()['results'], [])
+
+    def test_filter_by_invalid_choice(self):
+        response = self.client.get(
+            '/assets/', data={'risk_type__contains_any': ['not-a-risk']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
     def tearDown(self):
         self.auth_patch.stop()
         super().tearDown()
@@ -664,6 +838,355 @@ def patch_authenticate(return_value=None):
     )
 
 
+class TypeaheadTests(TestCase):
+    """
+    Tests relating to the type-ahead endpoint.
+    """
+    def setUp(self):
+        super().setUp()
+        self.auth_patch = patch_authenticate()
+        self.mock_authenticate = self.auth_patch.start()
+
+        self.user = get_user_model().objects.create_user(username="test0001")
+        UserLookup.objects.create(user=self.user, scheme='mock', identifier=self.user.username)
+        set_cached_person_for_user(self.user, LOOKUP_RESPONSE)
+        self.mock_authenticate.return_value = (self.user, {'scope': ' '.join(REQUIRED_SCOPES)})
+
+        self.client = APIClient()
+        self.prefix = Asset.objects.create(**merge_dicts(COMPLETE_ASSET, {'name': 'Clinical'}))
+        self.substring = Asset.objects.create(
+            **merge_dicts(COMPLETE_ASSET, {'name': 'Preclinical trials'}))
+        self.private = Asset.objects.create(**merge_dicts(DIFFERENT_ASSET, {'name': 'clinic'}))
+        Asset.objects.create(**merge_dicts(COMPLETE_ASSET, {'name': 'Payroll'}))
+
+    def tearDown(self):
+        self.auth_patch.stop()
+        super().tearDown()
+
+    def test_matches(self):
+        """Visible assets containing the query are returned, best matches first."""
+        response = self.client.get('/typeahead', {'q': 'clinic'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['id'] for result in response.json()],
+            [str(self.prefix.id), str(self.substring.id)])
+        self.assertEqual(
+            set(response.json()[0]),
+            {'url', 'id', 'name', 'owner', 'department', 'storage_location', 'similarity'})
+
+    def test_limit(self):
+        """The number of results is limited and the limit is bounded."""
+        response = self.client.get('/typeahead', {'q': 'clinic', 'limit': 1})
+        self.assertEqual([result['id'] for result in response.json()], [str(self.prefix.id)])
+        with self.settings(IAR_TYPEAHEAD_MAX_RESULTS=1):
+            response = self.client.get('/typeahead', {'q': 'clinic', 'limit': 100})
+        self.assertEqual(len(response.json()), 1)
+
+    def test_invalid_parameters(self):
+        """Short queries and invalid limits are rejected."""
+        self.assertEqual(self.client.get('/typeahead', {'q': 'c'}).status_code, 400)
+        self.assertEqual(
+            self.client.get('/typeahead', {'q': 'clinic', 'limit': 'x'}).status_code, 400)
+        self.assertEqual(
+            self.client.get('/typeahead', {'q': 'clinic', 'limit': 0}).status_code, 400)
+
+    def test_caching_headers(self):
+        """Responses may be cached privately for a short time."""
+        response = self.client.get('/typeahead', {'q': 'clinic'})
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn(f'max-age={settings.IAR_TYPEAHEAD_MAX_AGE}', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+
+
+class PaginationTests(TestCase):
+    """
+    Tests relating to paginating the asset list.
+    """
+    def setUp(self):
+        super().setUp()
+        self.auth_patch = patch_authenticate()
+        self.mock_authenticate = self.auth_patch.start()
+
+        self.user = get_user_model().objects.create_user(username="test0001")
+        UserLookup.objects.create(user=self.user, scheme='mock', identifier=self.user.username)
+        set_cached_person_for_user(self.user, LOOKUP_RESPONSE)
+        self.mock_authenticate.return_value = (self.user, {'scope': ' '.join(REQUIRED_SCOPES)})
+
+        self.client = APIClient()
+
+        self.page_size_patch = mock.patch.object(AssetCursorPagination, 'page_size', 4)
+        self.page_size_patch.start()
+
+        # Many assets share each department, including no department at all.
+        self.assets = [
+            Asset.objects.create(**merge_dicts(COMPLETE_ASSET, {'department': department}))
+            for department in ['TESTDEPT', None, 'OTHERDEPT', 'TESTDEPT', None, 'TESTDEPT'] * 2
+        ]
+
+    def tearDown(self):
+        self.page_size_patch.stop()
+        self.auth_patch.stop()
+        super().tearDown()
+
+    def test_next_pages(self):
+        """Following next links returns each asset once for each ordering."""
+        for ordering in ['department', '-department', 'owner', '-created_at']:
+            with self.subTest(ordering=ordering):
+                ids = [result['id'] for result in self.walk({'ordering': ordering})]
+                self.assertEqual(len(ids), len(self.assets))
+                self.assertEqual(set(ids), {str(asset.id) for asset in self.assets})
+
+    def test_null_ordering(self):
+        """Assets with no department come last in ascending order and first in descending."""
+        for ordering, descending in [('department', False), ('-department', True)]:
+            with self.subTest(ordering=ordering):
+                departments = [
+                    result['department'] for result in self.walk({'ordering': ordering})]
+                expected = sorted(
+                    departments, key=lambda department: (department is None, department or ''),
+                    reverse=descending)
+                self.assertEqual(departments, expected)
+
+    def test_previous_pages(self):
+        """Following previous links from the last page returns the same pages."""
+        pages = []
+        response = self.client.get('/assets/', {'ordering': 'department'})
+        while True:
+            body = response.json()
+            pages.append([result['id'] for result in body['results']])
+            if body['next'] is None:
+                break
+            response = self.client.get(body['next'])
+
+        previous_pages = [pages[-1]]
+        while body['previous'] is not None:
+            body = self.client.get(body['previous']).json()
+            previous_pages.insert(0, [result['id'] for result in body['results']])
+        self.assertEqual(previous_pages, pages)
+
+    def test_page_size(self):
+        """Clients may choose the page size up to a maximum."""
+        response = self.client.get('/assets/', {'page_size': 7})
+        self.assertEqual(len(response.json()['results']), 7)
+        with self.settings(IAR_MAX_PAGE_SIZE=5):
+            response = self.client.get('/assets/', {'page_size': 7})
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_streamed_pages(self):
+        """Large pages are streamed with the same content and links."""
+        params = {'ordering': 'department', 'page_size': 5}
+        expected = self.client.get('/assets/', params).json()
+        expected_next = self.client.get(expected['next']).json()
+        with self.settings(IAR_STREAMED_PAGE_SIZE=2):
+            response = self.client.get('/assets/', params)
+            self.assertTrue(response.streaming)
+            body = json.loads(b''.join(response.streaming_content).decode('utf8'))
+            self.assertEqual(body, expected)
+
+            # The streamed next link leads to the same page and previous links are not streamed.
+            response = self.client.get(body['next'])
+            self.assertTrue(response.streaming)
+            body = json.loads(b''.join(response.streaming_content).decode('utf8'))
+            self.assertEqual(body, expected_next)
+            response = self.client.get(body['previous'])
+            self.assertFalse(response.streaming)
+            self.assertEqual(response.json()['results'], expected['results'])
+
+    def test_invalid_cursor(self):
+        """An invalid cursor results in a 404."""
+        response = self.client.get('/assets/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def walk(self, params):
+        """Return all results of listing assets with *params* by following next links."""
+        results = []
+        response = self.client.get('/assets/', params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            results.extend(body['results'])
+            if body['next'] is None:
+                return results
+            response = self.client.get(body['next'])
+
+
+class ExportTests(TestCase):
+    """
+    Tests relating to exporting the asset list.
+    """
+    def setUp(self):
+        super().setUp()
+        self.auth_patch = patch_authenticate()
+        self.mock_authenticate = self.auth_patch.start()
+
+        self.user = get_user_model().objects.create_user(username="test0001")
+        UserLookup.objects.create(user=self.user, scheme='mock', identifier=self.user.username)
+        set_cached_person_for_user(self.user, LOOKUP_RESPONSE)
+        self.mock_authenticate.return_value = (self.user, {'scope': ' '.join(REQUIRED_SCOPES)})
+
+        self.client = APIClient()
+        self.asset1 = Asset.objects.create(**merge_dicts(COMPLETE_ASSET, {'name': 'asset1'}))
+        self.asset2 = Asset.objects.create(**merge_dicts(COMPLETE_ASSET, {'name': 'asset2'}))
+        Asset.objects.create(**DIFFERENT_ASSET)
+
+    def tearDown(self):
+        self.auth_patch.stop()
+        super().tearDown()
+
+    def test_csv(self):
+        """Visible assets are exported as CSV without allowed_methods."""
+        response = self.client.get('/export.csv', {'ordering': 'name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        rows = list(csv.DictReader(
+            io.StringIO(b''.join(response.streaming_content).decode('utf8'))))
+        self.assertEqual([row['id'] for row in rows], [str(self.asset1.id), str(self.asset2.id)])
+        self.assertNotIn('allowed_methods', rows[0])
+        self.assertEqual(
+            rows[0]['storage_format'], ','.join(sorted(COMPLETE_ASSET['storage_format'])))
+
+    def test_ndjson(self):
+        """Assets are exported as one JSON object per line using the list's parameters."""
+        response = self.client.get('/export.ndjson', {'ordering': '-name', 'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'id': str(self.asset2.id), 'name': 'asset2'},
+            {'id': str(self.asset1.id), 'name': 'asset1'},
+        ])
+
+    def test_all_fields(self):
+        """Exports of all fields match the list, less allowed_methods."""
+        listed = self.client.get('/assets/', {'ordering': 'name'}).json()['results']
+        response = self.client.get('/export.ndjson', {'ordering': 'name'})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf8').splitlines()
+        for asset in listed:
+            del asset['allowed_methods']
+        self.assertEqual([json.loads(line) for line in lines], listed)
+
+    def test_unknown_format(self):
+        """Only the supported formats can be exported."""
+        self.assertEqual(self.client.get('/export.xml').status_code, 404)
+
+
+class BulkTests(TestCase):
+    """
+    Tests relating to creating, updating and deleting assets in bulk.
+    """
+    def setUp(self):
+        super().setUp()
+        self.auth_patch = patch_authenticate()
+        self.mock_authenticate = self.auth_patch.start()
+
+        self.user = get_user_model().objects.create_user(username="test0001")
+        UserLookup.objects.create(user=self.user, scheme='mock', identifier=self.user.username)
+        set_cached_person_for_user(self.user, LOOKUP_RESPONSE)
+        self.mock_authenticate.return_value = (self.user, {'scope': ' '.join(REQUIRED_SCOPES)})
+
+        self.client = APIClient()
+
+    def tearDown(self):
+        self.auth_patch.stop()
+        super().tearDown()
+
+    def test_create(self):
+        """Assets are created and counted in the department statistics."""
+        payloads = [merge_dicts(COMPLETE_ASSET, {'name': f'asset{idx}'}) for idx in range(3)]
+        response = self.client.post('/assets/bulk', payloads, format='json')
+        self.assertEqual(response.status_code, 201)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [201] * 3)
+        self.assertEqual([result['data']['name'] for result in results],
+                         ['asset0', 'asset1', 'asset2'])
+        self.assertEqual(Asset.objects.filter(is_complete=True).count(), 3)
+        self.assertEqual(
+            DepartmentAssetStats.objects.get(department='TESTDEPT').as_counts().total, 3)
+
+    def test_create_all_or_nothing(self):
+        """If any asset is invalid, no assets are created."""
+        payloads = [COMPLETE_ASSET, merge_dicts(COMPLETE_ASSET, {'purpose': 'not-a-purpose'})]
+        response = self.client.post('/assets/bulk', payloads, format='json')
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [424, 400])
+        self.assertIn('purpose', results[1]['errors'])
+        self.assertEqual(Asset.objects.count(), 0)
+
+    def test_create_forbidden_department(self):
+        """Assets in departments the user is not in are forbidden."""
+        payloads = [COMPLETE_ASSET, merge_dicts(COMPLETE_ASSET, {'department': 'TESTDEPT2'})]
+        response = self.client.post('/assets/bulk', payloads, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Asset.objects.count(), 0)
+
+    def test_create_without_department(self):
+        """Each asset created must have a department."""
+        payloads = [COMPLETE_ASSET, merge_dicts(COMPLETE_ASSET, {'department': None})]
+        response = self.client.post('/assets/bulk', payloads, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Asset.objects.count(), 0)
+
+    def test_list_body_outside_bulk(self):
+        """Lists of assets may only be posted to the bulk endpoint."""
+        response = self.client.post('/assets/', [COMPLETE_ASSET], format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Asset.objects.count(), 0)
+
+    def test_update(self):
+        """Assets are updated and the changes audited."""
+        assets = [Asset.objects.create(**COMPLETE_ASSET) for _ in range(2)]
+
+        response = self.client.patch('/assets/bulk', [
+            {'id': str(assets[0].id), 'name': 'renamed'},
+            {'id': str(assets[1].id), 'storage_location': 'Elsewhere'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['results']], [200, 200])
+
+        assets[0].refresh_from_db()
+        assets[1].refresh_from_db()
+        self.assertEqual(assets[0].name, 'renamed')
+        self.assertEqual(assets[1].storage_location, 'Elsewhere')
+        self.assertEqual(assets[1].name, COMPLETE_ASSET['name'])
+        self.assertEqual(
+            sorted(Audit.objects.values_list('field', 'new')),
+            [('name', 'renamed'), ('storage_location', 'Elsewhere')])
+
+    def test_update_unknown(self):
+        """Updating an unknown asset is reported and nothing is updated."""
+        asset = Asset.objects.create(**COMPLETE_ASSET)
+        response = self.client.patch('/assets/bulk', [
+            {'id': str(asset.id), 'name': 'renamed'},
+            {'id': '00000000-0000-0000-0000-000000000000', 'name': 'renamed'},
+            {'name': 'renamed'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [result['status'] for result in response.json()['results']], [424, 404, 400])
+        asset.refresh_from_db()
+        self.assertEqual(asset.name, COMPLETE_ASSET['name'])
+
+    def test_destroy(self):
+        """Assets are marked as deleted."""
+        assets = [Asset.objects.create(**COMPLETE_ASSET) for _ in range(2)]
+        response = self.client.delete(
+            '/assets/bulk', [str(asset.id) for asset in assets], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['results']], [204, 204])
+        self.assertFalse(Asset.objects.filter(deleted_at__isnull=True).exists())
+        self.assertEqual(
+            DepartmentAssetStats.objects.get(department='TESTDEPT').as_counts().total, 0)
+
+    def test_too_many_items(self):
+        """The number of items in one request is limited."""
+        with self.settings(IAR_BULK_MAX_ITEMS=1):
+            response = self.client.post(
+                '/assets/bulk', [COMPLETE_ASSET, COMPLETE_ASSET], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
 class SwaggerAPITest(TestCase):
     """
     Tests relating to the use of Swagger (OpenAPI)
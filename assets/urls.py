@@ -3,7 +3,8 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import routers, permissions
 
-from assets.views import AssetViewSet, Stats
+from assets.export import EXPORT_FORMATS
+from assets.views import AssetViewSet, AssetTypeahead, Stats
 
 
 # Django Rest Framework Routing
@@ -25,10 +26,17 @@ schema_view = get_schema_view(
 )
 
 urlpatterns = [
+    path('assets/bulk', AssetViewSet.as_view({
+        'post': 'bulk_create', 'put': 'bulk_update', 'patch': 'bulk_partial_update',
+        'delete': 'bulk_destroy',
+    }), name='asset-bulk'),
     path('', include(router.urls)),
     re_path(r'^(ui|docs)/$', schema_view.with_ui('swagger', cache_timeout=None),
             name='schema-openapi-ui'),
     re_path(r'^swagger(?P<format>.json|.yaml)$', schema_view.without_ui(cache_timeout=None),
             name='schema-json'),
     path('stats', Stats.as_view(), name='stats'),
+    path('typeahead', AssetTypeahead.as_view(), name='typeahead'),
+    re_path(r'^export\.(?P<export_format>{})$'.format('|'.join(EXPORT_FORMATS)),
+            AssetViewSet.as_view({'get': 'export'}), name='asset-export'),
 ]
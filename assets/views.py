@@ -1,29 +1,43 @@
 """
 Views for the assets application.
 """
-from collections import namedtuple
-from automationlookup.lookup import get_person_for_user
+import copy
+import functools
+import operator
+import uuid
+
 from automationcommon.models import set_local_user, clear_local_user
-from automationoauthdrf.authentication import OAuth2TokenAuthentication
 from django.conf import settings
-from django.db.models import Q, Count
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections, transaction
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
 from django.utils.decorators import method_decorator
 from django.utils.timezone import now
 from django_filters.rest_framework import (
-    DjangoFilterBackend, FilterSet, CharFilter, BooleanFilter, ChoiceFilter
+    DjangoFilterBackend, FilterSet, CharFilter, BooleanFilter, ChoiceFilter, MultipleChoiceFilter
 )
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import viewsets, generics
-from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.permissions import DjangoModelPermissions
+from rest_framework import generics, status, viewsets
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.permissions import DjangoModelPermissions, SAFE_METHODS
 from rest_framework.response import Response
 
-from .models import Asset
+from . import export, statscache
+from .authentication import CachedOAuth2TokenAuthentication
+from .lookup import get_person_for_request
+from .models import Asset, AssetCounts, DepartmentAssetStats, audit_changes
+from .pagination import AssetCursorPagination
 from .permissions import (
     OrPermission, AndPermission,
-    HasScopesPermission, UserInInstitutionPermission, UserInIARGroupPermission
+    HasScopesPermission, UserInInstitutionPermission, UserInIARGroupPermission,
+    get_object_permission_checker
 )
-from .serializers import AssetSerializer, AssetStatsSerializer
+from .search import FullTextSearchFilter, SearchRankOrderingFilter
+from .serializers import AssetSerializer, AssetStatsSerializer, AssetTypeaheadSerializer
 
 
 # Scopes required to access asset register.
@@ -42,6 +56,73 @@ Decorator to apply to DRF methods which sets the appropriate security requiremen
 
 """
 
+SPARSE_FIELDS_PARAM = 'fields'
+"""
+Query parameter giving a comma-separated list of the only fields to return for each asset.
+
+"""
+
+SPARSE_OMIT_PARAM = 'omit'
+"""
+Query parameter giving a comma-separated list of fields not to return for each asset.
+
+"""
+
+
+TYPEAHEAD_QUERY_PARAM = 'q'
+"""
+Query parameter giving the text to match in the type-ahead endpoint.
+
+"""
+
+TYPEAHEAD_LIMIT_PARAM = 'limit'
+"""
+Query parameter giving the maximum number of results from the type-ahead endpoint.
+
+"""
+
+TYPEAHEAD_DEFAULT_LIMIT = 10
+TYPEAHEAD_MIN_QUERY_LENGTH = 2
+
+
+def filter_visible_assets(request, queryset):
+    """
+    Filter a queryset of assets to those the user making *request* may see. Users not in
+    :py:attr:`~assets.defaultsettings.IAR_USERS_LOOKUP_GROUP` can't see assets. Other users can
+    see assets which are not private and private assets belonging to their institutions.
+
+    """
+    lookup_response = get_person_for_request(request)
+
+    in_iar_group = [
+        group for group in lookup_response.get('groups') or []
+        if group['name'] == settings.IAR_USERS_LOOKUP_GROUP
+    ]
+
+    if not in_iar_group:
+        return queryset.none()
+
+    institutions = [
+        institution['instid'] for institution in lookup_response.get('institutions') or []
+    ]
+
+    return queryset.filter(Q(private=False) | Q(private=True, department__in=institutions))
+
+
+class ChoiceSetFilter(MultipleChoiceFilter):
+    """
+    A filter for a :py:class:`~assets.fields.ChoiceBitmaskField` which passes all the selected
+    choices to the field's ``contains_any`` or ``contains_all`` lookup so that the filter is a
+    single condition.
+
+    """
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        return self.get_method(qs)(**{
+            '{}__{}'.format(self.name, self.lookup_expr): list(value)
+        })
+
 
 class AssetFilter(FilterSet):
     """
@@ -60,15 +141,38 @@ class AssetFilter(FilterSet):
     recipients_outside_eea = ChoiceFilter(choices=Asset.RECIPIENTS_OUTSIDE_CHOICES)
     retention = ChoiceFilter(choices=Asset.RETENTION_CHOICES)
     is_complete = BooleanFilter(name="is_complete")
-    # TODO:
-    # It seem's probable that we would like to filter on the following MultiSelectField fields.
-    # However, we should implement this when we know how we would like to filter them.
-    #   data_subject,
-    #   data_category,
-    #   risk_type,
-    #   storage_format,
-    #   paper_storage_security,
-    #   digital_storage_security
+
+    # The multi-select fields are filtered for assets with any or all of the given choices. Choices
+    # are given by repeating the parameter. Example ?risk_type__contains_any=financial&
+    # risk_type__contains_any=compliance
+    data_subject__contains_any = ChoiceSetFilter(
+        name='data_subject', lookup_expr='contains_any', choices=Asset.DATA_SUBJECT_CHOICES)
+    data_subject__contains_all = ChoiceSetFilter(
+        name='data_subject', lookup_expr='contains_all', choices=Asset.DATA_SUBJECT_CHOICES)
+    data_category__contains_any = ChoiceSetFilter(
+        name='data_category', lookup_expr='contains_any', choices=Asset.DATA_CATEGORY_CHOICES)
+    data_category__contains_all = ChoiceSetFilter(
+        name='data_category', lookup_expr='contains_all', choices=Asset.DATA_CATEGORY_CHOICES)
+    risk_type__contains_any = ChoiceSetFilter(
+        name='risk_type', lookup_expr='contains_any', choices=Asset.RISK_CHOICES)
+    risk_type__contains_all = ChoiceSetFilter(
+        name='risk_type', lookup_expr='contains_all', choices=Asset.RISK_CHOICES)
+    storage_format__contains_any = ChoiceSetFilter(
+        name='storage_format', lookup_expr='contains_any', choices=Asset.STORAGE_FORMAT_CHOICES)
+    storage_format__contains_all = ChoiceSetFilter(
+        name='storage_format', lookup_expr='contains_all', choices=Asset.STORAGE_FORMAT_CHOICES)
+    paper_storage_security__contains_any = ChoiceSetFilter(
+        name='paper_storage_security', lookup_expr='contains_any',
+        choices=Asset.PAPER_STORAGE_SECURITY_CHOICES)
+    paper_storage_security__contains_all = ChoiceSetFilter(
+        name='paper_storage_security', lookup_expr='contains_all',
+        choices=Asset.PAPER_STORAGE_SECURITY_CHOICES)
+    digital_storage_security__contains_any = ChoiceSetFilter(
+        name='digital_storage_security', lookup_expr='contains_any',
+        choices=Asset.DIGITAL_STORAGE_SECURITY_CHOICES)
+    digital_storage_security__contains_all = ChoiceSetFilter(
+        name='digital_storage_security', lookup_expr='contains_all',
+        choices=Asset.DIGITAL_STORAGE_SECURITY_CHOICES)
 
     class Meta:
         model = Asset
@@ -84,6 +188,11 @@ class AssetFilter(FilterSet):
 @method_decorator(name='partial_update', decorator=SCHEMA_DECORATOR)
 @method_decorator(name='destroy', decorator=SCHEMA_DECORATOR)
 @method_decorator(name='list', decorator=SCHEMA_DECORATOR)
+@method_decorator(name='export', decorator=SCHEMA_DECORATOR)
+@method_decorator(name='bulk_create', decorator=SCHEMA_DECORATOR)
+@method_decorator(name='bulk_update', decorator=SCHEMA_DECORATOR)
+@method_decorator(name='bulk_partial_update', decorator=SCHEMA_DECORATOR)
+@method_decorator(name='bulk_destroy', decorator=SCHEMA_DECORATOR)
 class AssetViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows assets to be created, viewed, searched, filtered, and ordered
@@ -94,37 +203,63 @@ class AssetViewSet(viewsets.ModelViewSet):
     by adding the character "-" at the beginning of the name of the field.
 
     You can also use the parameter search in your request with the text that you want to search.
-    This text will be searched on all fields and will return all possible results
+    This text will be searched on all fields, including the labels of the choices of fields with
+    choices, and will return all possible results. On PostgreSQL, each word is matched as a word
+    prefix against a full-text index and, unless an ordering is given, results are ordered by
+    relevance.
+
+    The number of assets on each page can be chosen with the parameter page_size, up to a maximum
+    set by the server. Large pages are streamed.
+
+    All matching assets can be downloaded as CSV or newline-delimited JSON from /export.csv and
+    /export.ndjson which take the same parameters as the list.
+
+    Many assets can be created, updated or deleted in one request to /assets/bulk with a POST, PUT
+    or PATCH of a list of assets, which must include their ids to update them, or a DELETE of a
+    list of ids. Either all or none of the assets are written and the response has a result for
+    each asset.
 
     You can also filter by a specific field. For example if you only want to return those assets
     with name "foobar" you can add to your GET request a parameter called name (name of the field)
     and the value you want to filter by. Example ?name=foobar (this will return all assets
     that have as name "foobar").
 
+    When listing or retrieving assets, you can limit the fields returned with the parameters
+    fields and omit which take a comma-separated list of field names. Example
+    ?fields=id,name,department or ?omit=allowed_methods. Fields which aren't returned aren't
+    fetched from the database and omitting allowed_methods skips the permission checks needed to
+    compute it.
+
     """
     queryset = Asset.objects.filter(deleted_at__isnull=True)
     serializer_class = AssetSerializer
+    pagination_class = AssetCursorPagination
 
     ordering = ('-created_at',)
-    filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter)
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter, SearchRankOrderingFilter)
     filter_class = AssetFilter
     search_fields = (
         'name', 'purpose_other',
         'recipients_outside_uni_description',
         'recipients_outside_eea_description',
         'risk_type_additional', 'storage_location',
-        # TODO
-        # a search on the following fields won't work as the user would probably expect as they
-        # store a mnemonic and not the text that the user sees.
-        'department', 'purpose', 'owner', 'data_subject', 'data_category', 'retention',
-        'risk_type', 'storage_format', 'paper_storage_security', 'digital_storage_security',
+        'department', 'purpose', 'owner', 'retention',
+    )
+    # The fields with choices store a mnemonic, or a bitmask for the multi-select fields, rather
+    # than the text that the user sees and so search terms are matched against the labels of their
+    # choices.
+    search_choice_fields = (
+        'purpose', 'data_subject', 'data_category', 'retention', 'risk_type', 'storage_format',
+        'paper_storage_security', 'digital_storage_security',
     )
     ordering_fields = search_fields + (
+        'data_subject', 'data_category', 'risk_type', 'storage_format', 'paper_storage_security',
+        'digital_storage_security',
         'id', 'private', 'personal_data', 'recipients_outside_uni', 'recipients_outside_eea',
         'created_at', 'updated_at', 'is_complete'
     )
 
-    authentication_classes = (OAuth2TokenAuthentication,)
+    authentication_classes = (CachedOAuth2TokenAuthentication,)
     required_scopes = REQUIRED_SCOPES
 
     permission_classes = (
@@ -161,27 +296,295 @@ class AssetViewSet(viewsets.ModelViewSet):
         they can't see assets.
         """
 
-        lookup_response = get_person_for_user(self.request.user)
+        queryset = filter_visible_assets(self.request, super(AssetViewSet, self).get_queryset())
+
+        # Only the columns needed for a sparse fieldset are fetched. Exports of all fields fetch
+        # whole rows rather than deferring the columns the serializer doesn't use.
+        requested_fields = self.get_requested_fields()
+        if requested_fields is not None and self.has_sparse_fields_params():
+            queryset = queryset.only(*self.get_required_columns(queryset, requested_fields))
+
+        return queryset
+
+    def get_serializer_context(self):
+        """Add the fields requested via the fields and omit query parameters to the context."""
+        context = super().get_serializer_context()
+        context['requested_fields'] = self.get_requested_fields()
+        return context
+
+    def get_requested_fields(self):
+        """
+        Return the set of serializer field names requested via the comma-separated ``fields``
+        and ``omit`` query parameters or None if all fields should be returned. Sparse fieldsets
+        are only supported for safe methods.
+
+        """
+        if self.request.method not in SAFE_METHODS:
+            return None
+
+        if not self.has_sparse_fields_params() and self.action != 'export':
+            return None
+
+        fields_param = self.request.query_params.get(SPARSE_FIELDS_PARAM)
+        omit_param = self.request.query_params.get(SPARSE_OMIT_PARAM)
+
+        all_fields = set(self.get_serializer_class()(context={}).fields)
+        requested_fields = set(all_fields)
+
+        # Exports never include allowed_methods as computing it needs permission checks.
+        if self.action == 'export':
+            all_fields.discard('allowed_methods')
+            requested_fields.discard('allowed_methods')
+
+        for param, value in ((SPARSE_FIELDS_PARAM, fields_param), (SPARSE_OMIT_PARAM, omit_param)):
+            if value is None:
+                continue
+            names = {name.strip() for name in value.split(',') if name.strip() != ''}
+            unknown = names - all_fields
+            if unknown:
+                raise ValidationError({param: 'Unknown field(s): {}'.format(
+                    ', '.join(sorted(unknown)))})
+            if param == SPARSE_FIELDS_PARAM:
+                requested_fields &= names
+            else:
+                requested_fields -= names
+
+        return requested_fields
+
+    def has_sparse_fields_params(self):
+        """Return whether the ``fields`` or ``omit`` query parameters were given."""
+        params = self.request.query_params
+        return SPARSE_FIELDS_PARAM in params or SPARSE_OMIT_PARAM in params
+
+    def get_required_columns(self, queryset, requested_fields):
+        """
+        Return the names of the model fields which must be fetched to serialise
+        *requested_fields* and to order the results.
+
+        """
+        model_fields = {field.name for field in Asset._meta.concrete_fields}
+        serializer_fields = self.get_serializer_class()(context={}).fields
+
+        columns = {
+            serializer_fields[name].source for name in requested_fields
+            if serializer_fields[name].source in model_fields
+        }
+
+        # The permission checks for allowed_methods need the department.
+        if 'allowed_methods' in requested_fields:
+            columns.add('department')
+
+        # The paginator needs the fields used for ordering.
+        ordering = SearchRankOrderingFilter().get_ordering(self.request, queryset, self) or ()
+        columns.update(
+            name.lstrip('-') for name in ordering if name.lstrip('-') in model_fields)
+
+        return sorted(columns)
+
+    def list(self, request, *args, **kwargs):
+        """
+        list is patched to stream large pages. See
+        :py:meth:`~assets.pagination.AssetCursorPagination.get_streaming_response`.
+
+        """
+        if self.paginator is not None and self.paginator.is_streamed(request):
+            queryset = self.filter_queryset(self.get_queryset())
+            return self.paginator.get_streaming_response(queryset, request, self)
+
+        return super().list(request, *args, **kwargs)
+
+    def export(self, request, *args, **kwargs):
+        """
+        Stream all assets matching the filters, search and ordering of the list, without
+        pagination, as CSV or newline-delimited JSON. The format is given by the export_format
+        URL parameter. allowed_methods is never included.
+
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return export.get_export_response(
+            queryset, self.get_serializer(many=True), kwargs['export_format'])
+
+    def bulk_create(self, request, *args, **kwargs):
+        """
+        Create the assets given by the list of payloads in the request body. See
+        :py:meth:`perform_bulk_write`.
+
+        """
+        payloads = self.get_bulk_items(request)
+        serializer = self.get_serializer(data=payloads, many=True)
+        return self.perform_bulk_write(
+            serializer, [None] * len(payloads), [None] * len(payloads), status.HTTP_201_CREATED)
+
+    def bulk_update(self, request, *args, **kwargs):
+        """
+        Update the assets given by the list of payloads in the request body. Each payload must
+        include the id of the asset. See :py:meth:`perform_bulk_write`.
+
+        """
+        partial = kwargs.pop('partial', False)
+        payloads = self.get_bulk_items(request)
+        instances, errors = self.get_bulk_instances(
+            [payload.get('id') if isinstance(payload, dict) else None for payload in payloads])
+        serializer = self.get_serializer(instances, data=payloads, many=True, partial=partial)
+        return self.perform_bulk_write(serializer, instances, errors, status.HTTP_200_OK)
+
+    def bulk_partial_update(self, request, *args, **kwargs):
+        kwargs['partial'] = True
+        return self.bulk_update(request, *args, **kwargs)
+
+    def bulk_destroy(self, request, *args, **kwargs):
+        """
+        Mark the assets whose ids are given as a list in the request body as deleted. As with
+        :py:meth:`perform_bulk_write`, if any asset can't be deleted, none are.
+
+        """
+        instances, errors = self.get_bulk_instances(self.get_bulk_items(request))
+
+        check_department = self.get_department_checker(request)
+        for idx, instance in enumerate(instances):
+            if errors[idx] is None and not check_department(instance.department):
+                errors[idx] = (
+                    status.HTTP_403_FORBIDDEN, {'detail': PermissionDenied.default_detail})
+        if any(error is not None for error in errors):
+            return self.get_bulk_error_response(errors)
+
+        deleted_at, changes = now(), []
+        for instance in instances:
+            changes.append((copy.copy(instance), instance))
+            instance.deleted_at = deleted_at
+        with transaction.atomic():
+            Asset.objects.bulk_update(instances, ['deleted_at'])
+            audit_changes(changes)
+
+        return Response({'results': [{'status': status.HTTP_204_NO_CONTENT} for _ in instances]})
+
+    def get_bulk_items(self, request):
+        """
+        Return the list of items in the body of a bulk request. Raises a ValidationError if the
+        body is not a list or has more than :py:attr:`~assets.defaultsettings.IAR_BULK_MAX_ITEMS`
+        items.
+
+        """
+        if not isinstance(request.data, list):
+            raise ValidationError('Expected a list of items.')
+        if len(request.data) > settings.IAR_BULK_MAX_ITEMS:
+            raise ValidationError(
+                'At most {} items may be given.'.format(settings.IAR_BULK_MAX_ITEMS))
+        return request.data
+
+    def get_bulk_instances(self, ids):
+        """
+        Fetch the assets with primary keys *ids* which the user may see in a single query. Returns
+        a list of the asset for each id, or None if it can't be found, and a list of errors, in the
+        form used by :py:meth:`get_bulk_error_response`, for each id.
+
+        """
+        pks = []
+        for id in ids:
+            try:
+                pks.append(uuid.UUID(str(id)) if id is not None else None)
+            except ValueError:
+                pks.append(None)
+
+        found = self.get_queryset().in_bulk([pk for pk in pks if pk is not None])
+        instances, errors, seen = [], [], set()
+        for pk in pks:
+            instances.append(found.get(pk))
+            if pk is None:
+                errors.append((status.HTTP_400_BAD_REQUEST, {'id': ['A valid id is required.']}))
+            elif pk in seen:
+                errors.append((status.HTTP_400_BAD_REQUEST, {'id': ['Duplicate id.']}))
+            elif pk not in found:
+                errors.append((status.HTTP_404_NOT_FOUND, {'detail': NotFound.default_detail}))
+            else:
+                errors.append(None)
+            seen.add(pk)
+
+        return instances, errors
+
+    def get_department_checker(self, request):
+        """
+        Return a callable which takes a department and returns whether the object permissions
+        allow the request to act on an asset in that department. The check is made once for each
+        distinct department.
 
-        in_iar_group = [
-            group for group in lookup_response['groups']
-            if group['name'] == settings.IAR_USERS_LOOKUP_GROUP
+        """
+        checkers = [
+            get_object_permission_checker(permission, request, self)
+            for permission in self.get_permissions()
         ]
+        results = {}
 
-        if not in_iar_group:
-            return Asset.objects.none()
+        def check_department(department):
+            if department not in results:
+                asset = Asset(department=department)
+                results[department] = all(checker(asset) for checker in checkers)
+            return results[department]
 
-        queryset = super(AssetViewSet, self).get_queryset()
+        return check_department
 
-        institutions = [institution['instid'] for institution in lookup_response['institutions']]
+    def perform_bulk_write(self, serializer, instances, errors, success_status):
+        """
+        Validate *serializer*, created with ``many=True``, check the permissions of the request on
+        each of its items and save all the items in one transaction. *instances* is a list of the
+        existing asset for each item, or None if the item creates an asset, and *errors* a list of
+        the errors already found for each item in the form used by
+        :py:meth:`get_bulk_error_response`.
 
-        return queryset.filter(Q(private=False) | Q(private=True, department__in=institutions))
+        The response has a result for each item in order. If every item is written, each result
+        has the status *success_status* and the serialised asset. Otherwise, no item is written
+        and the response is from :py:meth:`get_bulk_error_response`.
 
-    def update(self, request, *args, **kwargs):
-        """We force a refresh after an update, so we can get the up to date annotation data."""
-        super(AssetViewSet, self).update(request, *args, **kwargs)
+        """
+        if not serializer.is_valid():
+            errors = [
+                error if error is not None or not item_errors else
+                (status.HTTP_400_BAD_REQUEST, item_errors)
+                for error, item_errors in zip(errors, serializer.errors)
+            ]
+            return self.get_bulk_error_response(errors)
+
+        check_department = self.get_department_checker(self.request)
+        for idx, (instance, attrs) in enumerate(zip(instances, serializer.validated_data)):
+            if errors[idx] is not None:
+                continue
+            if instance is None and not attrs.get('department'):
+                errors[idx] = (
+                    status.HTTP_400_BAD_REQUEST, {'department': ['department is required']})
+                continue
+
+            departments = []
+            if instance is not None:
+                departments.append(instance.department)
+            if 'department' in attrs:
+                departments.append(attrs['department'])
+            if not all(check_department(department) for department in departments):
+                errors[idx] = (
+                    status.HTTP_403_FORBIDDEN, {'detail': PermissionDenied.default_detail})
+
+        if any(error is not None for error in errors):
+            return self.get_bulk_error_response(errors)
+
+        with transaction.atomic():
+            serializer.save()
+
+        return Response({'results': [
+            {'status': success_status, 'data': data} for data in serializer.data
+        ]}, status=success_status)
+
+    def get_bulk_error_response(self, errors):
+        """
+        Return the response to a bulk request which was not performed. *errors* is a list of None
+        or a (status, detail) pair for each item. The response has status 400 and a result for
+        each item in order with the item's status and detail or, for items without errors, status
+        424 to show that they were not written because of other items.
 
-        return Response(self.get_serializer(self.get_object()).data)
+        """
+        return Response({'results': [
+            {'status': status.HTTP_424_FAILED_DEPENDENCY} if error is None else
+            {'status': error[0], 'errors': error[1]}
+            for error in errors
+        ]}, status=status.HTTP_400_BAD_REQUEST)
 
     def perform_destroy(self, instance):
         """perform_destroy patched to not delete the instance but instead flagged as deleted."""
@@ -190,69 +593,134 @@ class AssetViewSet(viewsets.ModelViewSet):
             instance.save()
 
 
-AssetCounts = namedtuple('AssetCounts', 'total completed with_personal_data')
+class AssetTypeahead(generics.ListAPIView):
+    """
+    Returns at most limit assets whose name, owner, department or storage location contain the
+    text given in the q parameter, best matches first. Example ?q=clin&limit=5. Only the fields
+    needed to present suggestions are returned.
+
+    On PostgreSQL, matching uses trigram indexes and results are ranked by trigram similarity.
+    Responses may be cached privately by clients for a short time so that repeated requests made
+    while the user is typing are cheap.
+    """
+    serializer_class = AssetTypeaheadSerializer
+    queryset = Asset.objects.filter(deleted_at__isnull=True)
+    pagination_class = None
+
+    authentication_classes = AssetViewSet.authentication_classes
+    required_scopes = AssetViewSet.required_scopes
+    permission_classes = AssetViewSet.permission_classes
+
+    #: Fields matched against the query text.
+    typeahead_fields = ('name', 'owner', 'department', 'storage_location')
+
+    def get_queryset(self):
+        return filter_visible_assets(self.request, super().get_queryset())
+
+    def filter_queryset(self, queryset):
+        """Return the best matches for the query text."""
+        query = self.get_query()
+        limit = self.get_limit()
+
+        # Matching rows are fetched as dicts since only a few columns are needed.
+        queryset = queryset.filter(functools.reduce(operator.or_, (
+            Q(**{field + '__ilike_contains': query}) for field in self.typeahead_fields
+        ))).values('id', *self.typeahead_fields)
+
+        if connections[queryset.db].vendor == 'postgresql':
+            similarity = Greatest(*(
+                TrigramSimilarity(field, query) for field in self.typeahead_fields
+            ))
+        else:
+            # Without trigram similarity, prefer assets with a field starting with the query.
+            similarity = Case(
+                When(functools.reduce(operator.or_, (
+                    Q(**{field + '__istartswith': query}) for field in self.typeahead_fields
+                )), then=Value(1.0)),
+                default=Value(0.0), output_field=FloatField()
+            )
+
+        return queryset.annotate(similarity=similarity).order_by('-similarity', 'name', 'id')[
+            :limit]
+
+    def get_query(self):
+        """Return the query text, which must be given and have at least two characters."""
+        query = self.request.query_params.get(TYPEAHEAD_QUERY_PARAM, '').strip()
+        if len(query) < TYPEAHEAD_MIN_QUERY_LENGTH:
+            raise ValidationError({TYPEAHEAD_QUERY_PARAM: 'At least {} characters are required'
+                                   .format(TYPEAHEAD_MIN_QUERY_LENGTH)})
+        return query
+
+    def get_limit(self):
+        """
+        Return the maximum number of results, which is bounded by
+        :py:attr:`~assets.defaultsettings.IAR_TYPEAHEAD_MAX_RESULTS`.
+
+        """
+        try:
+            limit = int(self.request.query_params.get(
+                TYPEAHEAD_LIMIT_PARAM, TYPEAHEAD_DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({TYPEAHEAD_LIMIT_PARAM: 'A positive integer is required'})
+        if limit < 1:
+            raise ValidationError({TYPEAHEAD_LIMIT_PARAM: 'A positive integer is required'})
+        return min(limit, settings.IAR_TYPEAHEAD_MAX_RESULTS)
+
+    @SCHEMA_DECORATOR
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+
+        # Results depend on the user and so may only be cached by the client.
+        patch_cache_control(response, private=True, max_age=settings.IAR_TYPEAHEAD_MAX_AGE)
+        patch_vary_headers(response, ('Authorization',))
+        return response
 
 
 class AssetStats:
-    """Given a queryset of matching non-annotated asset records, calculate some statistics for all
-    assets and assets grouped by department.
-    We need the non-annotated queryset to work around a bug in Django. See
-    https://code.djangoproject.com/ticket/28762 and
-    https://github.com/uisautomation/iar-backend/issues/55.
+    """Statistics for all assets and assets grouped by department.
 
-    :param queryset: Non-annotated queryset of :py:class:`assets.models.Asset` objects
+    :param dict by_institution: An :py:class:`~assets.models.AssetCounts` instance for each
+        institution keyed by Lookup instid.
 
     :ivar AssetCounts all: Counts for all assets
-    :ivar dict by_institution: An :py:class:`AssetCounts` instance for each institution keyed by
-        Lookup instid.
+    :ivar dict by_institution: An :py:class:`~assets.models.AssetCounts` instance for each
+        institution keyed by Lookup instid.
 
     """
 
-    def __init__(self, queryset):
-        # Annotate the input queryset with is_complete.
-        annotated_queryset = Asset.objects.annotate_is_complete(queryset)
+    def __init__(self, by_institution):
+        self.by_institution = by_institution
 
-        # Compute asset entry counts for all assets.
+        # Counts for all assets are derived from the per-department counts.
+        dept_counts = self.by_institution.values()
         self.all = AssetCounts(
-            total=queryset.count(),
-            # This works around bug that throws an exception
-            completed=queryset.filter(
-                id__in=annotated_queryset.filter(is_complete=True).values('id')).count(),
-            with_personal_data=queryset.filter(personal_data=True).count()
+            total=sum(counts.total for counts in dept_counts),
+            completed=sum(counts.completed for counts in dept_counts),
+            with_personal_data=sum(counts.with_personal_data for counts in dept_counts),
         )
 
-        # Compute individual counts grouped by department for each class of entry.
-        n_assets_by_dept = {
-            d['department']: d['count'] for d in
-            queryset.values('department').annotate(count=Count('id')).order_by('department')
-        }
-        n_assets_completed_by_dept = {
-            d['department']: d['count'] for d in
-            annotated_queryset.filter(is_complete=True).values('department')
-            .annotate(count=Count('id')).order_by('department')
-        }
-        n_assets_with_personal_data_by_dept = {
-            d['department']: d['count'] for d in
-            queryset.filter(personal_data=True)
-            .values('department').annotate(count=Count('id')).order_by('department')
-        }
+    @classmethod
+    def from_assets(cls, queryset):
+        """
+        Calculate statistics from a queryset of matching asset records in a single query.
 
-        # Create a list of all departments in the database
-        all_depts = [
-            row['department'] for row in
-            queryset.distinct('department').values('department').order_by('department')
-        ]
+        :param queryset: Queryset of :py:class:`assets.models.Asset` objects
 
-        # Collect separate counts together grouped by institution. If there is no count for a
-        # particular institution, report "0".
-        self.by_institution = {
-            dept: AssetCounts(
-                total=n_assets_by_dept.get(dept, 0),
-                completed=n_assets_completed_by_dept.get(dept, 0),
-                with_personal_data=n_assets_with_personal_data_by_dept.get(dept, 0),
-            )
-            for dept in all_depts
-        }
+        """
+        return cls(queryset.department_counts())
+
+    @classmethod
+    def from_department_stats(cls, queryset):
+        """
+        Read statistics from the maintained per-department summary table.
+
+        :param queryset: Queryset of :py:class:`assets.models.DepartmentAssetStats` objects
+
+        """
+        return cls({
+            stats.department: stats.as_counts()
+            for stats in queryset.exclude(total=0).order_by('department')
+        })
 
 
 class Stats(generics.RetrieveAPIView):
@@ -260,9 +728,27 @@ class Stats(generics.RetrieveAPIView):
     Returns Assets stats: total number of assets, total number of assets completed,
     total number of assets with personal data, and assets per department (total, completed,
     with personal data)
+
+    Responses are cached until assets change and carry an ETag header so that clients may make
+    conditional requests with If-None-Match.
     """
     serializer_class = AssetStatsSerializer
 
     def get_object(self):
-        # These statistics should only be for non-deleted assets.
-        return AssetStats(Asset.objects.get_base_queryset().filter(deleted_at__isnull=True))
+        # The summary table only includes non-deleted assets.
+        return AssetStats.from_department_stats(DepartmentAssetStats.objects.all())
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return the cached statistics or a 304 response if the client's copy is current."""
+        entry = statscache.get_cached_stats()
+        if entry is None:
+            entry = statscache.set_cached_stats(self.get_serializer(self.get_object()).data)
+
+        response = Response(entry['data'])
+        response['ETag'] = entry['etag']
+        patch_cache_control(response, no_cache=True)
+
+        # Conditional requests are answered from the ETag alone. A Last-Modified time would be
+        # the time the entry was cached, with a resolution of one second, and so could answer
+        # If-Modified-Since with a 304 after the statistics had changed.
+        return get_conditional_response(request, etag=entry['etag'], response=response)